@@ -1,11 +1,28 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context
+import click
 import requests
 import os
-from textblob import TextBlob
+import json
+import re
+from contextlib import closing
+from itertools import chain, islice
 from dotenv import load_dotenv
-import urllib.parse
 import random
+import secrets
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from cache import create_backend
+from singleflight import SingleFlight
+from ratelimit import governor_for, all_governors, UpstreamUnavailable, TokenBucket
+from warmer import CacheWarmer
+from mood import create_classifier
+from catalog import FallbackCatalog, DEFAULT_CATALOG_PATH, PREFERENCE_REGIONS
+from metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from similarity import MovieIndex
+from posters import PosterCache, FILENAME_RE as POSTER_FILENAME_RE
+from httpcache import ResponseCache, private_cache_control, request_key
+from history import HistoryStore
 
 # Load environment variables
 load_dotenv()
@@ -15,25 +32,132 @@ app = Flask(__name__)
 # AI Movie Recommender API configuration
 RAPIDAPI_KEY = os.getenv('RAPIDAPI_KEY', '43774399d4msh623b25b4b75f9d5p1cbae2jsn5b099e5e9e62')
 RAPIDAPI_HOST = 'ai-movie-recommender.p.rapidapi.com'
-RAPIDAPI_BASE_URL = 'https://ai-movie-recommender.p.rapidapi.com/api'
+RAPIDAPI_BASE_URL = os.getenv('RAPIDAPI_BASE_URL', 'https://ai-movie-recommender.p.rapidapi.com/api')
 YOUTUBE_RAPID_HOST = 'youtube-v31.p.rapidapi.com'
-YOUTUBE_SEARCH_URL = 'https://youtube-v31.p.rapidapi.com/search'
+YOUTUBE_SEARCH_URL = os.getenv('YOUTUBE_SEARCH_URL', 'https://youtube-v31.p.rapidapi.com/search')
 
-# Simple in-memory cache for query → movies to reduce API calls and 429s
-_CACHE: dict[str, dict] = {}
-_CACHE_TTL_SECONDS = 6 * 60 * 60  # 6 hours
+# Upstream fan-out: candidate queries for one /recommend run in parallel on a
+# shared, bounded pool, and the whole request gives up after a deadline.
+FETCH_MAX_WORKERS = int(os.getenv('FETCH_MAX_WORKERS', '16'))
+RECOMMEND_DEADLINE_SECONDS = float(os.getenv('RECOMMEND_DEADLINE_SECONDS', '8'))
+_FETCH_POOL = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS, thread_name_prefix='moodflix-fetch')
 
-def _cache_get(key: str):
-    rec = _CACHE.get(key)
-    if not rec:
+def time_left(deadline):
+    """Seconds until a time.monotonic() deadline (a full request's worth when there is none)"""
+    if deadline is None:
+        return RECOMMEND_DEADLINE_SECONDS
+    return max(0.0, deadline - time.monotonic())
+
+# Cache for query → movies to reduce API calls and 429s.
+# 'sqlite' (default) and 'mmap' are shared by every worker on the host and
+# survive restarts; 'memory' is private to each worker.
+# Entries are fresh for _CACHE_TTL_SECONDS. After that they are still served
+# (flagged stale) while a background refresh runs, until the hard expiry.
+_CACHE_TTL_SECONDS = int(os.getenv('CACHE_FRESH_SECONDS', str(6 * 60 * 60)))  # 6 hours
+CACHE_HARD_EXPIRY_SECONDS = int(os.getenv('CACHE_HARD_EXPIRY_SECONDS', str(48 * 60 * 60)))  # 2 days
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'sqlite')
+CACHE_PATH = os.getenv('CACHE_PATH', os.path.join(app.instance_path, f'moodflix-cache.{CACHE_BACKEND}'))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '2048'))
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+_CACHE = create_backend(
+    CACHE_BACKEND,
+    ttl=max(_CACHE_TTL_SECONDS, CACHE_HARD_EXPIRY_SECONDS),
+    path=CACHE_PATH,
+    max_entries=CACHE_MAX_ENTRIES,
+    max_bytes=CACHE_MAX_BYTES,
+    mmap_slots=int(os.getenv('CACHE_MMAP_SLOTS', '4096')),
+    mmap_slot_bytes=int(os.getenv('CACHE_MMAP_SLOT_BYTES', str(16 * 1024))),
+)
+
+def _cache_lookup(key: str):
+    """Return (value, is_stale) for a cached entry, or None on a miss"""
+    entry = _CACHE.get_entry(key)
+    if entry is None:
         return None
-    if time.time() - rec['ts'] > _CACHE_TTL_SECONDS:
-        _CACHE.pop(key, None)
+    val, stored_at = entry
+    return val, time.time() - stored_at > _CACHE_TTL_SECONDS
+
+def _cache_get(key: str):
+    """Return a fresh cached value, or None when missing or stale"""
+    hit = _cache_lookup(key)
+    if hit is None or hit[1]:
         return None
-    return rec['val']
+    return hit[0]
 
 def _cache_set(key: str, val):
-    _CACHE[key] = {'val': val, 'ts': time.time()}
+    _CACHE.set(key, val)
+
+# Trailer IDs practically never change, so they get their own long-lived,
+# persistent cache. "No trailer found" is cached too, but for a shorter time.
+TRAILER_CACHE_BACKEND = os.getenv('TRAILER_CACHE_BACKEND', 'sqlite')
+TRAILER_CACHE_PATH = os.getenv('TRAILER_CACHE_PATH', os.path.join(app.instance_path, f'moodflix-trailers.{TRAILER_CACHE_BACKEND}'))
+TRAILER_CACHE_TTL_SECONDS = int(os.getenv('TRAILER_CACHE_TTL_SECONDS', str(30 * 24 * 60 * 60)))  # 30 days
+TRAILER_NEGATIVE_TTL_SECONDS = int(os.getenv('TRAILER_NEGATIVE_TTL_SECONDS', str(24 * 60 * 60)))  # 1 day
+TRAILER_BATCH_MAX = 24
+TRAILER_LOOKUP_FAILED = 'Trailer lookup failed'
+_TRAILER_CACHE = create_backend(
+    TRAILER_CACHE_BACKEND,
+    ttl=TRAILER_CACHE_TTL_SECONDS,
+    path=TRAILER_CACHE_PATH,
+    max_entries=int(os.getenv('TRAILER_CACHE_MAX_ENTRIES', '50000')),
+    mmap_slots=int(os.getenv('TRAILER_CACHE_MMAP_SLOTS', '16384')),
+    mmap_slot_bytes=256,
+)
+
+# Client-side rate limiting per RapidAPI host: a token bucket that honours
+# Retry-After/quota headers and a circuit breaker for repeated 429s/timeouts.
+# Calls wait for a token up to their request's deadline. Buckets are per
+# process, so the per-host budget is split between the WEB_CONCURRENCY
+# worker processes (gunicorn.conf.py sets it; uvicorn --workers reads it).
+WEB_CONCURRENCY = max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+_GOVERNOR_SETTINGS = {
+    'rate': float(os.getenv('RAPIDAPI_RATE_PER_SECOND', '5')) / WEB_CONCURRENCY,
+    'burst': max(1, int(os.getenv('RAPIDAPI_BURST', '10')) // WEB_CONCURRENCY),
+    'failure_threshold': int(os.getenv('UPSTREAM_BREAKER_FAILURES', '5')),
+    'reset_timeout': float(os.getenv('UPSTREAM_BREAKER_RESET_SECONDS', '30')),
+}
+_MOVIE_GOVERNOR = governor_for(RAPIDAPI_HOST, **_GOVERNOR_SETTINGS)
+_TRAILER_GOVERNOR = governor_for(YOUTUBE_RAPID_HOST, **_GOVERNOR_SETTINGS)
+
+# Identical upstream calls that are in flight at the same time share one request
+_MOVIE_FLIGHTS = SingleFlight()
+_TRAILER_FLIGHTS = SingleFlight()
+
+# Hot-path metrics, exported in Prometheus format at /metrics
+STAGE_SECONDS = REGISTRY.histogram(
+    'moodflix_stage_seconds', 'Time spent in each recommendation stage', ('stage',))
+MOVIE_LOOKUP_SECONDS = REGISTRY.histogram(
+    'moodflix_movie_lookup_seconds', 'get_movies_by_mood latency by cache result (hit, stale, miss)', ('result',))
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    'moodflix_upstream_request_seconds', 'Latency of RapidAPI calls', ('host',))
+UPSTREAM_RESPONSES = REGISTRY.counter(
+    'moodflix_upstream_responses_total', 'RapidAPI calls by status code (429 = rate limited; timeout = no response)',
+    ('host', 'code'))
+RECOMMENDATIONS = REGISTRY.counter(
+    'moodflix_recommendations_total', 'Recommendations served, by whether curated fallbacks were needed',
+    ('fallback',))
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'moodflix_http_request_seconds', 'Time to response headers per endpoint', ('endpoint', 'status'))
+LOCAL_REFINEMENTS = REGISTRY.counter(
+    'moodflix_local_refinements_total', 'Free-text refinements tried against the local index', ('result',))
+RESPONSE_CACHE_LOOKUPS = REGISTRY.counter(
+    'moodflix_response_cache_lookups_total', 'Response cache lookups by endpoint and result', ('endpoint', 'result'))
+CACHE_HIT_RATIO = REGISTRY.gauge('moodflix_cache_hit_ratio', 'Cache hit ratio since start', ('cache',))
+CACHE_ENTRIES = REGISTRY.gauge('moodflix_cache_entries', 'Entries currently cached', ('cache',))
+BREAKER_OPEN = REGISTRY.gauge('moodflix_upstream_breaker_open', '1 while the circuit breaker refuses calls', ('host',))
+
+_LOOKUP_HIT = MOVIE_LOOKUP_SECONDS.labels('hit')
+_LOOKUP_STALE = MOVIE_LOOKUP_SECONDS.labels('stale')
+_LOOKUP_MISS = MOVIE_LOOKUP_SECONDS.labels('miss')
+_RECOMMEND_API = RECOMMENDATIONS.labels('false')
+_RECOMMEND_FALLBACK = RECOMMENDATIONS.labels('true')
+_LOCAL_HIT = LOCAL_REFINEMENTS.labels('hit')
+_LOCAL_MISS = LOCAL_REFINEMENTS.labels('miss')
+
+def observe_upstream(host, started, code):
+    """Record one upstream call that began at perf_counter() == started"""
+    UPSTREAM_SECONDS.labels(host).observe(time.perf_counter() - started)
+    UPSTREAM_RESPONSES.labels(host, code).inc()
 
 # Mood to search query mapping (including Indian movies)
 MOOD_QUERY_MAP = {
@@ -49,21 +173,15 @@ MOOD_QUERY_MAP = {
     "adventurous": "adventure action movies indian"
 }
 
+# Mood classifier: 'lexicon' (default, covers all moods) or 'textblob'.
+# Loaded by warm_up() before serving (TextBlob pulls in NLTK), or on first use.
+MOOD_CLASSIFIER = os.getenv('MOOD_CLASSIFIER', 'lexicon')
+_MOOD_CLASSIFIER = create_classifier(MOOD_CLASSIFIER, cache_size=int(os.getenv('MOOD_CACHE_SIZE', '4096')))
+
+@STAGE_SECONDS.labels('sentiment').timed
 def analyze_sentiment(text):
     """Analyze sentiment of the input text and return mood category"""
-    blob = TextBlob(text)
-    polarity = blob.sentiment.polarity
-    
-    if polarity > 0.3:
-        return "happy"
-    elif polarity > 0.1:
-        return "excited"
-    elif polarity > -0.1:
-        return "relaxed"
-    elif polarity > -0.3:
-        return "bored"
-    else:
-        return "sad"
+    return _MOOD_CLASSIFIER.classify(text)
 
 def get_mood_emoji(mood):
     """Get emoji for the detected mood"""
@@ -81,214 +199,222 @@ def get_mood_emoji(mood):
     }
     return emoji_map.get(mood, "😊")
 
-def get_fallback_movies(mood):
+# Every /recommend aims for this many movies and asks each query for this many
+RECOMMEND_TARGET_COUNT = 8
+PREFERENCES = ('mixed', 'indian', 'hollywood')
+
+def templated_queries(mood, preference):
+    """Search queries determined by mood and preference alone (the warmable part)"""
+    queries = []
+    # Simple mood-based queries first
+    if preference in ('mixed', 'hollywood'):
+        queries.extend([
+            f"{mood} movies",
+            f"{mood} comedy movies" if mood == "happy" else f"{mood} drama movies",
+            f"{mood} action movies" if mood in ["angry", "excited", "adventurous"] else f"{mood} romantic movies",
+        ])
+    if preference in ('mixed', 'indian'):
+        queries.extend([
+            f"{mood} bollywood movies",
+            f"{mood} bollywood action movies" if mood in ["angry", "excited", "adventurous"] else f"{mood} bollywood romantic movies",
+        ])
+    return queries
+
+def is_refinement(user_input):
+    """Short user text is treated as a search refinement (longer text is too noisy)"""
+    return bool(user_input) and len(user_input.split()) <= 4
+
+def build_queries(mood, preference, user_input, text_queries=True):
+    """All search queries for a request: templated ones plus user-text refinements"""
+    queries = templated_queries(mood, preference)
+    # More specific queries from user input (only if short to avoid noisy searches)
+    if text_queries and is_refinement(user_input):
+        if preference in ('mixed', 'hollywood'):
+            queries.append(f"{mood} movies {user_input.lower()}")
+        if preference in ('mixed', 'indian'):
+            queries.append(f"{mood} bollywood {user_input.lower()}")
+    return queries
+
+# Curated fallback catalog, loaded once from data/fallback_catalog.json on
+# first use (or by warm_up)
+FALLBACK_CATALOG_PATH = os.getenv('FALLBACK_CATALOG_PATH', DEFAULT_CATALOG_PATH)
+_FALLBACK_CATALOG = None
+_FALLBACK_CATALOG_LOCK = threading.Lock()
+
+# Local TF-IDF index over the curated catalog and every movie the search API
+# has returned. Short user text is matched against it first, and the
+# per-user upstream queries are only sent when nothing local is close enough.
+LOCAL_INDEX_MAX_MOVIES = int(os.getenv('LOCAL_INDEX_MAX_MOVIES', '50000'))  # 0 disables the index
+LOCAL_MATCH_MIN_SCORE = float(os.getenv('LOCAL_MATCH_MIN_SCORE', '0.15'))
+LOCAL_MATCH_MIN_RESULTS = int(os.getenv('LOCAL_MATCH_MIN_RESULTS', '2'))
+LOCAL_MATCH_MAX_RESULTS = int(os.getenv('LOCAL_MATCH_MAX_RESULTS', '4'))
+_MOVIE_INDEX = MovieIndex(
+    max_movies=LOCAL_INDEX_MAX_MOVIES,
+    rebuild_interval=float(os.getenv('LOCAL_INDEX_REBUILD_SECONDS', '5')),
+)
+
+def fallback_catalog():
+    """The curated catalog; the first call loads it and seeds the local index"""
+    global _FALLBACK_CATALOG
+    if _FALLBACK_CATALOG is None:
+        with _FALLBACK_CATALOG_LOCK:
+            if _FALLBACK_CATALOG is None:
+                catalog = FallbackCatalog.load(FALLBACK_CATALOG_PATH)
+                for region, movies in catalog.by_region.items():
+                    _MOVIE_INDEX.add_many([movie.to_dict() for movie in movies], region=region)
+                _FALLBACK_CATALOG = catalog
+    return _FALLBACK_CATALOG
+
+@STAGE_SECONDS.labels('fallback').timed
+def get_fallback_movies(mood, preference='mixed'):
     """Provide fallback movie recommendations when API fails"""
-    # Per-mood shortlists (curated, mixed Bollywood/Hollywood) – at least 8 each
-    mood_lists = {
-        "happy": [
-            {"id": "f_h_1", "title": "3 Idiots", "overview": "A comedy-drama about friendship and following your dreams.", "rating": 8.4, "poster_url": "https://image.tmdb.org/t/p/w500/66A9MqXOyVp71a6tB3k1apLNj8S.jpg", "release_date": "2009"},
-            {"id": "f_h_2", "title": "The Hangover", "overview": "A comedy about a bachelor party gone wrong in Las Vegas.", "rating": 7.7, "poster_url": "https://image.tmdb.org/t/p/w500/4qM1o4XZfVzPhKxW0a4t8qH5z8J.jpg", "release_date": "2009"},
-            {"id": "f_h_3", "title": "Munna Bhai M.B.B.S.", "overview": "A gangster enrolls in medical college to fulfill his father's dream.", "rating": 8.1, "poster_url": "https://image.tmdb.org/t/p/w500/jQG3t2Z2YEl5GQY2QdYwz0S2w3f.jpg", "release_date": "2003"},
-            {"id": "f_h_4", "title": "Zindagi Na Milegi Dobara", "overview": "Three friends take a road trip that changes their lives.", "rating": 8.0, "poster_url": "https://image.tmdb.org/t/p/w500/ao0nC0mZ4FcKqJsteVEh9UpAJZK.jpg", "release_date": "2011"},
-            {"id": "f_h_5", "title": "PK", "overview": "An alien on Earth loses his communication device and explores humanity.", "rating": 8.0, "poster_url": "https://image.tmdb.org/t/p/w500/k1QUCjNAkfRpWfm1dVJGUmVHzGv.jpg", "release_date": "2014"},
-            {"id": "f_h_6", "title": "Superbad", "overview": "Two friends try to enjoy their last weeks of high school.", "rating": 7.6, "poster_url": "https://image.tmdb.org/t/p/w500/ek8e8txUyUwd2BNqj6lFEerJfbq.jpg", "release_date": "2007"},
-            {"id": "f_h_7", "title": "Hera Pheri", "overview": "Three men get caught up in a kidnapping gone wrong.", "rating": 8.1, "poster_url": "https://image.tmdb.org/t/p/w500/8oNbyz1Cdm42Hcps225y7sY9qsK.jpg", "release_date": "2000"},
-            {"id": "f_h_8", "title": "Jumanji: Welcome to the Jungle", "overview": "Teens get sucked into a video game adventure.", "rating": 6.9, "poster_url": "https://image.tmdb.org/t/p/w500/bXrZ5iHBEjH7WMidbUDQ0U2xbmr.jpg", "release_date": "2017"}
-        ],
-        "sad": [
-            {"id": "f_s_1", "title": "Taare Zameen Par", "overview": "A dyslexic child's life changes when he meets an art teacher.", "rating": 8.1, "poster_url": "https://image.tmdb.org/t/p/w500/2aEoG9V7H5PHeTtNQ2rYZRk5vK1.jpg", "release_date": "2007"},
-            {"id": "f_s_2", "title": "The Pursuit of Happyness", "overview": "A struggling salesman takes custody of his son.", "rating": 8.0, "poster_url": "https://image.tmdb.org/t/p/w500/bO9WFb7GZ7YzWxZmf0RduCMsZV3.jpg", "release_date": "2006"},
-            {"id": "f_s_3", "title": "Kal Ho Naa Ho", "overview": "A man teaches a woman how to love and live.", "rating": 7.8, "poster_url": "https://image.tmdb.org/t/p/w500/2Yx2oyS9MhUlCT3VkOITkkpZRlm.jpg", "release_date": "2003"},
-            {"id": "f_s_4", "title": "Grave of the Fireflies", "overview": "Siblings struggle to survive in wartime Japan.", "rating": 8.5, "poster_url": "https://image.tmdb.org/t/p/w500/4u1vptE8aXuzwNqp1S3z3bWQp6y.jpg", "release_date": "1988"},
-            {"id": "f_s_5", "title": "Masaan", "overview": "Four lives intersect along the Ganges.", "rating": 8.0, "poster_url": "https://image.tmdb.org/t/p/w500/9zA3RDeo63HgNbUsVTNff7kwh28.jpg", "release_date": "2015"},
-            {"id": "f_s_6", "title": "A Beautiful Mind", "overview": "A brilliant mathematician battles schizophrenia.", "rating": 8.2, "poster_url": "https://image.tmdb.org/t/p/w500/zwzWCmH72OSC9NA0ipoqw5Zjya8.jpg", "release_date": "2001"},
-            {"id": "f_s_7", "title": "Barfi!", "overview": "A deaf and mute man navigates love and life.", "rating": 7.4, "poster_url": "https://image.tmdb.org/t/p/w500/a9YVh1SeDsICoZ6irMIXja2fJG0.jpg", "release_date": "2012"},
-            {"id": "f_s_8", "title": "Manchester by the Sea", "overview": "A janitor returns to his hometown after a tragedy.", "rating": 7.7, "poster_url": "https://image.tmdb.org/t/p/w500/xt7xQCFaN7G42xvAfoyz1K77QSq.jpg", "release_date": "2016"}
-        ],
-        "romantic": [
-            {"id": "f_r_1", "title": "Kuch Kuch Hota Hai", "overview": "Friendship turns into love across years.", "rating": 7.5, "poster_url": "https://image.tmdb.org/t/p/w500/nC6YewsGmmKzBSSMSmc5QwDFi1C.jpg", "release_date": "1998"},
-            {"id": "f_r_2", "title": "The Notebook", "overview": "A summer romance that lasts a lifetime.", "rating": 7.8, "poster_url": "https://image.tmdb.org/t/p/w500/rNzQyW4f8B8cQeg6XyC1XtnG9Sh.jpg", "release_date": "2004"},
-            {"id": "f_r_3", "title": "Yeh Jawaani Hai Deewani", "overview": "Friends, travel and love.", "rating": 7.2, "poster_url": "https://image.tmdb.org/t/p/w500/2mW7UZ5EKeosFVJeGb3PcTJS3BM.jpg", "release_date": "2013"},
-            {"id": "f_r_4", "title": "Before Sunrise", "overview": "Two strangers meet on a train and wander Vienna.", "rating": 8.1, "poster_url": "https://image.tmdb.org/t/p/w500/9B39S2hY6G4qzM7gc3KJ2YMBX1A.jpg", "release_date": "1995"},
-            {"id": "f_r_5", "title": "Tamasha", "overview": "A man struggles between societal expectations and passion.", "rating": 7.2, "poster_url": "https://image.tmdb.org/t/p/w500/gIMiAFDzy83H8XTur2qxGn8pYt8.jpg", "release_date": "2015"},
-            {"id": "f_r_6", "title": "La La Land", "overview": "Love and ambition in Los Angeles.", "rating": 8.0, "poster_url": "https://image.tmdb.org/t/p/w500/uDO8zWDhfWwoFdKS4fzkUJt0Rf0.jpg", "release_date": "2016"},
-            {"id": "f_r_7", "title": "Dil Bechara", "overview": "A poignant love story inspired by TFiOS.", "rating": 7.6, "poster_url": "https://image.tmdb.org/t/p/w500/h0rXWmWZKD0wC2WkP3cu6Uytzsz.jpg", "release_date": "2020"},
-            {"id": "f_r_8", "title": "Notting Hill", "overview": "A bookseller falls for a film star.", "rating": 7.3, "poster_url": "https://image.tmdb.org/t/p/w500/6u1fYtxG5eqjhtCPDx04pJphQRW.jpg", "release_date": "1999"}
-        ],
-        "excited": [
-            {"id": "f_e_1", "title": "Dhoom 3", "overview": "High-octane heists and chases.", "rating": 6.8, "poster_url": "https://image.tmdb.org/t/p/w500/8JQZ2rCA0nVddOZXS6jttuPAHy9.jpg", "release_date": "2013"},
-            {"id": "f_e_2", "title": "Mission: Impossible - Fallout", "overview": "Ethan Hunt and team prevent global catastrophe.", "rating": 7.7, "poster_url": "https://image.tmdb.org/t/p/w500/AkJQpZp9WoNdj7pLYSj1L0RcMMN.jpg", "release_date": "2018"},
-            {"id": "f_e_3", "title": "War", "overview": "An elite soldier hunts his rogue mentor.", "rating": 6.5, "poster_url": "https://image.tmdb.org/t/p/w500/pV3Hn6Nq35p3xNmPR9U1FVLtZLk.jpg", "release_date": "2019"},
-            {"id": "f_e_4", "title": "Mad Max: Fury Road", "overview": "Post-apocalyptic chase saga.", "rating": 8.1, "poster_url": "https://image.tmdb.org/t/p/w500/8tZYtuWezp8JbcsvHYO0O46tFbo.jpg", "release_date": "2015"},
-            {"id": "f_e_5", "title": "Pathaan", "overview": "An Indian spy embarks on a dangerous mission.", "rating": 6.6, "poster_url": "https://image.tmdb.org/t/p/w500/ayrG9q24apqYh6g82kTFogyXv3E.jpg", "release_date": "2023"},
-            {"id": "f_e_6", "title": "John Wick", "overview": "A retired hitman seeks vengeance.", "rating": 7.4, "poster_url": "https://image.tmdb.org/t/p/w500/fZPSd91yGE9fCcCe6OoQr6E3Bev.jpg", "release_date": "2014"},
-            {"id": "f_e_7", "title": "RRR", "overview": "Two legendary revolutionaries forge a bond.", "rating": 7.8, "poster_url": "https://image.tmdb.org/t/p/w500/6WExLObz0SqGZQhQ0imeISFRCGD.jpg", "release_date": "2022"},
-            {"id": "f_e_8", "title": "The Dark Knight", "overview": "Batman faces the Joker.", "rating": 9.0, "poster_url": "https://image.tmdb.org/t/p/w500/qJ2tW6WMUDux911r6m7haRef0WH.jpg", "release_date": "2008"}
-        ],
-        "angry": [
-            {"id": "f_a_1", "title": "John Wick", "overview": "A retired hitman seeks vengeance.", "rating": 7.4, "poster_url": "https://image.tmdb.org/t/p/w500/fZPSd91yGE9fCcCe6OoQr6E3Bev.jpg", "release_date": "2014"},
-            {"id": "f_a_2", "title": "Mad Max: Fury Road", "overview": "Post-apocalyptic chase saga.", "rating": 8.1, "poster_url": "https://image.tmdb.org/t/p/w500/8tZYtuWezp8JbcsvHYO0O46tFbo.jpg", "release_date": "2015"},
-            {"id": "f_a_3", "title": "Kaithi", "overview": "An ex-convict gets caught up in a night-long chase.", "rating": 8.3, "poster_url": "https://image.tmdb.org/t/p/w500/9dI2wAPOQg8nH9n1tFoZT3zhEXI.jpg", "release_date": "2019"},
-            {"id": "f_a_4", "title": "Baby", "overview": "An elite Indian counter-intelligence unit hunts terrorists.", "rating": 7.8, "poster_url": "https://image.tmdb.org/t/p/w500/vQ8G2GNJUgIVbawn94Qh1gC7YpN.jpg", "release_date": "2015"},
-            {"id": "f_a_5", "title": "The Dark Knight", "overview": "Batman faces the Joker.", "rating": 9.0, "poster_url": "https://image.tmdb.org/t/p/w500/qJ2tW6WMUDux911r6m7haRef0WH.jpg", "release_date": "2008"},
-            {"id": "f_a_6", "title": "Extraction", "overview": "A black ops mercenary embarks on a deadly mission in Dhaka.", "rating": 6.8, "poster_url": "https://image.tmdb.org/t/p/w500/wlfDxbGEsW58vGhFljKkcR5IxDj.jpg", "release_date": "2020"},
-            {"id": "f_a_7", "title": "Pathaan", "overview": "An Indian spy embarks on a dangerous mission.", "rating": 6.6, "poster_url": "https://image.tmdb.org/t/p/w500/ayrG9q24apqYh6g82kTFogyXv3E.jpg", "release_date": "2023"},
-            {"id": "f_a_8", "title": "War", "overview": "An elite soldier hunts his rogue mentor.", "rating": 6.5, "poster_url": "https://image.tmdb.org/t/p/w500/pV3Hn6Nq35p3xNmPR9U1FVLtZLk.jpg", "release_date": "2019"}
-        ],
-        "relaxed": [
-            {"id": "f_rl_1", "title": "The Secret Life of Walter Mitty", "overview": "A daydreamer embarks on a global journey.", "rating": 7.2, "poster_url": "https://image.tmdb.org/t/p/w500/tw1r3qYi58E8CUpbZQhQ0imeOqM.jpg", "release_date": "2013"},
-            {"id": "f_rl_2", "title": "Life of Pi", "overview": "A young man survives a disaster at sea on a lifeboat with a tiger.", "rating": 7.9, "poster_url": "https://image.tmdb.org/t/p/w500/3bD5Qn7qSdz8CA0nVddOZXS6jtV.jpg", "release_date": "2012"},
-            {"id": "f_rl_3", "title": "Midnight in Paris", "overview": "A writer discovers midnight transports him to the 1920s.", "rating": 7.6, "poster_url": "https://image.tmdb.org/t/p/w500/4wBG5kbfagTQclETblPRRGihk0I.jpg", "release_date": "2011"},
-            {"id": "f_rl_4", "title": "The Lunchbox", "overview": "A mistaken delivery connects a young housewife and an older man.", "rating": 7.8, "poster_url": "https://image.tmdb.org/t/p/w500/3hFQm3GEXLMaLLq5yRvCNrI6Vsg.jpg", "release_date": "2013"},
-            {"id": "f_rl_5", "title": "Amélie", "overview": "A whimsical depiction of contemporary Parisian life.", "rating": 8.3, "poster_url": "https://image.tmdb.org/t/p/w500/sWGaQbY4Z1cdq9VHtV6nRvWmvMR.jpg", "release_date": "2001"},
-            {"id": "f_rl_6", "title": "October", "overview": "A tender coming-of-age story set in Delhi.", "rating": 7.2, "poster_url": "https://image.tmdb.org/t/p/w500/yZK0YvZCENKz7dxyzKDn5XxhxLq.jpg", "release_date": "2018"},
-            {"id": "f_rl_7", "title": "Chef", "overview": "A chef starts a food truck to reclaim his creativity.", "rating": 7.3, "poster_url": "https://image.tmdb.org/t/p/w500/zfZ7dUnc8mZKVEtKiMyVZbYbK9F.jpg", "release_date": "2014"},
-            {"id": "f_rl_8", "title": "The Hundred-Foot Journey", "overview": "An Indian family opens a restaurant in France.", "rating": 7.3, "poster_url": "https://image.tmdb.org/t/p/w500/bQHIiph0QGlpK1iD7agEXKDkQ5Y.jpg", "release_date": "2014"}
-        ],
-        "bored": [
-            {"id": "f_b_1", "title": "Shutter Island", "overview": "A marshal investigates a disappearance on an island hospital.", "rating": 8.2, "poster_url": "https://image.tmdb.org/t/p/w500/kve20tXwUZpu4GUX8l6X7Z4jmL6.jpg", "release_date": "2010"},
-            {"id": "f_b_2", "title": "Kahaani", "overview": "A pregnant woman searches for her missing husband in Kolkata.", "rating": 7.9, "poster_url": "https://image.tmdb.org/t/p/w500/oK8GMDIS9KuX3sI5Yucs5cjox96.jpg", "release_date": "2012"},
-            {"id": "f_b_3", "title": "Andhadhun", "overview": "A blind pianist is swept up in a murder mystery.", "rating": 8.1, "poster_url": "https://image.tmdb.org/t/p/w500/67ZdZXXAuv5Z7xL7sRKqzZo4PM5.jpg", "release_date": "2018"},
-            {"id": "f_b_4", "title": "Drishyam", "overview": "A father goes to great lengths to protect his family.", "rating": 8.1, "poster_url": "https://image.tmdb.org/t/p/w500/8eQof8I4eAbOeXtfLOcAfeUOLuO.jpg", "release_date": "2013"},
-            {"id": "f_b_5", "title": "Tenet", "overview": "A secret agent manipulates time to prevent World War III.", "rating": 7.3, "poster_url": "https://image.tmdb.org/t/p/w500/k68nPLbIST6NP96JmTxmZijEvCA.jpg", "release_date": "2020"},
-            {"id": "f_b_6", "title": "Detective Byomkesh Bakshy!", "overview": "A young detective probes a sinister conspiracy in 1940s Calcutta.", "rating": 7.5, "poster_url": "https://image.tmdb.org/t/p/w500/9k2YkdEYY5EYXPLkZX31lrT7xYu.jpg", "release_date": "2015"},
-            {"id": "f_b_7", "title": "Arrival", "overview": "A linguist communicates with extraterrestrials.", "rating": 7.9, "poster_url": "https://image.tmdb.org/t/p/w500/x2FJsf1ElAgr63Y3PNPtJrcmpoe.jpg", "release_date": "2016"},
-            {"id": "f_b_8", "title": "Talaash", "overview": "A cop investigates a high-profile death.", "rating": 7.2, "poster_url": "https://image.tmdb.org/t/p/w500/2VtW7UZ5EKeosFVJeGb3PcTJX5r.jpg", "release_date": "2012"}
-        ],
-        "scared": [
-            {"id": "f_sc_1", "title": "The Conjuring", "overview": "Paranormal investigators help a family terrorized by a dark presence.", "rating": 7.5, "poster_url": "https://image.tmdb.org/t/p/w500/wVYREutTvI2tmxr6ujrHT704wGF.jpg", "release_date": "2013"},
-            {"id": "f_sc_2", "title": "Tumbbad", "overview": "A mythological horror set in colonial India.", "rating": 8.2, "poster_url": "https://image.tmdb.org/t/p/w500/nPGZ1YgnPZXoqBYwygJyI07212e.jpg", "release_date": "2018"},
-            {"id": "f_sc_3", "title": "Stree", "overview": "A small town is haunted by a spirit.", "rating": 7.4, "poster_url": "https://image.tmdb.org/t/p/w500/8Lx7x1YgnM7hZ9E9QnUnxEporX2.jpg", "release_date": "2018"},
-            {"id": "f_sc_4", "title": "Hereditary", "overview": "A family unravels terrifying secrets after their matriarch dies.", "rating": 7.3, "poster_url": "https://image.tmdb.org/t/p/w500/bcT8CaBIj086WVD7K529h78eujb.jpg", "release_date": "2018"},
-            {"id": "f_sc_5", "title": "The Ring", "overview": "A cursed videotape kills viewers in seven days.", "rating": 7.1, "poster_url": "https://image.tmdb.org/t/p/w500/e2t5CKXQwZ0pniNXh9vDOMkMt2g.jpg", "release_date": "2002"},
-            {"id": "f_sc_6", "title": "Bhoot", "overview": "A couple's life turns nightmarish in a haunted apartment.", "rating": 6.3, "poster_url": "https://image.tmdb.org/t/p/w500/f9G4mJcP0xK3opYJwcYqKqRR3YK.jpg", "release_date": "2003"},
-            {"id": "f_sc_7", "title": "Train to Busan", "overview": "Passengers fight to survive on a zombie-infested train.", "rating": 7.6, "poster_url": "https://image.tmdb.org/t/p/w500/2oRRTPNtozgPhOa9CYZiVl4GRQ5.jpg", "release_date": "2016"},
-            {"id": "f_sc_8", "title": "The Nun", "overview": "A priest and novice uncover unholy secrets.", "rating": 5.8, "poster_url": "https://image.tmdb.org/t/p/w500/sFC1ElvoKGdHJIWRpNB3xWJ9lJA.jpg", "release_date": "2018"}
-        ],
-        "nostalgic": [
-            {"id": "f_n_1", "title": "Lagaan", "overview": "Villagers challenge British officers to a cricket match.", "rating": 8.1, "poster_url": "https://image.tmdb.org/t/p/w500/ucW5Z7WvyaManIeZDV4SSQdlqz7.jpg", "release_date": "2001"},
-            {"id": "f_n_2", "title": "Swades", "overview": "An NRI returns to India and rediscovers home.", "rating": 8.2, "poster_url": "https://image.tmdb.org/t/p/w500/y6VAk0nnBYnCTsRmR271GGBqBPd.jpg", "release_date": "2004"},
-            {"id": "f_n_3", "title": "Anand", "overview": "A terminally ill man spreads joy.", "rating": 8.1, "poster_url": "https://image.tmdb.org/t/p/w500/1ZJYG1ChB7sCv0xOsyjzAm8h1Hc.jpg", "release_date": "1971"},
-            {"id": "f_n_4", "title": "Sholay", "overview": "Two criminals are hired to capture a ruthless bandit.", "rating": 8.2, "poster_url": "https://image.tmdb.org/t/p/w500/j1zAr72Xd23LSeX776BF3nf6tDr.jpg", "release_date": "1975"},
-            {"id": "f_n_5", "title": "Hum Aapke Hain Koun..!", "overview": "A family drama about love and relationships.", "rating": 7.5, "poster_url": "https://image.tmdb.org/t/p/w500/6NKxaz2YsmiVjCwXTkA8azhbugi.jpg", "release_date": "1994"},
-            {"id": "f_n_6", "title": "Guide", "overview": "A tour guide falls in love and seeks redemption.", "rating": 8.1, "poster_url": "https://image.tmdb.org/t/p/w500/7wY2Gj33jjXNMTvEihQ6VbUaz2Q.jpg", "release_date": "1965"},
-            {"id": "f_n_7", "title": "The Sound of Music", "overview": "A governess brings music to a family in Austria.", "rating": 8.0, "poster_url": "https://image.tmdb.org/t/p/w500/qgM1b9DLG3sZ3VAb9YSEuxsjjXN.jpg", "release_date": "1965"},
-            {"id": "f_n_8", "title": "Forrest Gump", "overview": "A man witnesses historic events with simple wisdom.", "rating": 8.8, "poster_url": "https://image.tmdb.org/t/p/w500/saHP97rTPS5eLmrLQEcANmKrsFl.jpg", "release_date": "1994"}
-        ],
-        "adventurous": [
-            {"id": "f_adv_1", "title": "Pirates of the Caribbean: The Curse of the Black Pearl", "overview": "A blacksmith teams up with a pirate to save his love.", "rating": 8.0, "poster_url": "https://image.tmdb.org/t/p/w500/1Jw2GNbKwxLBzME2YkdBqtu1o9Y.jpg", "release_date": "2003"},
-            {"id": "f_adv_2", "title": "Indiana Jones and the Last Crusade", "overview": "Indiana searches for the Holy Grail.", "rating": 8.2, "poster_url": "https://image.tmdb.org/t/p/w500/4p1N2Qrt8j0H8xMHMHvtRxv9weZ.jpg", "release_date": "1989"},
-            {"id": "f_adv_3", "title": "Baahubali 2: The Conclusion", "overview": "Mahendra Baahubali avenges his father.", "rating": 7.9, "poster_url": "https://image.tmdb.org/t/p/w500/3GZbE2wAPO8nH9n1tFoZT3zhEXI.jpg", "release_date": "2017"},
-            {"id": "f_adv_4", "title": "Krrish", "overview": "An Indian superhero discovers his powers.", "rating": 6.8, "poster_url": "https://image.tmdb.org/t/p/w500/7pGdb9h9NP7VDaRao7IhiHBpjz2.jpg", "release_date": "2006"},
-            {"id": "f_adv_5", "title": "The Jungle Book", "overview": "Mowgli returns to the jungle in this live-action adaptation.", "rating": 7.4, "poster_url": "https://image.tmdb.org/t/p/w500/vOipe2myi26UDwP978hsYOrnUWC.jpg", "release_date": "2016"},
-            {"id": "f_adv_6", "title": "Guardians of the Galaxy", "overview": "A group of intergalactic criminals must save the universe.", "rating": 7.9, "poster_url": "https://image.tmdb.org/t/p/w500/y31QB9kn3XSudA15tV7UWQ9XLuW.jpg", "release_date": "2014"},
-            {"id": "f_adv_7", "title": "Jumanji: Welcome to the Jungle", "overview": "Teens get sucked into a video game adventure.", "rating": 6.9, "poster_url": "https://image.tmdb.org/t/p/w500/bXrZ5iHBEjH7WMidbUDQ0U2xbmr.jpg", "release_date": "2017"},
-            {"id": "f_adv_8", "title": "The Revenant", "overview": "A frontiersman fights for survival in the wilderness.", "rating": 8.0, "poster_url": "https://image.tmdb.org/t/p/w500/oXUWEc5i3wYyFnL1Ycu8ppxxPvs.jpg", "release_date": "2015"}
-        ]
+    # Per-mood shortlist first, then the general pool (at least 12 picks)
+    return [movie.to_dict() for movie in fallback_catalog().picks(mood, preference, count=12)]
+
+def movie_search_request(mood_query):
+    """URL, headers and params for an AI Movie Recommender search"""
+    url = f"{RAPIDAPI_BASE_URL}/search"
+    
+    headers = {
+        'x-rapidapi-host': RAPIDAPI_HOST,
+        'x-rapidapi-key': RAPIDAPI_KEY
+    }
+    
+    params = {
+        'q': mood_query
     }
+    return url, headers, params
 
-    general_pool = [
-        {"id": "g_1", "title": "Inception", "overview": "A thief steals corporate secrets through dream-sharing.", "rating": 8.8, "poster_url": "https://image.tmdb.org/t/p/w500/edv5CZvWj09upOsy2Y6IwDhK8bt.jpg", "release_date": "2010"},
-        {"id": "g_2", "title": "Dangal", "overview": "A father trains his daughters to become wrestlers.", "rating": 8.3, "poster_url": "https://image.tmdb.org/t/p/w500/p2lVAcPuRPSO8Al6hDDGw0OgMi8.jpg", "release_date": "2016"},
-        {"id": "g_3", "title": "Andhadhun", "overview": "A blind pianist is swept up in a murder mystery.", "rating": 8.1, "poster_url": "https://image.tmdb.org/t/p/w500/67ZdZXXAuv5Z7xL7sRKqzZo4PM5.jpg", "release_date": "2018"},
-        {"id": "g_4", "title": "Interstellar", "overview": "Explorers travel through a wormhole in space.", "rating": 8.6, "poster_url": "https://image.tmdb.org/t/p/w500/gEU2QniE6E77NI6lCU6MxlNBvIx.jpg", "release_date": "2014"},
-        {"id": "g_5", "title": "Drishyam", "overview": "A father does whatever it takes to protect his family.", "rating": 8.1, "poster_url": "https://image.tmdb.org/t/p/w500/8eQof8I4eAbOeXtfLOcAfeUOLuO.jpg", "release_date": "2013"}
-    ]
+def parse_movie_results(data, limit):
+    """Turn an AI Movie Recommender search response into our movie dicts"""
+    movies = []
+    
+    # Handle the specific response format from AI Movie Recommender API
+    movie_results = data.get('movies', [])
+    
+    for movie in movie_results[:limit]:
+        # Prefer TMDB poster_path/backdrop_path when present
+        poster_url = None
+        poster_path = movie.get('poster_path')
+        if poster_path:
+            if not str(poster_path).startswith('/'):
+                poster_path = f"/{poster_path}"
+            poster_url = f"https://image.tmdb.org/t/p/w500{poster_path}"
+        elif movie.get('backdrop_path'):
+            bp = movie.get('backdrop_path')
+            if not str(bp).startswith('/'):
+                bp = f"/{bp}"
+            poster_url = f"https://image.tmdb.org/t/p/w500{bp}"
+        else:
+            # Fallback fields sometimes provided by other APIs
+            raw = movie.get('poster_url') or movie.get('poster') or movie.get('image')
+            # Some sources return relative TMDB path without host
+            if raw and isinstance(raw, str):
+                if raw.startswith('/'):  # TMDB-like
+                    poster_url = f"https://image.tmdb.org/t/p/w500{raw}"
+                elif raw.startswith('http'):  # absolute
+                    poster_url = raw
+                else:
+                    poster_url = None
+            else:
+                poster_url = None
 
-    # Compose at least 12 recommendations by mixing mood list then general pool
-    picks = []
-    seen = set()
-    for item in mood_lists.get(mood, mood_lists["happy"]):
-        key = item.get('id') or item.get('title')
-        if key not in seen:
-            seen.add(key)
-            picks.append(item)
-            if len(picks) >= 12:
-                break
-    if len(picks) < 12:
-        for item in general_pool:
-            key = item.get('id') or item.get('title')
-            if key not in seen:
-                seen.add(key)
-                picks.append(item)
-                if len(picks) >= 12:
-                    break
+        # Parse movie data from the API response
+        movie_data = {
+            'id': movie.get('id'),
+            'title': movie.get('title') or movie.get('name'),
+            'overview': movie.get('overview', 'No overview available'),
+            'rating': round(float(movie.get('vote_average', 0) or 0), 1),
+            'poster_url': poster_url,
+            'release_date': movie.get('release_date', movie.get('year', 'Unknown'))
+        }
+        
+        # Clean up the data
+        if movie_data['overview'] and len(movie_data['overview']) > 500:
+            movie_data['overview'] = movie_data['overview'][:500] + "..."
+        
+        movies.append(movie_data)
+    return movies
 
-    return picks
+def _movie_cache_key(mood_query, limit):
+    return f"amr::{mood_query.lower()}::{limit}"
 
 def get_movies_by_mood(mood_query, limit=10):
     """Fetch movies from AI Movie Recommender API based on mood query"""
+    return fetch_movies(mood_query, limit)[0]
+
+def fetch_movies(mood_query, limit=10, deadline=None):
+    """Like get_movies_by_mood, but returns (movies, stale).
+
+    A stale cache entry is returned immediately and refreshed in the
+    background; only a miss waits on the upstream call, and on a rate-limit
+    token for at most until the deadline.
+    """
+    started = time.perf_counter()
+    # Cache first
+    cache_key = _movie_cache_key(mood_query, limit)
+    hit = _cache_lookup(cache_key)
+    if hit is not None:
+        return _use_cached(hit, mood_query, limit, cache_key, started)
+    movies = _MOVIE_FLIGHTS.do(cache_key, _fetch_movies_upstream, mood_query, limit, cache_key, False, deadline)
+    _LOOKUP_MISS.observe(time.perf_counter() - started)
+    _MOVIE_INDEX.add_many(movies)
+    return movies, False
+
+def _use_cached(hit, mood_query, limit, cache_key, started):
+    """fetch_movies' answer for a _cache_lookup hit; stale entries get a background refresh"""
+    movies, stale = hit
+    if stale:
+        _schedule_refresh(cache_key, mood_query, limit)
+    (_LOOKUP_STALE if stale else _LOOKUP_HIT).observe(time.perf_counter() - started)
+    _MOVIE_INDEX.add_many(movies)
+    return movies, stale
+
+_REFRESHING = set()
+_REFRESHING_LOCK = threading.Lock()
+
+def _schedule_refresh(cache_key, mood_query, limit):
+    """Refresh a stale entry on the fetch pool, at most once at a time per key"""
+    with _REFRESHING_LOCK:
+        if cache_key in _REFRESHING:
+            return
+        _REFRESHING.add(cache_key)
+
+    def refresh():
+        try:
+            _MOVIE_FLIGHTS.do(cache_key, _fetch_movies_upstream, mood_query, limit, cache_key)
+        finally:
+            with _REFRESHING_LOCK:
+                _REFRESHING.discard(cache_key)
+
     try:
-        # Cache first
-        cache_key = f"amr::{mood_query.lower()}::{limit}"
-        cached = _cache_get(cache_key)
+        _FETCH_POOL.submit(refresh)
+    except RuntimeError:
+        # Pool shut down (worker exiting); keep serving the stale value
+        with _REFRESHING_LOCK:
+            _REFRESHING.discard(cache_key)
+
+def _fetch_movies_upstream(mood_query, limit, cache_key, force=False, deadline=None):
+    """Single-flight body of get_movies_by_mood: one upstream search per key"""
+    try:
+        # Another caller may have filled the cache while we queued for the flight
+        cached = None if force else _cache_get(cache_key)
         if cached is not None:
             return cached
-        # Encode the query for URL
-        encoded_query = urllib.parse.quote(mood_query)
-        url = f"{RAPIDAPI_BASE_URL}/search"
-        
-        headers = {
-            'x-rapidapi-host': RAPIDAPI_HOST,
-            'x-rapidapi-key': RAPIDAPI_KEY
-        }
-        
-        params = {
-            'q': mood_query
-        }
-        
-        response = requests.get(url, headers=headers, params=params, timeout=15)
+        url, headers, params = movie_search_request(mood_query)
+        _MOVIE_GOVERNOR.before_request(time_left(deadline))
+        started = time.perf_counter()
+        try:
+            response = requests.get(url, headers=headers, params=params, timeout=15)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            observe_upstream(RAPIDAPI_HOST, started, 'timeout')
+            _MOVIE_GOVERNOR.observe_timeout()
+            raise
+        observe_upstream(RAPIDAPI_HOST, started, response.status_code)
+        _MOVIE_GOVERNOR.observe_response(response)
         response.raise_for_status()
         
-        data = response.json()
-        movies = []
-        
-        # Handle the specific response format from AI Movie Recommender API
-        movie_results = data.get('movies', [])
-        
-        for movie in movie_results[:limit]:
-            # Prefer TMDB poster_path/backdrop_path when present
-            poster_url = None
-            poster_path = movie.get('poster_path')
-            if poster_path:
-                if not str(poster_path).startswith('/'):
-                    poster_path = f"/{poster_path}"
-                poster_url = f"https://image.tmdb.org/t/p/w500{poster_path}"
-            elif movie.get('backdrop_path'):
-                bp = movie.get('backdrop_path')
-                if not str(bp).startswith('/'):
-                    bp = f"/{bp}"
-                poster_url = f"https://image.tmdb.org/t/p/w500{bp}"
-            else:
-                # Fallback fields sometimes provided by other APIs
-                raw = movie.get('poster_url') or movie.get('poster') or movie.get('image')
-                # Some sources return relative TMDB path without host
-                if raw and isinstance(raw, str):
-                    if raw.startswith('/'):  # TMDB-like
-                        poster_url = f"https://image.tmdb.org/t/p/w500{raw}"
-                    elif raw.startswith('http'):  # absolute
-                        poster_url = raw
-                    else:
-                        poster_url = None
-                else:
-                    poster_url = None
-
-            # Parse movie data from the API response
-            movie_data = {
-                'id': movie.get('id'),
-                'title': movie.get('title') or movie.get('name'),
-                'overview': movie.get('overview', 'No overview available'),
-                'rating': round(float(movie.get('vote_average', 0) or 0), 1),
-                'poster_url': poster_url,
-                'release_date': movie.get('release_date', movie.get('year', 'Unknown'))
-            }
-            
-            # Clean up the data
-            if movie_data['overview'] and len(movie_data['overview']) > 500:
-                movie_data['overview'] = movie_data['overview'][:500] + "..."
-            
-            movies.append(movie_data)
-        
+        movies = parse_movie_results(response.json(), limit)
         _cache_set(cache_key, movies)
         return movies
     
@@ -297,7 +423,10 @@ def get_movies_by_mood(mood_query, limit=10):
         status = getattr(e.response, 'status_code', None)
         print(f"HTTP error for query '{mood_query}': {status} -> {e}")
         if status == 429:
-            print("Rate limit hit, will try simpler queries and cached results where possible")
+            print("Rate limit hit, backing off until the quota resets")
+        return []
+    except UpstreamUnavailable as e:
+        print(f"Skipping query '{mood_query}': {e}")
         return []
     except requests.exceptions.RequestException as e:
         print(f"Request error for query '{mood_query}': {e}")
@@ -306,6 +435,234 @@ def get_movies_by_mood(mood_query, limit=10):
         print(f"Unexpected error for query '{mood_query}': {e}")
         return []
 
+def _movie_key(movie):
+    return movie.get('id') or movie.get('title')
+
+def iter_movies_concurrently(queries, target_count, deadline=None, enough=None):
+    """Run fetch_movies for every query in parallel, yielding results as they land.
+
+    Each query asks for target_count movies, so it shares its cache entry
+    with every other request for it. Yields (query, movies, stale) in
+    completion order for each query that returned movies. As soon as
+    `enough` (default target_count) unique movies have been yielded (or the
+    deadline passes, or the caller stops iterating) the queries that have
+    not started yet are cancelled; ones already in flight finish in the
+    background and still populate the cache.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + RECOMMEND_DEADLINE_SECONDS
+    if enough is None:
+        enough = target_count
+    futures = {_FETCH_POOL.submit(fetch_movies, q, target_count, deadline): q for q in queries}
+    pending = set(futures)
+    seen = set()
+    try:
+        while pending and len(seen) < enough:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"⏱️ Deadline reached with {len(pending)} queries outstanding")
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for fut in done:
+                query = futures[fut]
+                try:
+                    new_movies, new_stale = fut.result()
+                except Exception as e:
+                    print(f"❌ Query '{query}' failed: {e}")
+                    continue
+                if new_movies:
+                    seen.update(_movie_key(m) for m in new_movies)
+                    print(f"✅ Query '{query}' returned {len(new_movies)} movies")
+                    yield query, new_movies, new_stale
+                else:
+                    print(f"❌ Query '{query}' returned no movies")
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+def _collect(results):
+    """Flatten (query, movies, stale) results into (movies, used_queries, stale)"""
+    movies = []
+    used_queries = []
+    stale = False
+    for query, new_movies, new_stale in results:
+        movies.extend(new_movies)
+        used_queries.append(query)
+        stale = stale or new_stale
+    return movies, used_queries, stale
+
+def fetch_movies_concurrently(queries, target_count, deadline=None, enough=None):
+    """Fetch all queries in parallel; returns (movies, used_queries, stale).
+
+    stale is True if any result came from a stale cache entry.
+    """
+    return _collect(iter_movies_concurrently(queries, target_count, deadline, enough))
+
+def _trailer_cache_get(cache_key):
+    """Return the cached trailer record ({'videoId': ...}) or None on a miss.
+
+    Negative records ({'videoId': None}) expire after TRAILER_NEGATIVE_TTL_SECONDS
+    so titles that get a trailer later are picked up again.
+    """
+    rec = _TRAILER_CACHE.get(cache_key)
+    if rec is None:
+        return None
+    if rec.get('videoId') is None and time.time() - rec.get('checked_at', 0) > TRAILER_NEGATIVE_TTL_SECONDS:
+        return None
+    return rec
+
+def _trailer_cache_key(title, year=''):
+    query = f"{title} official trailer {year}".strip()
+    return query, f"yt::{query.lower()}"
+
+@STAGE_SECONDS.labels('trailer').timed
+def lookup_trailer(title, year='', deadline=None):
+    """Return the YouTube video ID of a movie's trailer, or None"""
+    query, cache_key = _trailer_cache_key(title, year)
+    cached = _trailer_cache_get(cache_key)
+    if cached is not None:
+        return cached['videoId']
+    return _TRAILER_FLIGHTS.do(cache_key, _fetch_trailer_upstream, query, cache_key, deadline)
+
+def trailer_search_request(query):
+    """URL, headers and params for a YouTube v3.1 trailer search"""
+    headers = {
+        'x-rapidapi-host': YOUTUBE_RAPID_HOST,
+        'x-rapidapi-key': RAPIDAPI_KEY
+    }
+    params = {
+        'q': query,
+        'part': 'id,snippet',
+        'type': 'video',
+        'maxResults': 1
+    }
+    return YOUTUBE_SEARCH_URL, headers, params
+
+def parse_trailer_result(data):
+    """Video ID of the first search hit, or None"""
+    items = data.get('items', [])
+    return items[0].get('id', {}).get('videoId') if items else None
+
+def _fetch_trailer_upstream(query, cache_key, deadline=None):
+    """Single-flight body of lookup_trailer: one YouTube search per key"""
+    cached = _trailer_cache_get(cache_key)
+    if cached is not None:
+        return cached['videoId']
+    url, headers, params = trailer_search_request(query)
+    _TRAILER_GOVERNOR.before_request(time_left(deadline))
+    started = time.perf_counter()
+    try:
+        resp = requests.get(url, headers=headers, params=params, timeout=15)
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+        observe_upstream(YOUTUBE_RAPID_HOST, started, 'timeout')
+        _TRAILER_GOVERNOR.observe_timeout()
+        raise
+    observe_upstream(YOUTUBE_RAPID_HOST, started, resp.status_code)
+    _TRAILER_GOVERNOR.observe_response(resp)
+    resp.raise_for_status()
+    video_id = parse_trailer_result(resp.json())
+    # Only a successful search is cached; errors are retried next time
+    _TRAILER_CACHE.set(cache_key, {'videoId': video_id, 'checked_at': time.time()})
+    return video_id
+
+def lookup_trailers(movies):
+    """Resolve trailer IDs for many (title, year) pairs in one go.
+
+    Cache hits are answered directly; misses are fetched in parallel on the
+    shared fetch pool. Returns one record per pair, in input order:
+    {'videoId': id} once YouTube has answered (None meaning there is no
+    trailer), or {'error': message} when the lookup failed or ran out of
+    time and is worth retrying.
+    """
+    results = [None] * len(movies)
+    futures = {}
+    deadline = time.monotonic() + RECOMMEND_DEADLINE_SECONDS
+    for idx, (title, year) in enumerate(movies):
+        query, cache_key = _trailer_cache_key(title, year)
+        cached = _trailer_cache_get(cache_key)
+        if cached is not None:
+            results[idx] = {'videoId': cached['videoId']}
+        else:
+            futures[idx] = _FETCH_POOL.submit(_TRAILER_FLIGHTS.do, cache_key, _fetch_trailer_upstream, query,
+                                              cache_key, deadline)
+    for idx, fut in futures.items():
+        try:
+            results[idx] = {'videoId': fut.result(timeout=max(0, deadline - time.monotonic()))}
+        except Exception as e:
+            fut.cancel()
+            print(f"Error fetching trailer for '{movies[idx][0]}': {e!r}")
+            results[idx] = {'error': TRAILER_LOOKUP_FAILED}
+    return results
+
+def iter_cached_movies(queries, target_count):
+    """Cache-only counterpart of iter_movies_concurrently for when upstream is down.
+
+    Stale entries are used too; yields (query, movies, stale).
+    """
+    for query in queries:
+        hit = _cache_lookup(_movie_cache_key(query, target_count))
+        if hit and hit[0]:
+            yield query, hit[0], hit[1]
+
+def cached_movies_for(queries, target_count):
+    """Cache-only counterpart of fetch_movies_concurrently; returns (movies, used_queries, stale)"""
+    return _collect(iter_cached_movies(queries, target_count))
+
+# Response cache: serialized /trailer and emoji-driven /recommend responses,
+# keyed on the normalized request and served with ETag/Cache-Control so that
+# repeats (and a CDN in front of us) skip the pipeline. 0 seconds disables.
+RESPONSE_CACHE_RECOMMEND_SECONDS = int(os.getenv('RESPONSE_CACHE_RECOMMEND_SECONDS', '300'))
+RESPONSE_CACHE_TRAILER_SECONDS = int(os.getenv('RESPONSE_CACHE_TRAILER_SECONDS', str(24 * 60 * 60)))
+_RESPONSE_CACHE_SETTINGS = {
+    'max_entries': int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '4096')),
+    'max_bytes': int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(32 * 1024 * 1024))),
+    'gzip_min_bytes': int(os.getenv('RESPONSE_CACHE_GZIP_MIN_BYTES', '1024')),  # 0 disables gzip
+}
+_RESPONSE_CACHES = {
+    'recommend': ResponseCache(RESPONSE_CACHE_RECOMMEND_SECONDS, **_RESPONSE_CACHE_SETTINGS),
+    'trailer': ResponseCache(RESPONSE_CACHE_TRAILER_SECONDS, **_RESPONSE_CACHE_SETTINGS),
+}
+
+def trailer_response_key(title, year):
+    return request_key('trailer', {'title': ' '.join(title.lower().split()), 'year': year[:4]})
+
+def recommend_response_key(user_input, preference, limit, emoji_input):
+    """Key for a /recommend body, or None: only emoji-driven requests are cached.
+
+    The key leaves the session out: the cached answer is the shared one, and
+    personalize_recommendation adapts a copy to a session's history.
+    """
+    if emoji_input not in EMOJI_TO_MOOD or not _RESPONSE_CACHES['recommend'].enabled:
+        return None
+    return request_key('recommend', {
+        'mood_text': ' '.join(user_input.lower().split()),
+        'emoji': emoji_input,
+        'preference': preference,
+        'limit': limit,
+    })
+
+def cached_entry(endpoint, key):
+    """Cached response entry for key, or None"""
+    cache = _RESPONSE_CACHES[endpoint]
+    if key is None or not cache.enabled:
+        return None
+    entry = cache.get(key)
+    RESPONSE_CACHE_LOOKUPS.labels(endpoint, 'hit' if entry else 'miss').inc()
+    return entry
+
+def cache_payload(endpoint, key, payload):
+    """Store a response payload; returns the entry, or None when caching is off"""
+    cache = _RESPONSE_CACHES[endpoint]
+    if key is None or not cache.enabled:
+        return None
+    return cache.put(key, payload)
+
+def cached_response(endpoint, entry, cache_status):
+    status, body, headers = _RESPONSE_CACHES[endpoint].respond(
+        entry, request.headers.get('If-None-Match'), request.headers.get('Accept-Encoding'), cache_status,
+        request.method)
+    return Response(body, status=status, headers=headers)
+
 @app.route('/trailer', methods=['GET'])
 def get_trailer():
     """Fetch top YouTube trailer for a movie title using RapidAPI YouTube v3.1"""
@@ -314,190 +671,875 @@ def get_trailer():
         year = request.args.get('year', '').strip()
         if not title:
             return jsonify({'error': 'Missing title'}), 400
-        query = f"{title} official trailer {year}".strip()
-        headers = {
-            'x-rapidapi-host': YOUTUBE_RAPID_HOST,
-            'x-rapidapi-key': RAPIDAPI_KEY
-        }
-        params = {
-            'q': query,
-            'part': 'id,snippet',
-            'type': 'video',
-            'maxResults': 1
-        }
-        resp = requests.get(YOUTUBE_SEARCH_URL, headers=headers, params=params, timeout=15)
-        resp.raise_for_status()
-        data = resp.json()
-        items = data.get('items', [])
-        if not items:
-            return jsonify({'videoId': None})
-        video_id = items[0].get('id', {}).get('videoId')
+        key = trailer_response_key(title, year)
+        entry = cached_entry('trailer', key)
+        if entry is not None:
+            return cached_response('trailer', entry, 'HIT')
+        video_id = lookup_trailer(title, year)
+        # "No trailer" may be an upstream hiccup; lookup_trailer already caches it briefly
+        entry = cache_payload('trailer', key, {'videoId': video_id}) if video_id else None
+        if entry is not None:
+            return cached_response('trailer', entry, 'MISS')
         return jsonify({'videoId': video_id})
     except Exception as e:
-        print(f"Error fetching trailer: {e}")
-        return jsonify({'videoId': None})
+        # Unlike {"videoId": null} ("no trailer"), clients may retry this
+        print(f"Error fetching trailer: {e!r}")
+        return jsonify({'error': TRAILER_LOOKUP_FAILED}), 503
+
+@app.route('/trailers', methods=['POST'])
+def get_trailers():
+    """Resolve trailers for a whole result page: {"movies": [{"title", "year"}, ...]}"""
+    data = request.get_json(silent=True)
+    items = data.get('movies') if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return jsonify({'error': 'Expected a list of movies'}), 400
+    pairs = []
+    for item in items[:TRAILER_BATCH_MAX]:
+        if not isinstance(item, dict):
+            continue
+        title = str(item.get('title') or '').strip()
+        year = str(item.get('year') or '').strip()[:4]
+        if title:
+            pairs.append((title, year))
+    records = lookup_trailers(pairs)
+    return jsonify({
+        'trailers': [
+            {'title': title, 'year': year, **record}
+            for (title, year), record in zip(pairs, records)
+        ]
+    })
+
+# Poster proxy: /poster/<size>/<file> serves TMDB posters from a disk cache,
+# generating the smaller sizes once. With POSTER_PROXY_SIZE set, /recommend
+# returns proxied URLs of that size instead of full w500 TMDB ones.
+POSTER_HOST = 'image.tmdb.org'
+POSTER_SOURCE_URL = os.getenv('POSTER_SOURCE_URL', 'https://image.tmdb.org/t/p/w500')
+POSTER_CACHE_PATH = os.getenv('POSTER_CACHE_PATH', os.path.join(app.instance_path, 'posters'))
+POSTER_CACHE_MAX_BYTES = int(os.getenv('POSTER_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+POSTER_MAX_AGE_SECONDS = int(os.getenv('POSTER_MAX_AGE_SECONDS', str(365 * 24 * 60 * 60)))
+POSTER_WIDTHS = {'w92': 92, 'w154': 154, 'w185': 185, 'w342': 342}
+POSTER_PROXY_SIZE = os.getenv('POSTER_PROXY_SIZE', '')  # empty keeps direct TMDB URLs
+if POSTER_PROXY_SIZE and POSTER_PROXY_SIZE not in (*POSTER_WIDTHS, 'w500'):
+    print(f"Ignoring POSTER_PROXY_SIZE={POSTER_PROXY_SIZE!r}; use one of {', '.join(POSTER_WIDTHS)} or w500")
+    POSTER_PROXY_SIZE = ''
+_TMDB_IMAGE_RE = re.compile(r'^https://image\.tmdb\.org/t/p/[a-z0-9]+/([^/?#]+)$')
+
+def fetch_poster_source(url):
+    """(bytes, content type) of an upstream poster, or None"""
+    started = time.perf_counter()
+    try:
+        response = requests.get(url, timeout=10)
+    except requests.exceptions.RequestException as e:
+        observe_upstream(POSTER_HOST, started, 'timeout')
+        print(f"Poster request error for {url}: {e}")
+        return None
+    observe_upstream(POSTER_HOST, started, response.status_code)
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+    if response.status_code != 200 or not content_type.startswith('image/'):
+        print(f"No poster at {url}: {response.status_code} {content_type}")
+        return None
+    return response.content, content_type
+
+_POSTERS = PosterCache(POSTER_CACHE_PATH, fetch_poster_source, POSTER_SOURCE_URL, POSTER_WIDTHS,
+                       max_bytes=POSTER_CACHE_MAX_BYTES)
+_POSTER_FLIGHTS = SingleFlight()
+
+def load_poster(size, filename):
+    """Poster variant from the disk cache, fetched and resized once on a miss"""
+    if size not in _POSTERS.sizes or not POSTER_FILENAME_RE.match(filename):
+        raise ValueError('Unknown poster')
+    return _POSTER_FLIGHTS.do(f"{size}/{filename}", _POSTERS.get, size, filename)
+
+def poster_headers(poster):
+    return {'ETag': f'"{poster.etag}"', 'Cache-Control': f'public, max-age={POSTER_MAX_AGE_SECONDS}, immutable'}
+
+def proxy_poster_urls(movies):
+    """Movies with TMDB poster URLs pointed at /poster (copies; cached dicts stay untouched)"""
+    if not POSTER_PROXY_SIZE:
+        return movies
+    proxied = []
+    for movie in movies:
+        match = _TMDB_IMAGE_RE.match(movie.get('poster_url') or '')
+        if match and POSTER_FILENAME_RE.match(match.group(1)):
+            movie = dict(movie, poster_url=f"/poster/{POSTER_PROXY_SIZE}/{match.group(1)}")
+        proxied.append(movie)
+    return proxied
+
+@app.route('/poster/<size>/<filename>', methods=['GET'])
+def get_poster(size, filename):
+    """Cached, optionally resized TMDB poster with a strong ETag"""
+    try:
+        poster = load_poster(size, filename)
+    except ValueError:
+        return jsonify({'error': 'Unknown poster'}), 404
+    if poster is None:
+        return jsonify({'error': 'Poster not found'}), 404
+    response = Response(poster.data, mimetype=poster.content_type, headers=poster_headers(poster))
+    return response.make_conditional(request)
+
+def collect_cache_stats(movie_flights=_MOVIE_FLIGHTS, trailer_flights=_TRAILER_FLIGHTS):
+    """Body of /cache/stats; asgi.py passes its own single-flight groups"""
+    stats = _CACHE.stats()
+    stats['trailers'] = _TRAILER_CACHE.stats()
+    stats['coalescing'] = {
+        'movies': movie_flights.stats(),
+        'trailers': trailer_flights.stats(),
+    }
+    stats['upstream'] = {host: gov.stats() for host, gov in all_governors().items()}
+    stats['local_index'] = _MOVIE_INDEX.stats()
+    stats['posters'] = _POSTERS.stats()
+    stats['responses'] = {name: cache.stats() for name, cache in _RESPONSE_CACHES.items()}
+    stats['history'] = _HISTORY.stats()
+    return stats
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Expose cache size and hit/miss/eviction counters for capacity planning"""
+    return jsonify(collect_cache_stats())
+
+@REGISTRY.on_collect
+def _collect_gauges():
+    for name, cache in (('movies', _CACHE), ('trailers', _TRAILER_CACHE)):
+        stats = cache.stats()
+        CACHE_HIT_RATIO.labels(name).set(stats.get('hit_ratio') or 0)
+        CACHE_ENTRIES.labels(name).set(stats.get('entries') or 0)
+    for host, gov in all_governors().items():
+        BREAKER_OPEN.labels(host).set(1 if gov.is_open() else 0)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(REGISTRY.exposition(), content_type=METRICS_CONTENT_TYPE)
+
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _observe_request(response):
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.labels(endpoint, response.status_code).observe(time.perf_counter() - started)
+    return response
 
 @app.route('/')
 def index():
     """Render the home page"""
     return render_template('index.html')
 
-@app.route('/recommend', methods=['POST'])
+# Emoji chips in the UI map straight to a mood, bypassing the classifier
+EMOJI_TO_MOOD = {
+    "😊": "happy", "😢": "sad", "😠": "angry", "😌": "relaxed", "😴": "bored",
+    "🤩": "excited", "💕": "romantic", "😨": "scared", "🕵️": "bored", "🚀": "adventurous"
+}
+
+def parse_recommend_payload(data):
+    """Validate a /recommend body.
+
+    Returns (user_input, preference, limit, emoji_input); raises ValueError
+    with a user-facing message when the input is unusable.
+    """
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
+    user_input = (data.get('mood_text') or '').strip()
+    # Optional controls from frontend
+    preference = (data.get('preference') or 'mixed').lower()  # mixed | indian | hollywood
+    try:
+        limit = int(data.get('limit', 10))
+    except Exception:
+        limit = 10
+    limit = max(4, min(limit, 20))
+    if not user_input:
+        raise ValueError('Please enter how you are feeling')
+    emoji_input = (data.get('emoji') or '').strip()
+    return user_input, preference, limit, emoji_input
+
+def detect_mood(user_input, emoji_input=''):
+    """Analyze sentiment; allow emoji override"""
+    if emoji_input in EMOJI_TO_MOOD:
+        return EMOJI_TO_MOOD[emoji_input]
+    return analyze_sentiment(user_input)
+
+def plan_queries(mood, preference, user_input, text_queries=True):
+    """Queries to try for a request, shuffled to vary ordering across sentiments"""
+    queries = build_queries(mood, preference, user_input, text_queries)
+    random.shuffle(queries)
+    return queries
+
+@STAGE_SECONDS.labels('similarity').timed
+def refine_locally(user_input, preference):
+    """Movies from the local index matching short user text, best first.
+
+    Returns [] unless at least LOCAL_MATCH_MIN_RESULTS movies score above
+    LOCAL_MATCH_MIN_SCORE, so weak matches still go to the search API.
+    """
+    if LOCAL_INDEX_MAX_MOVIES <= 0 or not is_refinement(user_input):
+        return []
+    fallback_catalog()  # seeds the index
+    regions = PREFERENCE_REGIONS.get(preference, PREFERENCE_REGIONS['mixed'])
+    matches = _MOVIE_INDEX.search(user_input, k=LOCAL_MATCH_MAX_RESULTS,
+                                  min_score=LOCAL_MATCH_MIN_SCORE, regions=regions)
+    if len(matches) < LOCAL_MATCH_MIN_RESULTS:
+        _LOCAL_MISS.inc()
+        return []
+    _LOCAL_HIT.inc()
+    return [movie for score, movie in matches]
+
+def local_query_label(user_input):
+    return f"local: {user_input.lower()}"
+
+def plan_request(mood, preference, user_input):
+    """(queries, local_movies) for a request.
+
+    When the local index answers the user's text, only the templated
+    (shared, cache-friendly) queries are sent upstream.
+    """
+    local_movies = refine_locally(user_input, preference)
+    return plan_queries(mood, preference, user_input, text_queries=not local_movies), local_movies
+
+# Per-session history of shown movies, so repeat visitors get titles they
+# have not seen ranked first. Sessions are identified by a cookie, and the
+# history lives in a cache backend that all workers on the host share.
+HISTORY_MAX_SESSIONS = int(os.getenv('HISTORY_MAX_SESSIONS', '10000'))  # 0 disables history
+HISTORY_TTL_SECONDS = int(os.getenv('HISTORY_TTL_SECONDS', str(7 * 24 * 60 * 60)))  # 7 days
+HISTORY_SEEN_PENALTY = float(os.getenv('HISTORY_SEEN_PENALTY', '3'))  # rating points
+HISTORY_CAPACITY = int(os.getenv('HISTORY_CAPACITY', '128'))
+HISTORY_BACKEND = os.getenv('HISTORY_BACKEND', 'sqlite')
+HISTORY_PATH = os.getenv('HISTORY_PATH', os.path.join(app.instance_path, f'moodflix-history.{HISTORY_BACKEND}'))
+SESSION_COOKIE = 'moodflix_sid'
+_SESSION_ID_RE = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+_HISTORY = HistoryStore(
+    create_backend(
+        # Nothing is recorded with history off; skip creating the file
+        HISTORY_BACKEND if HISTORY_MAX_SESSIONS > 0 else 'memory',
+        ttl=HISTORY_TTL_SECONDS,
+        path=HISTORY_PATH,
+        max_entries=max(HISTORY_MAX_SESSIONS, 1),
+        mmap_slots=max(HISTORY_MAX_SESSIONS, 1),
+        mmap_slot_bytes=6 * HISTORY_CAPACITY + 256,  # base64 ring + key + slot header
+    ),
+    capacity=HISTORY_CAPACITY,
+)
+
+def parse_session_id(cookie_value):
+    """The session id from a cookie value, or None if it is missing or malformed"""
+    if cookie_value and _SESSION_ID_RE.match(cookie_value):
+        return cookie_value
+    return None
+
+def new_session_id():
+    return secrets.token_urlsafe(16)
+
+def session_cookie(session_id):
+    """set_cookie keyword arguments (the same for Flask and Starlette)"""
+    return {'key': SESSION_COOKIE, 'value': session_id, 'max_age': HISTORY_TTL_SECONDS,
+            'httponly': True, 'samesite': 'Lax'}
+
+def session_id(create=True):
+    """The caller's session id; a new one is issued by the after_request hook.
+
+    With create=False a caller without a session stays anonymous, so the
+    response sets no cookie and can stay publicly cacheable.
+    """
+    if HISTORY_MAX_SESSIONS <= 0:
+        return None
+    sid = parse_session_id(request.cookies.get(SESSION_COOKIE))
+    if sid is None and not create:
+        return None
+    if sid is None:
+        sid = g.get('new_session_id') or new_session_id()
+        g.new_session_id = sid
+    return sid
+
+@app.after_request
+def _set_session_cookie(response):
+    sid = g.get('new_session_id')
+    if sid:
+        response.set_cookie(**session_cookie(sid))
+        response.headers['Cache-Control'] = private_cache_control(response.headers.get('Cache-Control'))
+    return response
+
+def seen_movies(session_id):
+    """Movies already shown to a session (supports `key in seen`), or None"""
+    return _HISTORY.get(session_id)
+
+def remember_shown(session_id, movies):
+    _HISTORY.record(session_id, [_movie_key(m) for m in movies])
+
+# Sent with /recommend answers adapted to a session's history
+PERSONALIZED_HEADERS = {'Cache-Control': 'private, no-cache', 'Vary': 'Cookie'}
+
+def personalize_recommendation(payload, seen):
+    """A copy of a shared /recommend payload with already-shown movies moved last.
+
+    Returns None when the session has no history or none of the movies are
+    in it; the shared (publicly cacheable) response then serves as is.
+    """
+    if not seen:
+        return None
+    movies = payload['movies']
+    reordered = sorted(movies, key=lambda m: _movie_key(m) in seen)
+    if all(a is b for a, b in zip(reordered, movies)):
+        return None
+    return dict(payload, movies=reordered)
+
+def _shared_recommend_response(sid, seen, entry, cache_status):
+    """Serve a cached /recommend entry, personalized when the session's history reorders it"""
+    payload = json.loads(entry.body)
+    personal = personalize_recommendation(payload, seen)
+    remember_shown(sid, (personal or payload)['movies'])
+    if personal is not None:
+        return jsonify(personal), 200, PERSONALIZED_HEADERS
+    return cached_response('recommend', entry, cache_status)
+
+@STAGE_SECONDS.labels('rank').timed
+def rank_movies(movies, mood, seen=None):
+    """Remove duplicates (by ID or title) and sort by mood-biased rating.
+
+    Movies in `seen` (already shown to this session) lose HISTORY_SEEN_PENALTY.
+    """
+    seen_ids = set()
+    unique_movies = []
+    for movie in movies:
+        dedup_key = (movie.get('id') or movie.get('title'))
+        if dedup_key and dedup_key not in seen_ids:
+            seen_ids.add(dedup_key)
+            unique_movies.append(movie)
+
+    # Introduce lightweight diversification by sorting depending on mood
+    def score(m):
+        r = float(m.get('rating') or 0)
+        if seen and _movie_key(m) in seen:
+            r -= HISTORY_SEEN_PENALTY
+        # mood-based bias
+        if mood in ("happy", "romantic"):
+            return r + 0.3
+        if mood in ("angry", "excited", "adventurous"):
+            return r + 0.2
+        if mood in ("sad", "relaxed", "bored"):
+            return r  # neutral
+        return r
+    unique_movies.sort(key=score, reverse=True)
+    return unique_movies
+
+def top_up_with_fallback(movies, mood, preference, target_count, seen=None):
+    """Add non-duplicated curated movies until target_count is reached"""
+    fallback_movies = get_fallback_movies(mood, preference)
+    existing_keys = { (m.get('id') or m.get('title')) for m in movies }
+    # shuffle fallbacks so different moods see different mixes
+    random.shuffle(fallback_movies)
+    if seen:
+        # ...but ones this session has not been shown come first
+        fallback_movies.sort(key=lambda m: _movie_key(m) in seen)
+    for fb in fallback_movies:
+        if len(movies) >= target_count:
+            break
+        key = fb.get('id') or fb.get('title')
+        if key not in existing_keys:
+            movies.append(fb)
+            existing_keys.add(key)
+    return movies
+
+def fallback_search_queries(mood):
+    return {
+        'indian': f"{mood} bollywood movies",
+        'hollywood': f"{mood} movies"
+    }
+
+def build_recommendation(mood, user_input, preference, movies, used_queries, stale,
+                         target_count=RECOMMEND_TARGET_COUNT, local_movies=(), seen=None):
+    """Rank fetched movies and shape the /recommend response body.
+
+    Local text matches, when given, lead in similarity order. `seen` is the
+    session's history (see rank_movies). Returns None when there is nothing
+    at all to recommend.
+    """
+    emoji = get_mood_emoji(mood)
+    unique_movies = rank_movies(movies, mood, seen)
+    if local_movies:
+        local_keys = {_movie_key(m) for m in local_movies}
+        if seen:
+            local_movies = sorted(local_movies, key=lambda m: _movie_key(m) in seen)
+        unique_movies = list(local_movies) + [m for m in unique_movies if _movie_key(m) not in local_keys]
+        used_queries = [local_query_label(user_input)] + list(used_queries)
+
+    # Enforce exactly 8 if we have at least that many, else fallback later
+    movies = unique_movies[:target_count]
+
+    # If fewer than 8 movies, top-up with curated fallback to reach 8
+    if len(movies) < target_count:
+        print("No movies found from API, providing fallback recommendations")
+        movies = top_up_with_fallback(movies, mood, preference, target_count, seen)
+        if not movies:
+            return None
+        _RECOMMEND_FALLBACK.inc()
+        return {
+            'mood': mood,
+            'emoji': emoji,
+            'movies': proxy_poster_urls(movies[:target_count]),
+            'user_input': user_input,
+            'search_queries': fallback_search_queries(mood),
+            'total_movies': len(movies[:target_count]),
+            'fallback': True,
+            'stale': stale
+        }
+
+    _RECOMMEND_API.inc()
+    return {
+        'mood': mood,
+        'emoji': emoji,
+        'movies': proxy_poster_urls(movies),
+        'user_input': user_input,
+        'preference': preference,
+        'queries': used_queries,
+        'total_movies': len(movies),
+        'stale': stale
+    }
+
+class RecommendationStream:
+    """Frames of the streaming /recommend response, one dict per NDJSON line.
+
+    start() gives the 'mood' frame; add() turns each finished search query
+    into a 'movies' frame holding only cards not sent yet; finish() tops up
+    from the curated catalog when needed and ends with a 'done' frame (or an
+    'error' frame if there is nothing to show at all).
+
+    Movies in `history` (already shown to this session) are held back and
+    only sent by finish() if fresh ones did not fill the page.
+    """
+
+    def __init__(self, mood, user_input, preference, target_count=RECOMMEND_TARGET_COUNT, history=None):
+        self.mood = mood
+        self.user_input = user_input
+        self.preference = preference
+        self.target_count = target_count
+        self.history = history
+        self.sent = []
+        self.used_queries = []
+        self.stale = False
+        self._seen = set()
+        self._held = []
+
+    @property
+    def full(self):
+        return len(self.sent) >= self.target_count
+
+    def start(self):
+        return {
+            'type': 'mood',
+            'mood': self.mood,
+            'emoji': get_mood_emoji(self.mood),
+            'user_input': self.user_input,
+            'preference': self.preference,
+        }
+
+    def add(self, query, movies, stale=False):
+        fresh = []
+        for movie in rank_movies(movies, self.mood):
+            if len(self.sent) + len(fresh) >= self.target_count:
+                break
+            if _movie_key(movie) in self._seen:
+                continue
+            if self.history and _movie_key(movie) in self.history:
+                self._held.append(movie)
+            else:
+                fresh.append(movie)
+        if not fresh:
+            return None
+        self._seen.update(_movie_key(m) for m in fresh)
+        self.sent.extend(fresh)
+        self.used_queries.append(query)
+        self.stale = self.stale or stale
+        return {'type': 'movies', 'query': query, 'movies': proxy_poster_urls(fresh), 'stale': stale}
+
+    def finish(self):
+        frames = []
+        if not self.full and self._held:
+            repeats = []
+            for movie in rank_movies(self._held, self.mood):
+                if len(self.sent) + len(repeats) >= self.target_count:
+                    break
+                if _movie_key(movie) not in self._seen:
+                    repeats.append(movie)
+            if repeats:
+                self._seen.update(_movie_key(m) for m in repeats)
+                self.sent.extend(repeats)
+                frames.append({'type': 'movies', 'movies': proxy_poster_urls(repeats), 'seen': True})
+        fallback = not self.full
+        if fallback:
+            print("Not enough movies from API, topping up with fallback recommendations")
+            topped_up = top_up_with_fallback(list(self.sent), self.mood, self.preference, self.target_count,
+                                             self.history)
+            extra = topped_up[len(self.sent):]
+            if extra:
+                self.sent.extend(extra)
+                frames.append({'type': 'movies', 'movies': proxy_poster_urls(extra), 'fallback': True})
+        if not self.sent:
+            frames.append({'type': 'error', 'error': 'No movies found. Please try again.'})
+            return frames
+        (_RECOMMEND_FALLBACK if fallback else _RECOMMEND_API).inc()
+        done = {
+            'type': 'done',
+            'used_queries': self.used_queries,
+            'total_movies': len(self.sent),
+            'fallback': fallback,
+            'stale': self.stale,
+        }
+        if fallback:
+            done['search_queries'] = fallback_search_queries(self.mood)
+        frames.append(done)
+        return frames
+
+@app.route('/recommend', methods=['GET', 'POST'])
 def recommend_movies():
-    """Analyze sentiment and recommend movies"""
+    """Analyze sentiment and recommend movies (GET takes the fields as query parameters)"""
     try:
-        data = request.get_json()
-        user_input = data.get('mood_text', '').strip()
-        # Optional controls from frontend
-        preference = (data.get('preference') or 'mixed').lower()  # mixed | indian | hollywood
         try:
-            limit = int(data.get('limit', 10))
-        except Exception:
-            limit = 10
-        limit = max(4, min(limit, 20))
-        
-        if not user_input:
-            return jsonify({'error': 'Please enter how you are feeling'}), 400
+            data = request.args.to_dict() if request.method in ('GET', 'HEAD') else request.get_json()
+            user_input, preference, limit, emoji_input = parse_recommend_payload(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Analyze sentiment; allow emoji override
-        emoji_input = (data.get('emoji') or '').strip()
-        emoji_to_mood = {
-            "😊": "happy", "😢": "sad", "😠": "angry", "😌": "relaxed", "😴": "bored",
-            "🤩": "excited", "💕": "romantic", "😨": "scared", "🕵️": "bored", "🚀": "adventurous"
-        }
-        if emoji_input in emoji_to_mood:
-            mood = emoji_to_mood[emoji_input]
-        else:
-            mood = analyze_sentiment(user_input)
-        emoji = get_mood_emoji(mood)
+        # GETs only use an existing session, so answers to new visitors stay public
+        sid = session_id(create=request.method == 'POST')
+        seen = seen_movies(sid)
+        # Cacheable requests build the shared answer; history is applied to a copy
+        response_key = recommend_response_key(user_input, preference, limit, emoji_input)
+        entry = cached_entry('recommend', response_key)
+        if entry is not None:
+            return _shared_recommend_response(sid, seen, entry, 'HIT')
         
-        # Get search query for the mood (Indian movies)
-        mood_query_indian = MOOD_QUERY_MAP.get(mood, MOOD_QUERY_MAP['happy'])  # Default to happy if mood not found
-        
-        # Also create Hollywood query
-        mood_query_hollywood = mood_query_indian.replace('bollywood', '').replace('indian', '').strip()
+        mood = detect_mood(user_input, emoji_input)
         
         # Try multiple queries with better fallbacks (stop early). Always target 8.
-        target_count = 8
-        limit = max(target_count, limit)
-        movies = []
-        used_queries = []
-        
-        # Build list of queries to try based on preference
-        base_queries = []
-        # Simple mood-based queries first
-        if preference in ('mixed', 'hollywood'):
-            base_queries.extend([
-                f"{mood} movies",
-                f"{mood} comedy movies" if mood == "happy" else f"{mood} drama movies",
-                f"{mood} action movies" if mood in ["angry", "excited", "adventurous"] else f"{mood} romantic movies",
-            ])
-        if preference in ('mixed', 'indian'):
-            base_queries.extend([
-                f"{mood} bollywood movies",
-                f"{mood} bollywood action movies" if mood in ["angry", "excited", "adventurous"] else f"{mood} bollywood romantic movies",
-            ])
-        # More specific queries from user input (only if short to avoid noisy searches)
-        if len(user_input.split()) <= 4 and user_input:
-            if preference in ('mixed', 'hollywood'):
-                base_queries.append(f"{mood} movies {user_input.lower()}")
-            if preference in ('mixed', 'indian'):
-                base_queries.append(f"{mood} bollywood {user_input.lower()}")
-        
-        # Shuffle slightly to avoid same ordering across sentiments
-        random.shuffle(base_queries)
-        queries_to_try = base_queries
-        
-        # Try each query until we get enough movies
-        for idx, query in enumerate(queries_to_try):
-            if len(movies) >= target_count:  # Stop if we have enough movies
-                break
-                
-            try:
-                # progressively reduce requested page size to be gentle on API
-                req_limit = max(4, target_count - len(movies))
-                new_movies = get_movies_by_mood(query, limit=req_limit)
-                if new_movies:
-                    movies.extend(new_movies)
-                    used_queries.append(query)
-                    print(f"✅ Query '{query}' returned {len(new_movies)} movies")
-                else:
-                    print(f"❌ Query '{query}' returned no movies")
-            except Exception as e:
-                print(f"❌ Query '{query}' failed: {e}")
-                continue
-        
-        # Remove duplicates based on movie ID or title
-        seen_ids = set()
-        unique_movies = []
-        for movie in movies:
-            dedup_key = (movie.get('id') or movie.get('title'))
-            if dedup_key and dedup_key not in seen_ids:
-                seen_ids.add(dedup_key)
-                unique_movies.append(movie)
+        target_count = RECOMMEND_TARGET_COUNT
+        queries_to_try, local_movies = plan_request(mood, preference, user_input)
         
-        # Introduce lightweight diversification by sorting depending on mood
-        def score(m):
-            r = float(m.get('rating') or 0)
-            # mood-based bias
-            if mood in ("happy", "romantic"):
-                return r + 0.3
-            if mood in ("angry", "excited", "adventurous"):
-                return r + 0.2
-            if mood in ("sad", "relaxed", "bored"):
-                return r  # neutral
-            return r
-        unique_movies.sort(key=score, reverse=True)
-
-        # Enforce exactly 8 if we have at least that many, else fallback later
-        movies = unique_movies[:target_count] if len(unique_movies) >= target_count else unique_movies
-        
-        # If fewer than 8 movies, top-up with curated fallback to reach 8
-        if len(movies) < target_count:
-            print("No movies found from API, providing fallback recommendations")
-            fallback_movies = get_fallback_movies(mood)
-            if fallback_movies:
-                # add non-duplicated fallback movies
-                existing_keys = { (m.get('id') or m.get('title')) for m in movies }
-                # shuffle fallbacks so different moods see different mixes
-                shuffled_fb = list(fallback_movies)
-                random.shuffle(shuffled_fb)
-                for fb in shuffled_fb:
-                    key = fb.get('id') or fb.get('title')
-                    if key not in existing_keys:
-                        movies.append(fb)
-                        existing_keys.add(key)
-                        if len(movies) >= target_count:
-                            break
-            if movies:
-                return jsonify({
-                    'mood': mood,
-                    'emoji': emoji,
-                    'movies': movies[:target_count],
-                    'user_input': user_input,
-                    'search_queries': {
-                        'indian': f"{mood} bollywood movies",
-                        'hollywood': f"{mood} movies"
-                    },
-                    'total_movies': len(movies[:target_count]),
-                    'fallback': True
-                })
-            else:
-                return jsonify({'error': 'No movies found. Please try again.'}), 500
+        # Fan the queries out concurrently until we get enough movies. While the
+        # upstream circuit is open, skip the network and use what is cached.
+        # Queries always ask for target_count (the warmed cache entries);
+        # build_recommendation trims the results after the local matches.
+        if _MOVIE_GOVERNOR.is_open():
+            print("Upstream circuit open, serving cached and curated movies only")
+            movies, used_queries, stale = cached_movies_for(queries_to_try, target_count)
+        else:
+            movies, used_queries, stale = fetch_movies_concurrently(
+                queries_to_try, target_count, enough=target_count - len(local_movies))
         
-        return jsonify({
-            'mood': mood,
-            'emoji': emoji,
-            'movies': movies,
-            'user_input': user_input,
-            'preference': preference,
-            'queries': used_queries,
-            'total_movies': len(movies)
-        })
+        payload = build_recommendation(mood, user_input, preference, movies, used_queries, stale, target_count,
+                                       local_movies, None if response_key else seen)
+        if payload is None:
+            return jsonify({'error': 'No movies found. Please try again.'}), 500
+        # Degraded answers are not cached so that recovery shows up right away
+        if not payload.get('fallback') and not payload.get('stale'):
+            entry = cache_payload('recommend', response_key, payload)
+            if entry is not None:
+                return _shared_recommend_response(sid, seen, entry, 'MISS')
+        personal = personalize_recommendation(payload, seen) if response_key else None
+        remember_shown(sid, (personal or payload)['movies'])
+        if personal is not None:
+            return jsonify(personal), 200, PERSONALIZED_HEADERS
+        return jsonify(payload)
     
     except Exception as e:
         print(f"Error in recommend_movies: {e}")
         return jsonify({'error': 'Something went wrong. Please try again.'}), 500
 
+def ndjson(frames):
+    for frame in frames:
+        yield json.dumps(frame, ensure_ascii=False) + '\n'
+
+@app.route('/recommend/stream', methods=['POST'])
+def recommend_movies_stream():
+    """Streaming /recommend: NDJSON frames sent as each search query completes"""
+    try:
+        user_input, preference, limit, emoji_input = parse_recommend_payload(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    mood = detect_mood(user_input, emoji_input)
+    target_count = RECOMMEND_TARGET_COUNT
+    queries_to_try, local_movies = plan_request(mood, preference, user_input)
+    sid = session_id()
+
+    def frames():
+        stream = RecommendationStream(mood, user_input, preference, target_count, seen_movies(sid))
+        yield stream.start()
+        frame = stream.add(local_query_label(user_input), local_movies) if local_movies else None
+        if frame:
+            yield frame
+        if _MOVIE_GOVERNOR.is_open():
+            print("Upstream circuit open, serving cached and curated movies only")
+            results = iter_cached_movies(queries_to_try, target_count)
+        else:
+            results = iter_movies_concurrently(queries_to_try, target_count)
+        try:
+            # Closing the generator cancels queries we no longer need
+            with closing(results):
+                for query, movies, stale in results:
+                    frame = stream.add(query, movies, stale)
+                    if frame:
+                        yield frame
+                    if stream.full:
+                        break
+        except Exception as e:
+            print(f"Error in recommend_movies_stream: {e}")
+        final_frames = stream.finish()
+        remember_shown(sid, stream.sent)
+        yield from final_frames
+
+    return Response(stream_with_context(ndjson(frames())), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Batch recommendations (e.g. nightly digests): records are handled in chunks.
+# Each chunk is classified in one pass and grouped by (mood, preference), and
+# every distinct templated query is fetched once for the whole chunk. Per-user
+# free-text queries are left out so that users with the same mood share searches.
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', '500'))
+BATCH_DEADLINE_SECONDS = float(os.getenv('BATCH_DEADLINE_SECONDS', '30'))
+BATCH_MAX_RECORDS = int(os.getenv('BATCH_MAX_RECORDS', '100000'))
+NO_RECORD = object()  # end of a record stream; None is an unparseable record
+
+@STAGE_SECONDS.labels('sentiment_batch').timed
+def detect_moods(pairs):
+    """detect_mood for many (user_input, emoji_input) pairs at once"""
+    texts = [user_input for user_input, emoji_input in pairs if emoji_input not in EMOJI_TO_MOOD]
+    classified = iter(_MOOD_CLASSIFIER.classify_many(texts))
+    return [EMOJI_TO_MOOD[emoji_input] if emoji_input in EMOJI_TO_MOOD else next(classified)
+            for user_input, emoji_input in pairs]
+
+def fetch_query_results(queries, target_count, deadline=None):
+    """Fetch each distinct query once; returns {query: (movies, stale)}.
+
+    Cached queries are answered directly. Misses are submitted no faster
+    than the movie governor hands out tokens, as warm_cache does, so a big
+    batch queues for its turn instead of being throttled, and pool threads
+    are not tied up waiting. Unlike fetch_movies_concurrently this waits for
+    every query (up to the deadline), since different groups need different
+    subsets of them.
+    """
+    queries = set(queries)
+    if _MOVIE_GOVERNOR.is_open():
+        print("Upstream circuit open, serving cached and curated movies only")
+        return {query: (movies, stale) for query, movies, stale in iter_cached_movies(queries, target_count)}
+    if deadline is None:
+        deadline = time.monotonic() + BATCH_DEADLINE_SECONDS
+    results = {}
+    futures = {}
+    unsent = 0
+    for query in queries:
+        started = time.perf_counter()
+        cache_key = _movie_cache_key(query, target_count)
+        hit = _cache_lookup(cache_key)
+        if hit is not None:
+            results[query] = _use_cached(hit, query, target_count, cache_key, started)
+            continue
+        wait_for = _MOVIE_GOVERNOR.bucket.wait_time()
+        if wait_for > time_left(deadline):
+            unsent += 1
+            continue
+        time.sleep(wait_for)
+        futures[_FETCH_POOL.submit(fetch_movies, query, target_count, deadline)] = query
+    if unsent:
+        print(f"⏱️ Batch deadline leaves no rate-limit room for {unsent} queries")
+    done, pending = wait(futures, timeout=time_left(deadline))
+    if pending:
+        print(f"⏱️ Batch deadline reached with {len(pending)} queries outstanding")
+    for fut in pending:
+        fut.cancel()
+    for fut in done:
+        try:
+            results[futures[fut]] = fut.result()
+        except Exception as e:
+            print(f"❌ Query '{futures[fut]}' failed: {e}")
+    return results
+
+def _recommend_chunk(chunk, target_count):
+    """Recommendations for one chunk of (index, record) pairs, in input order"""
+    parsed = []
+    for index, record in chunk:
+        if not isinstance(record, dict):
+            parsed.append((index, record, None, 'Expected a JSON object'))
+            continue
+        try:
+            parsed.append((index, record, parse_recommend_payload(record), None))
+        except ValueError as e:
+            parsed.append((index, record, None, str(e)))
+
+    valid = [item for item in parsed if item[2] is not None]
+    moods = detect_moods([(fields[0], fields[3]) for _, _, fields, _ in valid])
+    mood_by_index = {item[0]: mood for item, mood in zip(valid, moods)}
+    group_queries = {}
+    for (index, _, fields, _), mood in zip(valid, moods):
+        key = (mood, fields[1])
+        if key not in group_queries:
+            group_queries[key] = templated_queries(*key)
+    results = fetch_query_results(
+        (q for queries in group_queries.values() for q in queries), target_count)
+
+    for index, record, fields, error in parsed:
+        frame = {'type': 'result', 'index': index}
+        if isinstance(record, dict) and 'id' in record:
+            frame['id'] = record['id']
+        if error:
+            frame.update(type='error', error=error)
+            yield frame
+            continue
+        user_input, preference = fields[0], fields[1]
+        mood = mood_by_index[index]
+        movies, used_queries, stale = _collect(
+            (q, *results[q]) for q in group_queries[(mood, preference)] if results.get(q, ((), False))[0])
+        # Ranking and fallback top-up still run per user
+        payload = build_recommendation(mood, user_input, preference, movies, used_queries, stale, target_count)
+        if payload is None:
+            frame.update(type='error', error='No movies found. Please try again.')
+        else:
+            frame.update(payload)
+        yield frame
+
+def recommend_batch(records, target_count=RECOMMEND_TARGET_COUNT, chunk_size=None):
+    """Recommend for many /recommend-style records; a generator, so memory stays flat.
+
+    records is any iterable of dicts with mood_text, emoji, preference and an
+    optional id that is echoed back. Yields one dict per record, in input
+    order: the /recommend response body plus type='result' and index, or
+    type='error' with a message.
+    """
+    chunk_size = chunk_size or BATCH_CHUNK_SIZE
+    records = iter(enumerate(records))
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield from _recommend_chunk(chunk, target_count)
+
+def _batch_records():
+    """Records from a /recommend/batch body: NDJSON read lazily, or {"records": [...]}"""
+    if request.mimetype == 'application/x-ndjson':
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+        return
+    data = request.get_json(silent=True)
+    records = data.get('records') if isinstance(data, dict) else None
+    if not isinstance(records, list):
+        raise ValueError('Expected {"records": [...]} or an application/x-ndjson body')
+    yield from records
+
+@app.route('/recommend/batch', methods=['POST'])
+def recommend_batch_route():
+    """Batch /recommend: NDJSON out, one line per input record plus a summary line"""
+    records = _batch_records()
+    try:
+        first = next(records, NO_RECORD)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if first is NO_RECORD:
+        return jsonify({'error': 'No records'}), 400
+
+    def frames():
+        counts = {'result': 0, 'error': 0}
+        limited = islice(chain((first,), records), BATCH_MAX_RECORDS)
+        for frame in recommend_batch(limited):
+            counts[frame['type']] += 1
+            yield frame
+        yield {'type': 'summary', 'records': counts['result'] + counts['error'],
+               'results': counts['result'], 'errors': counts['error'],
+               'truncated': next(records, NO_RECORD) is not NO_RECORD}
+
+    return Response(stream_with_context(ndjson(frames())), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Catalog warm-up: every templated mood × preference query is precomputed so
+# that most /recommend calls are answered from the cache
+CACHE_WARM_INTERVAL_SECONDS = int(os.getenv('CACHE_WARM_INTERVAL_SECONDS', '0'))  # 0 disables the scheduler
+CACHE_WARM_RATE = float(os.getenv('CACHE_WARM_RATE', '1'))  # upstream queries per second for the warmer
+
+def catalog_queries():
+    """Every templated query across all moods and preferences, without duplicates"""
+    queries = []
+    seen = set()
+    for mood in MOOD_QUERY_MAP:
+        for preference in PREFERENCES:
+            for query in templated_queries(mood, preference):
+                if query not in seen:
+                    seen.add(query)
+                    queries.append(query)
+    return queries
+
+def warm_cache(force=False, rate=None, refresh_after=None):
+    """Fetch and cache results for every catalog query.
+
+    Entries younger than refresh_after (default: half the fresh window) are
+    left alone unless force is set, so regular runs refresh entries before
+    requests ever see them stale. The warmer paces itself at `rate` queries
+    per second, waits for the shared per-host bucket, and stops early if the
+    upstream circuit breaker opens.
+    """
+    rate = rate or CACHE_WARM_RATE
+    if refresh_after is None:
+        refresh_after = _CACHE_TTL_SECONDS / 2
+    pacer = TokenBucket(rate, 1)
+    summary = {'queries': 0, 'warmed': 0, 'skipped': 0, 'failed': 0, 'aborted': False}
+    for query in catalog_queries():
+        summary['queries'] += 1
+        cache_key = _movie_cache_key(query, RECOMMEND_TARGET_COUNT)
+        entry = _CACHE.get_entry(cache_key)
+        if entry is not None and not force and time.time() - entry[1] < refresh_after:
+            summary['skipped'] += 1
+            continue
+        if _MOVIE_GOVERNOR.is_open():
+            print("Upstream circuit open, stopping cache warm-up")
+            summary['aborted'] = True
+            break
+        pacer.acquire()
+        # Leave live traffic its share of the quota
+        time.sleep(_MOVIE_GOVERNOR.bucket.wait_time())
+        movies = _MOVIE_FLIGHTS.do(cache_key, _fetch_movies_upstream, query, RECOMMEND_TARGET_COUNT, cache_key, True)
+        if movies:
+            summary['warmed'] += 1
+        else:
+            summary['failed'] += 1
+    print(f"🔥 Cache warm-up: {summary}")
+    return summary
+
+_WARMER = CacheWarmer(warm_cache, CACHE_WARM_INTERVAL_SECONDS, lock_path=os.path.join(app.instance_path, 'warmer.lock'))
+if CACHE_WARM_INTERVAL_SECONDS > 0:
+    _WARMER.start()
+
+@app.cli.command('warm-cache')
+@click.option('--force', is_flag=True, help='Refetch every query, even fresh ones.')
+@click.option('--rate', type=float, default=None, help='Upstream queries per second (default: CACHE_WARM_RATE).')
+def warm_cache_command(force, rate):
+    """Precompute search results for every mood/preference query."""
+    summary = warm_cache(force=force, rate=rate)
+    click.echo(summary)
+    if summary['aborted']:
+        raise SystemExit(1)
+
+def warm_up():
+    """Load what is otherwise loaded on first use, before a worker takes traffic.
+
+    Covers the mood classifier, the curated catalog, the local index (and
+    NumPy) and the poster cache. Called from gunicorn's post_worker_init
+    hook (gunicorn.conf.py), the ASGI lifespan and ``python app.py``.
+    Safe to call more than once.
+    """
+    started = time.perf_counter()
+    _MOOD_CLASSIFIER.load()
+    fallback_catalog()
+    _MOVIE_INDEX.snapshot(force=True)
+    _POSTERS.load()
+    print(f"Warm-up finished in {(time.perf_counter() - started) * 1000:.0f} ms")
+
 if __name__ == '__main__':
+    warm_up()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,615 @@
+"""Async (ASGI) serving mode.
+
+Serves the same routes as the Flask app in app.py (``/``, the ``/recommend``
+endpoints, trailers, posters, ``/cache/stats`` and ``/metrics``) with
+non-blocking upstream I/O: RapidAPI calls go through one shared
+``httpx.AsyncClient``, so a single process can keep hundreds of slow
+upstream requests in flight instead of tying up one worker thread per
+request.
+
+Everything that is not I/O (mood detection, query planning, caches, rate
+limiting, ranking and fallbacks) is shared with app.py.
+
+    WEB_CONCURRENCY=4 uvicorn asgi:application --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import contextlib
+import json
+import os
+import time
+
+import httpx
+from flask import render_template
+from werkzeug.http import parse_etags
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+import app as moodflix
+from cache import TTLCache
+from httpcache import private_cache_control
+
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv('UPSTREAM_MAX_CONNECTIONS', '512'))
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of singleflight.SingleFlight.
+
+    The shared call runs as its own task and waiters await it through
+    ``asyncio.shield``, so cancelling one waiter (e.g. when a fan-out has
+    enough movies) never cancels the call the others are waiting on.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key, coro_fn, *args):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_fn(*args))
+            self._tasks[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda t, k=key: self._tasks.pop(k, None) if self._tasks.get(k) is t else None)
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self):
+        total = self.executions + self.coalesced
+        return {
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._tasks),
+            'coalesced_ratio': round(self.coalesced / total, 4) if total else 0.0,
+        }
+
+
+_MOVIE_FLIGHTS = AsyncSingleFlight()
+_TRAILER_STAGE = moodflix.STAGE_SECONDS.labels('trailer')
+_TRAILER_FLIGHTS = AsyncSingleFlight()
+_client = None
+
+
+def _http():
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=15,
+            limits=httpx.Limits(max_connections=UPSTREAM_MAX_CONNECTIONS,
+                                max_keepalive_connections=UPSTREAM_MAX_CONNECTIONS // 4),
+        )
+    return _client
+
+
+async def _cache_call(backend, fn, *args):
+    """Call a cache read or write; off the event loop unless the backend lives in process memory.
+
+    SQLite and mmap access can wait on disk or on another worker's lock.
+    """
+    if isinstance(backend, TTLCache):
+        return fn(*args)
+    return await asyncio.to_thread(fn, *args)
+
+
+async def fetch_movies(mood_query, limit=10, deadline=None):
+    """Async fetch_movies: returns (movies, stale) like app.fetch_movies"""
+    started = time.perf_counter()
+    cache_key = moodflix._movie_cache_key(mood_query, limit)
+    hit = await _cache_call(moodflix._CACHE, moodflix._cache_lookup, cache_key)
+    if hit is not None:
+        movies, stale = hit
+        if stale:
+            moodflix._schedule_refresh(cache_key, mood_query, limit)
+        (moodflix._LOOKUP_STALE if stale else moodflix._LOOKUP_HIT).observe(time.perf_counter() - started)
+        moodflix._MOVIE_INDEX.add_many(movies)
+        return movies, stale
+    movies = await _MOVIE_FLIGHTS.do(cache_key, _fetch_movies_upstream, mood_query, limit, cache_key, deadline)
+    moodflix._LOOKUP_MISS.observe(time.perf_counter() - started)
+    moodflix._MOVIE_INDEX.add_many(movies)
+    return movies, False
+
+
+async def _fetch_movies_upstream(mood_query, limit, cache_key, deadline=None):
+    """Single-flight body of fetch_movies: one upstream search per key"""
+    cached = await _cache_call(moodflix._CACHE, moodflix._cache_get, cache_key)
+    if cached is not None:
+        return cached
+    governor = moodflix._MOVIE_GOVERNOR
+    url, headers, params = moodflix.movie_search_request(mood_query)
+    try:
+        await governor.before_request_async(moodflix.time_left(deadline))
+        started = time.perf_counter()
+        try:
+            response = await _http().get(url, headers=headers, params=params)
+        except httpx.TransportError:
+            moodflix.observe_upstream(moodflix.RAPIDAPI_HOST, started, 'timeout')
+            governor.observe_timeout()
+            raise
+        moodflix.observe_upstream(moodflix.RAPIDAPI_HOST, started, response.status_code)
+        governor.observe_response(response)
+        response.raise_for_status()
+        movies = moodflix.parse_movie_results(response.json(), limit)
+    except httpx.HTTPStatusError as e:
+        status = e.response.status_code
+        print(f"HTTP error for query '{mood_query}': {status} -> {e}")
+        if status == 429:
+            print("Rate limit hit, backing off until the quota resets")
+        return []
+    except moodflix.UpstreamUnavailable as e:
+        print(f"Skipping query '{mood_query}': {e}")
+        return []
+    except httpx.HTTPError as e:
+        print(f"Request error for query '{mood_query}': {e!r}")
+        return []
+    except Exception as e:
+        print(f"Unexpected error for query '{mood_query}': {e}")
+        return []
+    # Cache writes may touch disk; keep them off the event loop
+    await asyncio.to_thread(moodflix._cache_set, cache_key, movies)
+    return movies
+
+
+async def iter_movies_concurrently(queries, target_count, timeout=None, enough=None):
+    """Async iter_movies_concurrently: yields (query, movies, stale) as queries finish"""
+    if enough is None:
+        enough = target_count
+    deadline = time.monotonic() + (moodflix.RECOMMEND_DEADLINE_SECONDS if timeout is None else timeout)
+    tasks = {asyncio.ensure_future(fetch_movies(q, target_count, deadline)): q for q in queries}
+    pending = set(tasks)
+    seen = set()
+    try:
+        while pending and len(seen) < enough:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"⏱️ Deadline reached with {len(pending)} queries outstanding")
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                query = tasks[task]
+                try:
+                    new_movies, new_stale = task.result()
+                except Exception as e:
+                    print(f"❌ Query '{query}' failed: {e}")
+                    continue
+                if new_movies:
+                    seen.update(moodflix._movie_key(m) for m in new_movies)
+                    print(f"✅ Query '{query}' returned {len(new_movies)} movies")
+                    yield query, new_movies, new_stale
+                else:
+                    print(f"❌ Query '{query}' returned no movies")
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def fetch_movies_concurrently(queries, target_count, timeout=None, enough=None):
+    """Async fetch_movies_concurrently: returns (movies, used_queries, stale)"""
+    async with contextlib.aclosing(iter_movies_concurrently(queries, target_count, timeout, enough)) as results:
+        return moodflix._collect([result async for result in results])
+
+
+async def lookup_trailer(title, year='', deadline=None):
+    """Async lookup_trailer: YouTube video ID of a movie's trailer, or None"""
+    with _TRAILER_STAGE.time():
+        query, cache_key = moodflix._trailer_cache_key(title, year)
+        cached = await _cache_call(moodflix._TRAILER_CACHE, moodflix._trailer_cache_get, cache_key)
+        if cached is not None:
+            return cached['videoId']
+        return await _TRAILER_FLIGHTS.do(cache_key, _fetch_trailer_upstream, query, cache_key, deadline)
+
+
+async def _fetch_trailer_upstream(query, cache_key, deadline=None):
+    """Single-flight body of lookup_trailer; errors are raised and not cached"""
+    cached = await _cache_call(moodflix._TRAILER_CACHE, moodflix._trailer_cache_get, cache_key)
+    if cached is not None:
+        return cached['videoId']
+    governor = moodflix._TRAILER_GOVERNOR
+    url, headers, params = moodflix.trailer_search_request(query)
+    try:
+        await governor.before_request_async(moodflix.time_left(deadline))
+        started = time.perf_counter()
+        try:
+            resp = await _http().get(url, headers=headers, params=params)
+        except httpx.TransportError:
+            moodflix.observe_upstream(moodflix.YOUTUBE_RAPID_HOST, started, 'timeout')
+            governor.observe_timeout()
+            raise
+        moodflix.observe_upstream(moodflix.YOUTUBE_RAPID_HOST, started, resp.status_code)
+        governor.observe_response(resp)
+        resp.raise_for_status()
+        video_id = moodflix.parse_trailer_result(resp.json())
+    except Exception as e:
+        print(f"Error fetching trailer: {e!r}")
+        raise
+    await asyncio.to_thread(moodflix._TRAILER_CACHE.set, cache_key,
+                            {'videoId': video_id, 'checked_at': moodflix.time.time()})
+    return video_id
+
+
+_INDEX_HTML = None
+
+
+async def index(request):
+    """Render the home page (the Flask template, rendered once)"""
+    global _INDEX_HTML
+    if _INDEX_HTML is None:
+        with moodflix.app.test_request_context('/'):
+            _INDEX_HTML = render_template('index.html')
+    return HTMLResponse(_INDEX_HTML)
+
+
+def _cached_response(request, endpoint, entry, cache_status):
+    status, body, headers = moodflix._RESPONSE_CACHES[endpoint].respond(
+        entry, request.headers.get('if-none-match'), request.headers.get('accept-encoding'), cache_status,
+        request.method)
+    return Response(body, status_code=status, headers=headers)
+
+
+def _session(request, create=True):
+    """(session id, whether it is new); (None, False) when history is off.
+
+    With create=False a caller without a session stays anonymous (see
+    moodflix.session_id).
+    """
+    if moodflix.HISTORY_MAX_SESSIONS <= 0:
+        return None, False
+    sid = moodflix.parse_session_id(request.cookies.get(moodflix.SESSION_COOKIE))
+    if sid is None:
+        return (moodflix.new_session_id(), True) if create else (None, False)
+    return sid, False
+
+
+def _with_session(response, sid, is_new):
+    if is_new:
+        response.set_cookie(**moodflix.session_cookie(sid))
+        response.headers['Cache-Control'] = private_cache_control(response.headers.get('cache-control'))
+    return response
+
+
+async def _recommend_answer(request, sid, seen, payload, entry=None, cache_status='MISS'):
+    """The /recommend response for a shared payload (and its cache entry, if cached)"""
+    personal = moodflix.personalize_recommendation(payload, seen)
+    await _cache_call(moodflix._HISTORY.backend, moodflix.remember_shown, sid, (personal or payload)['movies'])
+    if personal is not None:
+        return JSONResponse(personal, headers=moodflix.PERSONALIZED_HEADERS)
+    if entry is not None:
+        return _cached_response(request, 'recommend', entry, cache_status)
+    return JSONResponse(payload)
+
+
+async def recommend(request):
+    """Analyze sentiment and recommend movies (GET takes the fields as query parameters)"""
+    if request.method in ('GET', 'HEAD'):
+        data = dict(request.query_params)
+    else:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+    try:
+        user_input, preference, limit, emoji_input = moodflix.parse_recommend_payload(data)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    try:
+        # GETs only use an existing session, so answers to new visitors stay public
+        sid, new_session = _session(request, create=request.method == 'POST')
+        seen = await _cache_call(moodflix._HISTORY.backend, moodflix.seen_movies, sid)
+        # Cacheable requests build the shared answer; history is applied to a copy
+        response_key = moodflix.recommend_response_key(user_input, preference, limit, emoji_input)
+        entry = moodflix.cached_entry('recommend', response_key)
+        if entry is not None:
+            response = await _recommend_answer(request, sid, seen, json.loads(entry.body), entry, 'HIT')
+            return _with_session(response, sid, new_session)
+        mood = moodflix.detect_mood(user_input, emoji_input)
+        target_count = moodflix.RECOMMEND_TARGET_COUNT
+        queries_to_try, local_movies = moodflix.plan_request(mood, preference, user_input)
+        if moodflix._MOVIE_GOVERNOR.is_open():
+            print("Upstream circuit open, serving cached and curated movies only")
+            movies, used_queries, stale = await _cache_call(moodflix._CACHE, moodflix.cached_movies_for,
+                                                            queries_to_try, target_count)
+        else:
+            movies, used_queries, stale = await fetch_movies_concurrently(
+                queries_to_try, target_count, enough=target_count - len(local_movies))
+        payload = moodflix.build_recommendation(mood, user_input, preference, movies, used_queries, stale,
+                                                target_count, local_movies, None if response_key else seen)
+        if payload is None:
+            return JSONResponse({'error': 'No movies found. Please try again.'}, status_code=500)
+        if not payload.get('fallback') and not payload.get('stale'):
+            entry = moodflix.cache_payload('recommend', response_key, payload)
+        response = await _recommend_answer(request, sid, seen if response_key else None, payload, entry)
+        return _with_session(response, sid, new_session)
+    except Exception as e:
+        print(f"Error in recommend: {e}")
+        return JSONResponse({'error': 'Something went wrong. Please try again.'}, status_code=500)
+
+
+async def recommend_stream(request):
+    """Streaming /recommend: NDJSON frames sent as each search query completes"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    try:
+        user_input, preference, limit, emoji_input = moodflix.parse_recommend_payload(data)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    mood = moodflix.detect_mood(user_input, emoji_input)
+    target_count = moodflix.RECOMMEND_TARGET_COUNT
+    queries_to_try, local_movies = moodflix.plan_request(mood, preference, user_input)
+    sid, new_session = _session(request)
+
+    async def lines():
+        seen = await _cache_call(moodflix._HISTORY.backend, moodflix.seen_movies, sid)
+        stream = moodflix.RecommendationStream(mood, user_input, preference, target_count, seen)
+        yield _ndjson_line(stream.start())
+        frame = stream.add(moodflix.local_query_label(user_input), local_movies) if local_movies else None
+        if frame:
+            yield _ndjson_line(frame)
+        try:
+            if moodflix._MOVIE_GOVERNOR.is_open():
+                print("Upstream circuit open, serving cached and curated movies only")
+                cached = await _cache_call(moodflix._CACHE, list,
+                                           moodflix.iter_cached_movies(queries_to_try, target_count))
+                for query, movies, stale in cached:
+                    frame = stream.add(query, movies, stale)
+                    if frame:
+                        yield _ndjson_line(frame)
+            else:
+                results = iter_movies_concurrently(queries_to_try, target_count)
+                # Closing the generator cancels queries we no longer need
+                async with contextlib.aclosing(results):
+                    async for query, movies, stale in results:
+                        frame = stream.add(query, movies, stale)
+                        if frame:
+                            yield _ndjson_line(frame)
+                        if stream.full:
+                            break
+        except Exception as e:
+            print(f"Error in recommend_stream: {e}")
+        final_frames = stream.finish()
+        await _cache_call(moodflix._HISTORY.backend, moodflix.remember_shown, sid, stream.sent)
+        for frame in final_frames:
+            yield _ndjson_line(frame)
+
+    response = StreamingResponse(lines(), media_type='application/x-ndjson',
+                                 headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    return _with_session(response, sid, new_session)
+
+
+class _BodyStreamingResponse(StreamingResponse):
+    """StreamingResponse for endpoints that still read the request body while streaming.
+
+    Starlette's own one listens on ``receive()`` for a disconnect during the
+    response (before ASGI spec 2.4), which would swallow body chunks the
+    endpoint has not read yet.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+
+def _parse_record(line):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+async def _ndjson_records(request):
+    """Records from an NDJSON request body, parsed line by line as it arrives"""
+    buffer = b''
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            if line.strip():
+                yield _parse_record(line)
+    if buffer.strip():
+        yield _parse_record(buffer)
+
+
+async def _listed_records(records):
+    for record in records:
+        yield record
+
+
+async def recommend_batch(request):
+    """Batch /recommend: NDJSON out, one line per input record plus a summary line.
+
+    An NDJSON body is read as it arrives and handled in chunks of
+    BATCH_CHUNK_SIZE records, like app.recommend_batch; each chunk runs on
+    a worker thread and its results are streamed before the next is read.
+    """
+    if request.headers.get('content-type', '').split(';')[0].strip() == 'application/x-ndjson':
+        records = _ndjson_records(request)
+    else:
+        try:
+            data = json.loads(await request.body() or b'null')
+        except ValueError:
+            data = None
+        listed = data.get('records') if isinstance(data, dict) else None
+        if not isinstance(listed, list):
+            return JSONResponse({'error': 'Expected {"records": [...]} or an application/x-ndjson body'},
+                                status_code=400)
+        records = _listed_records(listed)
+    first = await anext(records, moodflix.NO_RECORD)
+    if first is moodflix.NO_RECORD:
+        return JSONResponse({'error': 'No records'}, status_code=400)
+
+    async def lines():
+        counts = {'result': 0, 'error': 0}
+        chunk = [(0, first)]
+        index = 1
+        while True:
+            while len(chunk) < moodflix.BATCH_CHUNK_SIZE and index < moodflix.BATCH_MAX_RECORDS:
+                record = await anext(records, moodflix.NO_RECORD)
+                if record is moodflix.NO_RECORD:
+                    break
+                chunk.append((index, record))
+                index += 1
+            if not chunk:
+                break
+            frames = await asyncio.to_thread(list, moodflix._recommend_chunk(chunk, moodflix.RECOMMEND_TARGET_COUNT))
+            for frame in frames:
+                counts[frame['type']] += 1
+                yield _ndjson_line(frame)
+            chunk = []
+        yield _ndjson_line({'type': 'summary', 'records': counts['result'] + counts['error'],
+                            'results': counts['result'], 'errors': counts['error'],
+                            'truncated': await anext(records, moodflix.NO_RECORD) is not moodflix.NO_RECORD})
+
+    return _BodyStreamingResponse(lines(), media_type='application/x-ndjson',
+                                  headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def _ndjson_line(frame):
+    return json.dumps(frame, ensure_ascii=False) + '\n'
+
+
+async def trailer(request):
+    """Fetch top YouTube trailer for a movie title"""
+    title = request.query_params.get('title', '').strip()
+    year = request.query_params.get('year', '').strip()
+    if not title:
+        return JSONResponse({'error': 'Missing title'}, status_code=400)
+    key = moodflix.trailer_response_key(title, year)
+    entry = moodflix.cached_entry('trailer', key)
+    if entry is not None:
+        return _cached_response(request, 'trailer', entry, 'HIT')
+    try:
+        video_id = await lookup_trailer(title, year)
+    except Exception:
+        return JSONResponse({'error': moodflix.TRAILER_LOOKUP_FAILED}, status_code=503)
+    entry = moodflix.cache_payload('trailer', key, {'videoId': video_id}) if video_id else None
+    if entry is not None:
+        return _cached_response(request, 'trailer', entry, 'MISS')
+    return JSONResponse({'videoId': video_id})
+
+
+async def trailers(request):
+    """Resolve trailers for a whole result page: {"movies": [{"title", "year"}, ...]}"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    items = (data or {}).get('movies') if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return JSONResponse({'error': 'Expected a list of movies'}, status_code=400)
+    pairs = []
+    for item in items[:moodflix.TRAILER_BATCH_MAX]:
+        if not isinstance(item, dict):
+            continue
+        title = str(item.get('title') or '').strip()
+        year = str(item.get('year') or '').strip()[:4]
+        if title:
+            pairs.append((title, year))
+    deadline = time.monotonic() + moodflix.RECOMMEND_DEADLINE_SECONDS
+    tasks = [asyncio.ensure_future(lookup_trailer(title, year, deadline)) for title, year in pairs]
+    if tasks:
+        await asyncio.wait(tasks, timeout=moodflix.RECOMMEND_DEADLINE_SECONDS)
+    records = []
+    for task in tasks:
+        if task.done() and not task.cancelled() and task.exception() is None:
+            records.append({'videoId': task.result()})
+        else:
+            task.cancel()
+            records.append({'error': moodflix.TRAILER_LOOKUP_FAILED})
+    return JSONResponse({
+        'trailers': [
+            {'title': title, 'year': year, **record}
+            for (title, year), record in zip(pairs, records)
+        ]
+    })
+
+
+async def poster(request):
+    """Cached, optionally resized TMDB poster with a strong ETag"""
+    size, filename = request.path_params['size'], request.path_params['filename']
+    try:
+        # Disk reads, and the fetch + resize on a miss, stay off the event loop
+        found = await asyncio.to_thread(moodflix.load_poster, size, filename)
+    except ValueError:
+        return JSONResponse({'error': 'Unknown poster'}, status_code=404)
+    if found is None:
+        return JSONResponse({'error': 'Poster not found'}, status_code=404)
+    headers = moodflix.poster_headers(found)
+    if parse_etags(request.headers.get('if-none-match')).contains(found.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(found.data, media_type=found.content_type, headers=headers)
+
+
+async def cache_stats(request):
+    """Cache, coalescing, upstream, index, response cache and history counters"""
+    # The SQLite and mmap backends count their entries on disk
+    stats = await asyncio.to_thread(moodflix.collect_cache_stats, _MOVIE_FLIGHTS, _TRAILER_FLIGHTS)
+    return JSONResponse(stats)
+
+
+async def metrics(request):
+    """Prometheus scrape endpoint"""
+    return Response(moodflix.REGISTRY.exposition(), media_type=moodflix.METRICS_CONTENT_TYPE)
+
+
+class RequestMetrics:
+    """ASGI middleware feeding moodflix_http_request_seconds (time to response headers)"""
+
+    def __init__(self, app, endpoints):
+        self.app = app
+        self.endpoints = frozenset(endpoints)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        path = scope['path']
+        if path.startswith('/static/'):
+            endpoint = '/static/<path:filename>'
+        elif path.startswith('/poster/'):
+            endpoint = '/poster/<size>/<filename>'
+        else:
+            endpoint = path if path in self.endpoints else 'unmatched'
+
+        async def send_with_metrics(message):
+            if message['type'] == 'http.response.start':
+                moodflix.HTTP_REQUEST_SECONDS.labels(endpoint, message['status']).observe(
+                    time.perf_counter() - started)
+            await send(message)
+
+        await self.app(scope, receive, send_with_metrics)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global _client
+    # Load the classifier, catalog and index before taking traffic
+    await asyncio.to_thread(moodflix.warm_up)
+    yield
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+routes = [
+    Route('/', index),
+    Route('/recommend', recommend, methods=['GET', 'POST']),
+    Route('/recommend/stream', recommend_stream, methods=['POST']),
+    Route('/recommend/batch', recommend_batch, methods=['POST']),
+    Route('/trailer', trailer, methods=['GET']),
+    Route('/trailers', trailers, methods=['POST']),
+    Route('/poster/{size}/{filename}', poster, methods=['GET']),
+    Route('/cache/stats', cache_stats, methods=['GET']),
+    Route('/metrics', metrics, methods=['GET']),
+    Mount('/static', StaticFiles(directory=moodflix.app.static_folder), name='static'),
+]
+
+application = Starlette(
+    routes=routes,
+    lifespan=lifespan,
+    middleware=[Middleware(RequestMetrics, endpoints=[r.path for r in routes if isinstance(r, Route)])],
+)
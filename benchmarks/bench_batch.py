@@ -0,0 +1,77 @@
+"""Batch recommendations with the default client-side rate limits.
+
+Runs ``app.recommend_batch`` in-process over ``--records`` copies of the
+recorded payloads, against the local stub, from a cold cache. Unlike the
+other benchmarks it leaves ``RAPIDAPI_RATE_PER_SECOND``/``RAPIDAPI_BURST``
+at the app's defaults (unless they are set in the environment), so it
+shows how the batch path behaves under the real quota. Reported: elapsed
+time, records answered with curated fallbacks, upstream calls made, and the
+movie governor's counters.
+
+    python benchmarks/bench_batch.py --records 2000 --latency 0.1
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+import time
+from itertools import cycle, islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from replay import DEFAULT_PAYLOADS, load_payloads  # noqa: E402
+from stub_upstream import start_stub  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.1, help='stub seconds per upstream call')
+    parser.add_argument('--payloads', default=DEFAULT_PAYLOADS, help='JSONL file of recorded /recommend bodies')
+    parser.add_argument('--output', help='write the summary to this JSON file')
+    args = parser.parse_args()
+
+    stub = start_stub(latency=args.latency)
+    os.environ['RAPIDAPI_BASE_URL'] = f"http://127.0.0.1:{stub.server_port}/api"
+    # Keep stub results out of the shared on-disk caches
+    os.environ.setdefault('CACHE_BACKEND', 'memory')
+    os.environ.setdefault('HISTORY_BACKEND', 'memory')
+    os.environ.setdefault('TRAILER_CACHE_BACKEND', 'memory')
+    import app as app_module
+
+    payloads = load_payloads(args.payloads)
+    records = (dict(payload, id=i) for i, payload in enumerate(islice(cycle(payloads), args.records)))
+    outcomes = collections.Counter()
+    started = time.perf_counter()
+    for frame in app_module.recommend_batch(records):
+        if frame['type'] == 'error':
+            outcomes['error'] += 1
+        else:
+            outcomes['fallback' if frame.get('fallback') else 'api'] += 1
+    elapsed = time.perf_counter() - started
+    governor = app_module._MOVIE_GOVERNOR.stats()
+    stub.shutdown()
+
+    summary = {
+        'records': sum(outcomes.values()),
+        'elapsed_s': round(elapsed, 2),
+        'api': outcomes['api'],
+        'fallback': outcomes['fallback'],
+        'errors': outcomes['error'],
+        'upstream_calls': stub.RequestHandlerClass.snapshot()['calls'],
+        'rate_per_second': app_module._GOVERNOR_SETTINGS['rate'],
+        'burst': app_module._GOVERNOR_SETTINGS['burst'],
+        'governor': {k: governor[k] for k in ('requests', 'waited', 'throttled', 'rejected')},
+    }
+    print(f"{summary['records']} records in {summary['elapsed_s']:.2f} s "
+          f"(rate {summary['rate_per_second']:g}/s, burst {summary['burst']}): "
+          f"{summary['api']} from the API, {summary['fallback']} with fallbacks, {summary['errors']} errors")
+    print(f"upstream calls: {summary['upstream_calls']}  governor: {summary['governor']}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Throughput and latency of the mood classifiers.
+
+Compares the original TextBlob polarity path (a fresh TextBlob per call, as
+analyze_sentiment used to do) with the lexicon classifier, both raw and
+memoised, over a mix of realistic inputs.
+
+    python benchmarks/bench_mood.py --iterations 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mood import LexiconMoodClassifier, TextBlobMoodClassifier, CachedMoodClassifier  # noqa: E402
+
+SAMPLES = [
+    "I feel happy and want to watch Bollywood comedy",
+    "I'm feeling sad and need uplifting Indian movies",
+    "I'm in the mood for romantic Bollywood movies",
+    "I want to watch exciting action movies from India",
+    "I'm feeling nostalgic and want classic Bollywood",
+    "I need something to make me laugh - Bollywood comedy",
+    "I want to watch thriller movies from Hollywood",
+    "I am angry and want action-packed movies",
+    "I want something relaxing and calm",
+    "bored",
+    "not happy at all today, kind of lonely",
+    "scared but I want a horror night 😨",
+]
+
+
+def legacy_textblob(text):
+    from textblob import TextBlob
+    polarity = TextBlob(text).sentiment.polarity
+    if polarity > 0.3:
+        return "happy"
+    elif polarity > 0.1:
+        return "excited"
+    elif polarity > -0.1:
+        return "relaxed"
+    elif polarity > -0.3:
+        return "bored"
+    return "sad"
+
+
+def measure(label, fn, iterations):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        text = SAMPLES[i % len(SAMPLES)]
+        t0 = time.perf_counter()
+        fn(text)
+        latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<22} {iterations / total:>12,.0f} ops/s  p50={p50 * 1e6:8.1f} µs  p99={p99 * 1e6:8.1f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    legacy_textblob('warm up')
+    print(f"TextBlob first call (lazy load): {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    measure('textblob (legacy)', legacy_textblob, args.iterations)
+    measure('textblob classifier', TextBlobMoodClassifier().load().classify, args.iterations)
+    measure('lexicon', LexiconMoodClassifier().classify, args.iterations)
+    measure('lexicon + memo', CachedMoodClassifier(LexiconMoodClassifier()).classify, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Cold-cache latency of POST /recommend, serial vs concurrent fan-out.
+
+Starts the local stub upstream, points app.py at it and times a batch of
+cold requests (cache cleared before each) with a one-worker pool, which
+reproduces the old one-query-at-a-time loop, and with the default pool.
+
+    python benchmarks/bench_recommend.py --latency 0.5 --runs 10
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_upstream import start_stub  # noqa: E402
+
+PAYLOADS = [
+    {'mood_text': 'I feel happy', 'emoji': '😊', 'preference': 'mixed'},
+    {'mood_text': 'so sad today', 'emoji': '😢', 'preference': 'indian'},
+    {'mood_text': 'want action', 'emoji': '😠', 'preference': 'hollywood'},
+    {'mood_text': 'romance please', 'emoji': '💕', 'preference': 'mixed'},
+]
+
+
+def run(client, app_module, runs):
+    timings = []
+    for i in range(runs):
+        app_module._CACHE.clear()
+        payload = PAYLOADS[i % len(PAYLOADS)]
+        start = time.perf_counter()
+        resp = client.post('/recommend', json=payload)
+        timings.append(time.perf_counter() - start)
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))]
+    print(f"{label:<12} mean={statistics.mean(timings) * 1000:8.1f} ms  "
+          f"p50={statistics.median(timings) * 1000:8.1f} ms  p95={p95 * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.5, help='stub seconds per upstream call')
+    parser.add_argument('--runs', type=int, default=8)
+    args = parser.parse_args()
+
+    stub = start_stub(latency=args.latency)
+    os.environ['RAPIDAPI_BASE_URL'] = f"http://127.0.0.1:{stub.server_port}/api"
+    # Keep stub results and benchmark sessions out of the shared on-disk caches
+    os.environ.setdefault('CACHE_BACKEND', 'memory')
+    os.environ.setdefault('HISTORY_BACKEND', 'memory')
+    os.environ.setdefault('TRAILER_CACHE_BACKEND', 'memory')
+    # Clearing _CACHE must leave every request cold: no cached responses or
+    # local-index matches standing in for the upstream calls
+    os.environ.setdefault('RESPONSE_CACHE_RECOMMEND_SECONDS', '0')
+    os.environ.setdefault('LOCAL_INDEX_MAX_MOVIES', '0')
+    # The stub has no quota; don't let the client-side limiter skew timings
+    os.environ.setdefault('RAPIDAPI_RATE_PER_SECOND', '1000')
+    os.environ.setdefault('RAPIDAPI_BURST', '1000')
+    import app as app_module
+
+    # A new visitor each request, so no session history re-ranks the response
+    client = app_module.app.test_client(use_cookies=False)
+    concurrent_pool = app_module._FETCH_POOL
+
+    app_module._FETCH_POOL = ThreadPoolExecutor(max_workers=1)
+    report('serial', run(client, app_module, args.runs))
+    app_module._FETCH_POOL = concurrent_pool
+    report('concurrent', run(client, app_module, args.runs))
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""Throughput of POST /recommend: sync workers (app.py) vs async (asgi.py).
+
+Starts the local stub upstream, launches each server as a subprocess pointed
+at it and fires ``--requests`` cold-cache requests with ``--concurrency``
+clients in flight, then reports requests/second and latency percentiles.
+Every request carries unique mood text of at most four words, so it adds
+a user-text search that misses the cache (the local index, whose matches
+would replace that search, is turned off). The templated searches for
+each mood are shared and cached after the first requests. Once they fill
+the page, a server may return before the text search is sent or
+answered. The report therefore shows how many upstream calls per request
+were actually made. Caches and histories go to a fresh temporary
+directory per server, and cookies are dropped, so every request is a new
+visitor.
+
+The sync server is gunicorn with ``--workers`` sync workers when gunicorn is
+installed, otherwise Werkzeug with the same number of forked processes. The
+async server is uvicorn with ``--workers`` event loops.
+
+    python benchmarks/loadtest.py --latency 0.5 --concurrency 100 --requests 400
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stub_upstream import start_stub  # noqa: E402
+
+MOODS = [
+    ('feeling happy', '😊', 'mixed'),
+    ('so sad', '😢', 'indian'),
+    ('want action', '😠', 'hollywood'),
+    ('romance please', '💕', 'mixed'),
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def sync_command(port, workers):
+    if importlib.util.find_spec('gunicorn') is not None:
+        return [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--worker-class', 'sync',
+                '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app']
+    code = ("from werkzeug.serving import run_simple; import app; "
+            f"run_simple('127.0.0.1', {port}, app.app, threaded=False, processes={workers})")
+    return [sys.executable, '-c', code]
+
+
+def async_command(port, workers):
+    return [sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1',
+            '--port', str(port), '--workers', str(workers), '--log-level', 'warning']
+
+
+def launch(cmd, port, env):
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}: {' '.join(cmd)}")
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/', timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"server did not come up: {' '.join(cmd)}")
+
+
+async def drive(base_url, total, concurrency, label):
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def client_loop(client):
+        nonlocal errors
+        for i in counter:
+            text, emoji, preference = MOODS[i % len(MOODS)]
+            # At most 4 words, so the text becomes its own search query
+            payload = {'mood_text': f'{text} zq{label}{i}', 'emoji': emoji, 'preference': preference}
+            # Every request is a new visitor: no session history to rank against
+            client.cookies.clear()
+            start = time.perf_counter()
+            try:
+                resp = await client.post('/recommend', json=payload)
+                ok = resp.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct * (len(values) - 1))))]
+
+
+def report(label, latencies, errors, elapsed, upstream_calls):
+    print(f"{label:<7} {len(latencies) / elapsed:8.1f} req/s  "
+          f"p50={percentile(latencies, 0.50) * 1000:8.1f} ms  "
+          f"p95={percentile(latencies, 0.95) * 1000:8.1f} ms  "
+          f"p99={percentile(latencies, 0.99) * 1000:8.1f} ms  errors={errors}  "
+          f"upstream calls/request={upstream_calls / max(1, len(latencies)):.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.5, help='stub seconds per upstream call')
+    parser.add_argument('--concurrency', type=int, default=100, help='clients in flight')
+    parser.add_argument('--requests', type=int, default=400, help='requests per server')
+    parser.add_argument('--workers', type=int, default=2, help='processes per server')
+    parser.add_argument('--only', choices=('sync', 'async'), help='run just one server')
+    args = parser.parse_args()
+
+    stub = start_stub(latency=args.latency)
+    env = dict(os.environ)
+    env['RAPIDAPI_BASE_URL'] = f"http://127.0.0.1:{stub.server_port}/api"
+    env['YOUTUBE_SEARCH_URL'] = f"http://127.0.0.1:{stub.server_port}/search"
+    # Local matches would replace the per-request text search
+    env.setdefault('LOCAL_INDEX_MAX_MOVIES', '0')
+    # The stub has no quota; don't let the client-side limiter skew results
+    env.setdefault('RAPIDAPI_RATE_PER_SECOND', '100000')
+    env.setdefault('RAPIDAPI_BURST', '100000')
+
+    servers = [('sync', sync_command), ('async', async_command)]
+    for label, command in servers:
+        if args.only and args.only != label:
+            continue
+        port = free_port()
+        # Each server starts cold, with its own caches and histories, outside
+        # instance/. They stay on disk so forked workers share them.
+        scratch = tempfile.mkdtemp(prefix=f'moodflix-loadtest-{label}-')
+        server_env = dict(env, **{name: os.path.join(scratch, name.lower())
+                                  for name in ('CACHE_PATH', 'HISTORY_PATH', 'TRAILER_CACHE_PATH',
+                                               'POSTER_CACHE_PATH')})
+        proc = launch(command(port, args.workers), port, server_env)
+        stub.RequestHandlerClass.reset_stats()
+        try:
+            latencies, errors, elapsed = asyncio.run(
+                drive(f'http://127.0.0.1:{port}', args.requests, args.concurrency, label))
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+        report(label, latencies, errors, elapsed, stub.RequestHandlerClass.snapshot()['calls'])
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""Replay recorded /recommend payloads at a fixed rate and report the results.
+
+Starts the stub upstream (with optional latency jitter, 500s, 429s and a
+per-second quota) and the app (Flask or ASGI) as a subprocess pointed at
+it. It then sends the payloads from a JSONL file (one
+``{"mood_text", "emoji", "preference", "limit"}`` object per line) at
+``--qps``. Arrivals are open-loop: latency is measured from each request's
+scheduled send time, so a slow server cannot hide its queueing.
+
+Reported: throughput, latency percentiles, error breakdown, upstream calls
+(as seen by the stub and by the app), movie cache hit rate and fallback
+rate. The last two come from the app's /metrics. ``--output`` saves the
+summary as JSON and ``--compare`` diffs a run against a saved one.
+
+    python benchmarks/replay.py --qps 20 --duration 30 --output before.json
+    python benchmarks/replay.py --qps 20 --duration 30 --compare before.json
+    python benchmarks/replay.py --server async --rate-limit-rate 0.05 --jitter 0.3
+    python benchmarks/replay.py --target http://127.0.0.1:5000 --stub-url http://127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+import httpx
+
+from loadtest import async_command, free_port, launch, percentile
+from stub_upstream import add_stub_arguments, start_stub, stub_kwargs
+
+DEFAULT_PAYLOADS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'payloads.jsonl')
+
+_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def sync_command(port, workers=1):
+    # One threaded process, so /metrics sees every request
+    code = ("from werkzeug.serving import run_simple; import app; "
+            f"run_simple('127.0.0.1', {port}, app.app, threaded=True)")
+    return [sys.executable, '-c', code]
+
+
+def load_payloads(path):
+    with open(path, encoding='utf-8') as f:
+        payloads = [json.loads(line) for line in f if line.strip()]
+    if not payloads:
+        raise SystemExit(f"No payloads in {path}")
+    return payloads
+
+
+def scrape_metrics(base_url):
+    """{(name, ((label, value), ...)): value} from the app's /metrics, or {} if unavailable."""
+    try:
+        resp = httpx.get(f'{base_url}/metrics', timeout=5)
+    except httpx.HTTPError:
+        return {}
+    if resp.status_code != 200:
+        return {}
+    samples = {}
+    for line in resp.text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        series, _, value = line.rpartition(' ')
+        name, _, labels = series.partition('{')
+        samples[(name, tuple(sorted(_LABEL_RE.findall(labels))))] = float(value)
+    return samples
+
+
+def metric_delta(before, after, name, group_by=None, **match):
+    """Increase of a counter between two scrapes, summed, or split by one label."""
+    totals = collections.Counter()
+    for (sample_name, labels), value in after.items():
+        if sample_name != name:
+            continue
+        label_map = dict(labels)
+        if any(label_map.get(k) != v for k, v in match.items()):
+            continue
+        key = label_map.get(group_by) if group_by else None
+        totals[key] += value - before.get((sample_name, labels), 0.0)
+    return dict(totals) if group_by else totals[None]
+
+
+def stub_stats(stub_url):
+    if not stub_url:
+        return None
+    try:
+        return httpx.get(f'{stub_url}/__stats', timeout=5).json()
+    except httpx.HTTPError:
+        return None
+
+
+async def replay(base_url, endpoint, payloads, qps, total, timeout):
+    loop = asyncio.get_running_loop()
+    latencies = []
+    outcomes = collections.Counter()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+
+    async def send(client, payload, scheduled):
+        # Every request is a new visitor, as in the recorded traffic: no
+        # session history carried over from earlier replayed requests
+        client.cookies.clear()
+        try:
+            resp = await client.post(endpoint, json=payload)
+            outcomes[str(resp.status_code)] += 1
+        except httpx.HTTPError as e:
+            outcomes[type(e).__name__] += 1
+        latencies.append(loop.time() - scheduled)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        start = loop.time()
+        tasks = []
+        for i in range(total):
+            scheduled = start + i / qps
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(send(client, payloads[i % len(payloads)], scheduled)))
+        await asyncio.gather(*tasks)
+        elapsed = loop.time() - start
+    return latencies, outcomes, elapsed
+
+
+def summarize(args, latencies, outcomes, elapsed, metrics_before, metrics_after, stub_before, stub_after):
+    ok = outcomes.get('200', 0)
+    summary = {
+        'server': args.server if not args.target else args.target,
+        'endpoint': args.endpoint,
+        'offered_qps': args.qps,
+        'requests': len(latencies),
+        'ok': ok,
+        'errors': {k: v for k, v in outcomes.items() if k != '200'},
+        'throughput': round(ok / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            name: round(percentile(latencies, pct) * 1000, 1)
+            for name, pct in (('p50', 0.50), ('p90', 0.90), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))
+        },
+    }
+    if metrics_after:
+        lookups = metric_delta(metrics_before, metrics_after, 'moodflix_movie_lookup_seconds_count',
+                               group_by='result')
+        total_lookups = sum(lookups.values())
+        hits = lookups.get('hit', 0) + lookups.get('stale', 0)
+        recs = metric_delta(metrics_before, metrics_after, 'moodflix_recommendations_total', group_by='fallback')
+        total_recs = sum(recs.values())
+        summary['app'] = {
+            'movie_lookups': int(total_lookups),
+            'cache_hit_rate': round(hits / total_lookups, 4) if total_lookups else 0.0,
+            'fallback_rate': round(recs.get('true', 0) / total_recs, 4) if total_recs else 0.0,
+            'upstream_responses': {
+                code: int(n) for code, n in sorted(metric_delta(
+                    metrics_before, metrics_after, 'moodflix_upstream_responses_total', group_by='code').items())
+            },
+        }
+    if stub_after is not None:
+        before = stub_before or {}
+        summary['upstream_calls'] = {
+            path: {k: v - before.get(path, {}).get(k, 0) for k, v in counts.items()}
+            for path, counts in stub_after.items() if isinstance(counts, dict)
+        }
+        summary['upstream_calls']['total'] = stub_after['calls'] - before.get('calls', 0)
+    return summary
+
+
+def report(summary):
+    lat = summary['latency_ms']
+    print(f"server={summary['server']} endpoint={summary['endpoint']} offered={summary['offered_qps']} qps")
+    print(f"requests={summary['requests']} ok={summary['ok']} errors={summary['errors'] or 0} "
+          f"throughput={summary['throughput']} req/s")
+    print(f"latency p50={lat['p50']} ms  p90={lat['p90']} ms  p95={lat['p95']} ms  "
+          f"p99={lat['p99']} ms  max={lat['max']} ms")
+    app_stats = summary.get('app')
+    if app_stats:
+        print(f"cache hit rate={app_stats['cache_hit_rate']:.1%} over {app_stats['movie_lookups']} lookups  "
+              f"fallback rate={app_stats['fallback_rate']:.1%}  upstream responses={app_stats['upstream_responses']}")
+    calls = summary.get('upstream_calls')
+    if calls:
+        per_path = ', '.join(f"{path}: {c['calls']} ({c['errors']} 500s, {c['rate_limited']} 429s)"
+                             for path, c in calls.items() if path != 'total')
+        print(f"upstream calls={calls['total']}  {per_path}")
+
+
+def compare(summary, baseline):
+    rows = [
+        ('throughput (req/s)', summary['throughput'], baseline.get('throughput')),
+        ('p50 (ms)', summary['latency_ms']['p50'], baseline.get('latency_ms', {}).get('p50')),
+        ('p95 (ms)', summary['latency_ms']['p95'], baseline.get('latency_ms', {}).get('p95')),
+        ('p99 (ms)', summary['latency_ms']['p99'], baseline.get('latency_ms', {}).get('p99')),
+        ('errors', sum(summary['errors'].values()), sum(baseline.get('errors', {}).values())),
+    ]
+    if 'upstream_calls' in summary and 'upstream_calls' in baseline:
+        rows.append(('upstream calls', summary['upstream_calls']['total'], baseline['upstream_calls']['total']))
+    if 'app' in summary and 'app' in baseline:
+        rows.append(('cache hit rate', summary['app']['cache_hit_rate'], baseline['app']['cache_hit_rate']))
+        rows.append(('fallback rate', summary['app']['fallback_rate'], baseline['app']['fallback_rate']))
+    print(f"\n{'':<20}{'baseline':>12}{'this run':>12}{'change':>10}")
+    for label, now, before in rows:
+        if before is None:
+            continue
+        change = f"{(now - before) / before:+.1%}" if before else 'n/a'
+        print(f"{label:<20}{before:>12}{now:>12}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--payloads', default=DEFAULT_PAYLOADS, help='JSONL file of recorded /recommend bodies')
+    parser.add_argument('--qps', type=float, default=10, help='requests per second to send')
+    parser.add_argument('--duration', type=float, default=20, help='seconds to send for')
+    parser.add_argument('--endpoint', default='/recommend', help='/recommend or /recommend/stream')
+    parser.add_argument('--server', choices=('sync', 'async'), default='sync',
+                        help='app.py under Werkzeug (threaded) or asgi.py under uvicorn')
+    parser.add_argument('--target', help='replay against an already running app instead of starting one')
+    parser.add_argument('--stub-url', help='with --target: stub to read upstream call counts from')
+    parser.add_argument('--timeout', type=float, default=30, help='per-request client timeout')
+    parser.add_argument('--output', help='write the summary to this JSON file')
+    parser.add_argument('--compare', help='summary JSON from an earlier run to diff against')
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.payloads)
+    total = max(1, int(args.qps * args.duration))
+    proc = None
+    if args.target:
+        base_url = args.target.rstrip('/')
+        stub_url = args.stub_url
+    else:
+        stub = start_stub(**stub_kwargs(args))
+        stub_url = f"http://127.0.0.1:{stub.server_port}"
+        env = dict(os.environ)
+        env['RAPIDAPI_BASE_URL'] = f"{stub_url}/api"
+        env['YOUTUBE_SEARCH_URL'] = f"{stub_url}/search"
+        # Start every run from an empty cache so runs are comparable
+        env.setdefault('CACHE_BACKEND', 'memory')
+        env.setdefault('TRAILER_CACHE_BACKEND', 'memory')
+        env.setdefault('HISTORY_BACKEND', 'memory')
+        env.setdefault('POSTER_CACHE_PATH', tempfile.mkdtemp(prefix='moodflix-replay-posters-'))
+        # The stub's --quota models the plan limit; keep the client-side limiter out of the way
+        env.setdefault('RAPIDAPI_RATE_PER_SECOND', '100000')
+        env.setdefault('RAPIDAPI_BURST', '100000')
+        port = free_port()
+        command = sync_command if args.server == 'sync' else async_command
+        proc = launch(command(port, 1), port, env)
+        base_url = f'http://127.0.0.1:{port}'
+
+    try:
+        metrics_before = scrape_metrics(base_url)
+        stub_before = stub_stats(stub_url)
+        started = time.strftime('%Y-%m-%dT%H:%M:%S')
+        latencies, outcomes, elapsed = asyncio.run(
+            replay(base_url, args.endpoint, payloads, args.qps, total, args.timeout))
+        metrics_after = scrape_metrics(base_url)
+        stub_after = stub_stats(stub_url)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    summary = summarize(args, latencies, outcomes, elapsed, metrics_before, metrics_after, stub_before, stub_after)
+    summary['started'] = started
+    report(summary)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(summary, json.load(f))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
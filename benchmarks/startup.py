@@ -0,0 +1,147 @@
+"""Worker cold start: import time and time to first response.
+
+Import time is measured in ``--runs`` fresh interpreters as the median wall
+time of ``import app``, then of ``app.warm_up()``. The slowest modules of one
+run are listed from ``python -X importtime``.
+
+Time to first response launches each server (``sync``: gunicorn when
+installed, otherwise Werkzeug; ``async``: uvicorn) against the local stub.
+It records when ``GET /`` first answers and how long the first cold
+``POST /recommend`` then takes.
+
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from loadtest import ROOT, async_command, free_port, sync_command
+from stub_upstream import start_stub
+
+_IMPORT_PROBE = (
+    "import time; t = time.perf_counter(); import app; i = time.perf_counter(); "
+    "app.warm_up(); w = time.perf_counter(); print((i - t) * 1000, (w - i) * 1000)"
+)
+
+
+def base_env(stub_url=None):
+    env = dict(os.environ)
+    # Keep the shared on-disk caches out of the measurement
+    env.setdefault('CACHE_BACKEND', 'memory')
+    env.setdefault('TRAILER_CACHE_BACKEND', 'memory')
+    env.setdefault('HISTORY_BACKEND', 'memory')
+    # warm_up() loads the poster cache; keep its directory out of instance/
+    env.setdefault('POSTER_CACHE_PATH', tempfile.mkdtemp(prefix='moodflix-startup-posters-'))
+    if stub_url:
+        env['RAPIDAPI_BASE_URL'] = f"{stub_url}/api"
+        env['YOUTUBE_SEARCH_URL'] = f"{stub_url}/search"
+    return env
+
+
+def measure_imports(runs, env):
+    imports, warm_ups = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', _IMPORT_PROBE], cwd=ROOT, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        import_ms, warm_ms = map(float, out.strip().splitlines()[-1].split())
+        imports.append(import_ms)
+        warm_ups.append(warm_ms)
+    return statistics.median(imports), statistics.median(warm_ups)
+
+
+def slowest_imports(env, top=8):
+    """(cumulative ms, module) of the slowest top-level imports of app"""
+    err = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Only modules imported directly by app (one level of indentation)
+        if name.startswith('   ') and not name.startswith('    '):
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def time_to_first_response(command, env, timeout=60):
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    started = time.perf_counter()
+    proc = subprocess.Popen(command(port, 1), cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        ready = None
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited with {proc.returncode}")
+            try:
+                if httpx.get(f'{base_url}/', timeout=1).status_code == 200:
+                    ready = time.perf_counter() - started
+                    break
+            except httpx.HTTPError:
+                time.sleep(0.01)
+        if ready is None:
+            raise RuntimeError('server did not come up')
+        before = time.perf_counter()
+        resp = httpx.post(f'{base_url}/recommend', timeout=30,
+                          json={'mood_text': 'space adventure', 'emoji': '', 'preference': 'mixed'})
+        first_recommend = time.perf_counter() - before
+        return {
+            'ready_ms': round(ready * 1000, 1),
+            'first_recommend_ms': round(first_recommend * 1000, 1),
+            'status': resp.status_code,
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters for the import timing')
+    parser.add_argument('--latency', type=float, default=0.1, help='stub seconds per upstream call')
+    parser.add_argument('--only', choices=('sync', 'async'), help='time just one server')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    env = base_env()
+    import_ms, warm_ms = measure_imports(args.runs, env)
+    print(f"import app   {import_ms:8.1f} ms (median of {args.runs})")
+    print(f"warm_up()    {warm_ms:8.1f} ms")
+    slowest = slowest_imports(env)
+    for ms, name in slowest:
+        print(f"  {name:<24}{ms:8.1f} ms")
+    results = {
+        'import_ms': round(import_ms, 1),
+        'warm_up_ms': round(warm_ms, 1),
+        'slowest_imports': {name: round(ms, 1) for ms, name in slowest},
+        'servers': {},
+    }
+
+    stub = start_stub(latency=args.latency)
+    env = base_env(f"http://127.0.0.1:{stub.server_port}")
+    for label, command in (('sync', sync_command), ('async', async_command)):
+        if args.only and args.only != label:
+            continue
+        timing = time_to_first_response(command, env)
+        results['servers'][label] = timing
+        print(f"{label:<7} ready after {timing['ready_ms']:8.1f} ms, "
+              f"first /recommend {timing['first_recommend_ms']:8.1f} ms (HTTP {timing['status']})")
+    stub.shutdown()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""Local stand-in for the RapidAPI endpoints used by app.py.
+
+Serves ``GET /api/search?q=...`` (AI Movie Recommender) with deterministic
+fake movies and ``GET /search?q=...`` (YouTube v3.1) with a fake video ID,
+each after a configurable delay, so the app can be timed without burning
+real quota. Point the app at it with
+``RAPIDAPI_BASE_URL=http://127.0.0.1:<port>/api`` and
+``YOUTUBE_SEARCH_URL=http://127.0.0.1:<port>/search``.
+
+Faults can be injected: a fraction of calls can fail with 500 or be
+rejected with 429 + ``Retry-After``, and ``quota`` caps calls per second the
+way a RapidAPI plan does (429 plus ``X-RateLimit-Requests-*`` headers once
+it is used up). ``GET /__stats`` returns the call counters as JSON.
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def fake_movies(query, count=10):
+    """Deterministic movie list for a query; neighbouring queries overlap a little."""
+    movies = []
+    for i in range(count):
+        # Every third slot is shared across all queries to exercise dedupe
+        seed = f"shared-{i}" if i % 3 == 0 else f"{query}-{i}"
+        digest = hashlib.sha1(seed.encode('utf-8')).hexdigest()
+        movies.append({
+            'id': int(digest[:8], 16),
+            'title': f"Stub Movie {digest[:6]}",
+            'overview': f"A stub result for '{query}'.",
+            'vote_average': round(5 + (int(digest[8:10], 16) % 50) / 10, 1),
+            'poster_path': f"/{digest[:12]}.jpg",
+            'release_date': str(1980 + int(digest[10:12], 16) % 45),
+        })
+    return movies
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.5
+    jitter = 0.0
+    results = 4
+    error_rate = 0.0
+    rate_limit_rate = 0.0
+    quota = 0  # calls per second, 0 = unlimited
+    retry_after = 1
+    calls = 0
+    stats = {}
+    _random = random.Random()
+    _lock = threading.Lock()
+    _window = [0, 0]  # [second, calls in that second]
+
+    @classmethod
+    def reset_stats(cls):
+        with cls._lock:
+            cls.calls = 0
+            cls.stats = {}
+
+    @classmethod
+    def snapshot(cls):
+        with cls._lock:
+            return {'calls': cls.calls, **{path: dict(counts) for path, counts in cls.stats.items()}}
+
+    def _count(self, path, outcome):
+        counts = StubHandler.stats.setdefault(path, {'calls': 0, 'ok': 0, 'errors': 0, 'rate_limited': 0})
+        counts['calls'] += 1
+        counts[outcome] += 1
+
+    def _decide(self, path):
+        """Pick this call's outcome: ('ok', remaining), ('rate_limited', reset) or ('errors', None)."""
+        with StubHandler._lock:
+            StubHandler.calls += 1
+            remaining = None
+            if self.quota:
+                second = int(time.time())
+                if StubHandler._window[0] != second:
+                    StubHandler._window[:] = [second, 0]
+                StubHandler._window[1] += 1
+                remaining = max(0, self.quota - StubHandler._window[1])
+                if StubHandler._window[1] > self.quota:
+                    self._count(path, 'rate_limited')
+                    return 'rate_limited', 1
+            roll = StubHandler._random.random()
+            if roll < self.rate_limit_rate:
+                self._count(path, 'rate_limited')
+                return 'rate_limited', self.retry_after
+            if roll < self.rate_limit_rate + self.error_rate:
+                self._count(path, 'errors')
+                return 'errors', None
+            self._count(path, 'ok')
+            return 'ok', remaining
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == '/__stats':
+            self._send_json(200, self.snapshot())
+            return
+        if parsed.path not in ('/api/search', '/search'):
+            self.send_error(404)
+            return
+        outcome, detail = self._decide(parsed.path)
+        if outcome == 'rate_limited':
+            # Quota rejections come back fast, as they do from RapidAPI
+            self._send_json(429, {'message': 'Too many requests'}, {
+                'Retry-After': str(detail),
+                'X-RateLimit-Requests-Remaining': '0',
+                'X-RateLimit-Requests-Reset': str(detail),
+            })
+            return
+        time.sleep(self.latency + (StubHandler._random.uniform(0, self.jitter) if self.jitter else 0))
+        if outcome == 'errors':
+            self._send_json(500, {'message': 'Injected upstream error'})
+            return
+        query = parse_qs(parsed.query).get('q', [''])[0]
+        if parsed.path == '/search':
+            video_id = hashlib.sha1(query.encode('utf-8')).hexdigest()[:11]
+            payload = {'items': [{'id': {'kind': 'youtube#video', 'videoId': video_id}}]}
+        else:
+            payload = {'movies': fake_movies(query, self.results)}
+        headers = {}
+        if detail is not None:
+            headers['X-RateLimit-Requests-Remaining'] = str(detail)
+        self._send_json(200, payload, headers)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Load tests open hundreds of connections at once
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # The app drops queries it no longer needs; that's not a stub failure
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_stub(port=0, latency=0.5, results=4, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0,
+               quota=0, retry_after=1, seed=None):
+    """Start the stub on a daemon thread and return the running server."""
+    StubHandler.latency = latency
+    StubHandler.jitter = jitter
+    StubHandler.results = results
+    StubHandler.error_rate = error_rate
+    StubHandler.rate_limit_rate = rate_limit_rate
+    StubHandler.quota = quota
+    StubHandler.retry_after = retry_after
+    StubHandler._random = random.Random(seed)
+    StubHandler.reset_stats()
+    server = StubServer(('127.0.0.1', port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_stub_arguments(parser):
+    """Register the stub's latency and fault-injection flags on an argparse parser."""
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds per upstream call')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random latency, up to this many seconds')
+    parser.add_argument('--results', type=int, default=4, help='movies returned per search')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of calls answered with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of calls answered with 429')
+    parser.add_argument('--quota', type=int, default=0, help='calls per second before 429s (0 = unlimited)')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with injected 429s')
+    parser.add_argument('--seed', type=int, help='seed for reproducible fault injection')
+
+
+def stub_kwargs(args):
+    """start_stub keyword arguments from flags added by add_stub_arguments."""
+    return {
+        'latency': args.latency, 'jitter': args.jitter, 'results': args.results,
+        'error_rate': args.error_rate, 'rate_limit_rate': args.rate_limit_rate,
+        'quota': args.quota, 'retry_after': args.retry_after, 'seed': args.seed,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=8765)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    srv = start_stub(args.port, **stub_kwargs(args))
+    print(f"Stub upstream listening on http://127.0.0.1:{srv.server_port}/api")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,602 @@
+"""Cache backends used for upstream API results.
+
+Every backend implements the small ``CacheBackend`` interface (get, set,
+delete, clear, stats) and stores JSON-serialisable values with a time-to-live:
+
+* ``TTLCache`` - thread-safe in-process LRU map with entry and byte budgets.
+  Fast, but private to one worker and lost on restart.
+* ``SQLiteBackend`` - a SQLite file in WAL mode. Shared by every worker on the
+  host and survives restarts.
+* ``MmapBackend`` - a fixed-size hash table in a memory-mapped file guarded by
+  ``flock``. Shared by every worker on the host, survives restarts, and reads
+  never leave the page cache. POSIX only.
+
+``create_backend`` builds one of them from a short name so the app can pick
+the backend from configuration.
+"""
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def json_size(value):
+    """Approximate the memory cost of a value by its JSON-encoded length."""
+    try:
+        return len(json.dumps(value, separators=(',', ':'), default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class CacheBackend:
+    """Interface shared by all cache backends.
+
+    ``get`` returns None for a missing or expired key, so None itself cannot
+    be cached; wrap it in a container when a negative result must be stored.
+    ``get_entry`` also returns when the value was stored, as a
+    ``(value, stored_at)`` tuple, so callers can apply their own freshness
+    rules inside the backend's TTL.
+    """
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+def _ratio(hits, misses):
+    lookups = hits + misses
+    return round(hits / lookups, 4) if lookups else 0.0
+
+
+class TTLCache(CacheBackend):
+    """LRU cache with TTL expiry, entry/byte budgets and hit/miss counters.
+
+    Expired entries are dropped when they are read and by a periodic sweep
+    that piggybacks on normal cache traffic, so idle keys do not pile up in a
+    long-running worker.
+    """
+
+    def __init__(self, ttl, max_entries=1024, max_bytes=16 * 1024 * 1024,
+                 sweep_interval=60.0, sizer=json_size, clock=time.time):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._sizer = sizer
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (value, stored_at, size); most recently used at the end
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._last_sweep = clock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_entry(self, key):
+        """Return (value, stored_at), or None when missing or expired."""
+        now = self._clock()
+        with self._lock:
+            self._maybe_sweep(now)
+            rec = self._data.get(key)
+            if rec is None:
+                self.misses += 1
+                return None
+            if now - rec[1] > self.ttl:
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return rec[0], rec[1]
+
+    def set(self, key, value):
+        now = self._clock()
+        size = self._sizer(value)
+        with self._lock:
+            self._maybe_sweep(now)
+            if key in self._data:
+                self._drop(key)
+            if size > self.max_bytes:
+                # Never worth evicting the whole cache for one oversized value
+                return
+            self._data[key] = (value, now, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def sweep(self):
+        """Drop every expired entry now; returns how many were removed."""
+        with self._lock:
+            return self._sweep(self._clock())
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': _ratio(self.hits, self.misses),
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    # Internal helpers; callers must hold self._lock
+
+    def _drop(self, key):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _maybe_sweep(self, now):
+        if now - self._last_sweep >= self.sweep_interval:
+            self._sweep(now)
+
+    def _sweep(self, now):
+        self._last_sweep = now
+        expired = [k for k, (_, ts, _) in self._data.items() if now - ts > self.ttl]
+        for key in expired:
+            self._drop(key)
+        self.expirations += len(expired)
+        return len(expired)
+
+
+class SQLiteBackend(CacheBackend):
+    """Cache stored in a SQLite database shared by all processes on the host.
+
+    Each thread gets its own connection. Expired rows are removed on read and
+    by a periodic sweep, which also trims the table back to ``max_entries`` by
+    dropping the oldest rows. Hit/miss counters are per process.
+    """
+
+    def __init__(self, path, ttl, max_entries=100_000, sweep_interval=300.0, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            ' key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS cache_stored_at ON cache (stored_at)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        # Connections must not cross a fork (e.g. gunicorn --preload)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_entry(self, key):
+        now = self._clock()
+        try:
+            row = self._conn().execute(
+                'SELECT value, stored_at FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Cache read error for '{key}': {e}")
+            row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            if now - row[1] > self.ttl:
+                self.misses += 1
+                self.expirations += 1
+                expired = True
+            else:
+                self.hits += 1
+                expired = False
+        if expired:
+            self.delete(key)
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value):
+        now = self._clock()
+        try:
+            self._conn().execute(
+                'INSERT OR REPLACE INTO cache (key, value, stored_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value, separators=(',', ':'), default=str), now),
+            )
+        except sqlite3.Error as e:
+            print(f"Cache write error for '{key}': {e}")
+            return
+        with self._lock:
+            due = now - self._last_sweep >= self.sweep_interval
+            if due:
+                self._last_sweep = now
+        if due:
+            self.sweep()
+
+    def delete(self, key):
+        try:
+            self._conn().execute('DELETE FROM cache WHERE key = ?', (key,))
+        except sqlite3.Error as e:
+            print(f"Cache delete error for '{key}': {e}")
+
+    def clear(self):
+        self._conn().execute('DELETE FROM cache')
+
+    def sweep(self):
+        """Delete expired rows and trim to max_entries; returns rows removed."""
+        conn = self._conn()
+        try:
+            expired = conn.execute(
+                'DELETE FROM cache WHERE stored_at < ?', (self._clock() - self.ttl,)
+            ).rowcount
+            overflow = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0] - self.max_entries
+            trimmed = 0
+            if overflow > 0:
+                trimmed = conn.execute(
+                    'DELETE FROM cache WHERE key IN '
+                    '(SELECT key FROM cache ORDER BY stored_at LIMIT ?)', (overflow,)
+                ).rowcount
+        except sqlite3.Error as e:
+            print(f"Cache sweep error: {e}")
+            return 0
+        with self._lock:
+            self.expirations += expired
+            self.evictions += trimmed
+        return expired + trimmed
+
+    def stats(self):
+        try:
+            entries, size = self._conn().execute(
+                'SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache'
+            ).fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+        with self._lock:
+            return {
+                'backend': 'sqlite',
+                'path': self.path,
+                'entries': entries,
+                'bytes': size,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': _ratio(self.hits, self.misses),
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class MmapBackend(CacheBackend):
+    """Fixed-size shared hash table in a memory-mapped file.
+
+    The file holds ``slots`` fixed-width slots. A key hashes to a home slot
+    and may live in any of the next ``probe`` slots; when all of them are in
+    use the least recently written one is overwritten. Values whose encoded
+    key + JSON exceed ``slot_bytes`` are not cached. Cross-process access is
+    serialised with ``flock`` and cross-thread access with a lock.
+
+    A file of another geometry is never resized in place: processes that
+    still map it would get SIGBUS on pages past its new end. A fresh table
+    is written beside it and renamed over it instead, and every process
+    checks on each access whether the path still names the file it mapped.
+    If not, it maps the new file and adopts that file's geometry, so the
+    most recently started process decides the geometry.
+    """
+
+    _MAGIC = b'MFXCACH1'
+    _HEADER = struct.Struct('<8sII')       # magic, slots, slot_bytes
+    _SLOT = struct.Struct('<QdII')         # key hash, stored_at, key len, value len
+
+    def __init__(self, path, ttl, slots=4096, slot_bytes=16 * 1024, probe=8, clock=time.time):
+        if fcntl is None:
+            raise RuntimeError('MmapBackend requires fcntl (POSIX only)')
+        self.path = path
+        self.ttl = ttl
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._probe = probe
+        self.probe = min(probe, slots)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._open()
+
+    def _size(self, slots, slot_bytes):
+        return self._HEADER.size + slots * slot_bytes
+
+    def _geometry(self, fd):
+        """(slots, slot_bytes) of an intact table file, else None."""
+        magic, slots, slot_bytes = self._HEADER.unpack(
+            os.pread(fd, self._HEADER.size, 0).ljust(self._HEADER.size, b'\0'))
+        if magic != self._MAGIC or not slots or slot_bytes <= self._SLOT.size:
+            return None
+        if os.fstat(fd).st_size != self._size(slots, slot_bytes):
+            return None
+        return slots, slot_bytes
+
+    def _is_current(self, fd):
+        """Whether fd is still the file at self.path (it is replaced, never resized)."""
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        opened = os.fstat(fd)
+        return (current.st_ino, current.st_dev) == (opened.st_ino, opened.st_dev)
+
+    def _create(self):
+        """Write an empty table of our geometry beside the file and rename it into place."""
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        fd = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, self._size(self.slots, self.slot_bytes))
+            os.pwrite(fd, self._HEADER.pack(self._MAGIC, self.slots, self.slot_bytes), 0)
+        finally:
+            os.close(fd)
+        os.replace(tmp, self.path)
+
+    def _open(self, adopt=False):
+        """Map the table at self.path.
+
+        A missing or damaged file, or one of another geometry, is replaced
+        with an empty table; with adopt=True an intact file's geometry is
+        taken over instead.
+        """
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            try:
+                current = self._is_current(fd)
+                geometry = self._geometry(fd) if current else None
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            if current and geometry is not None and (adopt or geometry == (self.slots, self.slot_bytes)):
+                break
+            os.close(fd)
+            if current:
+                self._create()
+            # else it was replaced while we opened it; open the new one
+        self.slots, self.slot_bytes = geometry
+        self.probe = min(self._probe, self.slots)
+        self._fd = fd
+        self._map = mmap.mmap(fd, self._size(*geometry))
+        self._pid = os.getpid()
+
+    @staticmethod
+    def _hash(key):
+        h = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+        return h or 1  # 0 marks an empty slot
+
+    def _offset(self, index):
+        return self._HEADER.size + index * self.slot_bytes
+
+    def _slot_indexes(self, h):
+        home = h % self.slots
+        return [(home + i) % self.slots for i in range(self.probe)]
+
+    def _read_slot(self, index):
+        off = self._offset(index)
+        return self._SLOT.unpack_from(self._map, off)
+
+    def _find(self, key, h):
+        encoded = key.encode('utf-8')
+        for index in self._slot_indexes(h):
+            slot_hash, stored_at, klen, vlen = self._read_slot(index)
+            if slot_hash != h:
+                continue
+            start = self._offset(index) + self._SLOT.size
+            if self._map[start:start + klen] == encoded:
+                return index, stored_at, start + klen, vlen
+        return None
+
+    def _stale(self):
+        # A forked worker shares the parent's open file description, and
+        # flock would not exclude between them; it needs a private one.
+        return self._pid != os.getpid() or not self._is_current(self._fd)
+
+    def _locked(self, mode):
+        # The file we mapped keeps its size even once replaced, so an access
+        # racing a replacement only lands in the old table, never faults.
+        if self._stale():
+            with self._lock:
+                if self._stale():
+                    self._map.close()
+                    os.close(self._fd)
+                    self._open(adopt=True)
+        return _FlockGuard(self._lock, self._fd, mode)
+
+    def get_entry(self, key):
+        h = self._hash(key)
+        now = self._clock()
+        with self._locked(fcntl.LOCK_SH):
+            found = self._find(key, h)
+            raw = None
+            if found is not None:
+                _, stored_at, start, vlen = found
+                if now - stored_at <= self.ttl:
+                    raw = bytes(self._map[start:start + vlen])
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                if found is not None:
+                    self.expirations += 1
+                return None
+            self.hits += 1
+        return json.loads(raw), stored_at
+
+    def set(self, key, value):
+        encoded_key = key.encode('utf-8')
+        encoded_val = json.dumps(value, separators=(',', ':'), default=str).encode('utf-8')
+        if self._SLOT.size + len(encoded_key) + len(encoded_val) > self.slot_bytes:
+            with self._lock:
+                self.rejected += 1
+            return
+        h = self._hash(key)
+        now = self._clock()
+        with self._locked(fcntl.LOCK_EX):
+            target = None
+            evicted = False
+            found = self._find(key, h)
+            if found is not None:
+                target = found[0]
+            else:
+                oldest = None
+                for index in self._slot_indexes(h):
+                    slot_hash, stored_at, _, _ = self._read_slot(index)
+                    if slot_hash == 0 or now - stored_at > self.ttl:
+                        target = index
+                        break
+                    if oldest is None or stored_at < oldest[1]:
+                        oldest = (index, stored_at)
+                if target is None:
+                    target = oldest[0]
+                    evicted = True
+            off = self._offset(target)
+            start = off + self._SLOT.size
+            self._map[start:start + len(encoded_key)] = encoded_key
+            self._map[start + len(encoded_key):start + len(encoded_key) + len(encoded_val)] = encoded_val
+            # Write the header last so readers never see a half-written slot
+            self._SLOT.pack_into(self._map, off, h, now, len(encoded_key), len(encoded_val))
+        if evicted:
+            with self._lock:
+                self.evictions += 1
+
+    def delete(self, key):
+        h = self._hash(key)
+        with self._locked(fcntl.LOCK_EX):
+            found = self._find(key, h)
+            if found is not None:
+                self._SLOT.pack_into(self._map, self._offset(found[0]), 0, 0.0, 0, 0)
+
+    def clear(self):
+        with self._locked(fcntl.LOCK_EX):
+            for index in range(self.slots):
+                self._SLOT.pack_into(self._map, self._offset(index), 0, 0.0, 0, 0)
+
+    def stats(self):
+        now = self._clock()
+        entries = 0
+        size = 0
+        with self._locked(fcntl.LOCK_SH):
+            for index in range(self.slots):
+                slot_hash, stored_at, klen, vlen = self._read_slot(index)
+                if slot_hash and now - stored_at <= self.ttl:
+                    entries += 1
+                    size += vlen
+        with self._lock:
+            return {
+                'backend': 'mmap',
+                'path': self.path,
+                'entries': entries,
+                'bytes': size,
+                'slots': self.slots,
+                'slot_bytes': self.slot_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': _ratio(self.hits, self.misses),
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'rejected': self.rejected,
+            }
+
+
+class _FlockGuard:
+    """Hold a thread lock and an flock on a file descriptor together."""
+
+    def __init__(self, lock, fd, mode):
+        self._lock = lock
+        self._fd = fd
+        self._mode = mode
+
+    def __enter__(self):
+        self._lock.acquire()
+        try:
+            fcntl.flock(self._fd, self._mode)
+        except BaseException:
+            self._lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            self._lock.release()
+        return False
+
+
+def create_backend(kind, ttl, path=None, max_entries=2048, max_bytes=32 * 1024 * 1024,
+                   mmap_slots=4096, mmap_slot_bytes=16 * 1024):
+    """Build a cache backend by name: 'memory', 'sqlite' or 'mmap'."""
+    kind = (kind or 'memory').lower()
+    if kind == 'memory':
+        return TTLCache(ttl=ttl, max_entries=max_entries, max_bytes=max_bytes)
+    if kind == 'sqlite':
+        return SQLiteBackend(path, ttl=ttl, max_entries=max_entries)
+    if kind == 'mmap':
+        return MmapBackend(path, ttl=ttl, slots=mmap_slots, slot_bytes=mmap_slot_bytes)
+    raise ValueError(f"Unknown cache backend '{kind}' (expected memory, sqlite or mmap)")
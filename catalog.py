@@ -0,0 +1,128 @@
+"""Curated fallback catalog, loaded once and indexed for fast lookups.
+
+The catalog lives in ``data/fallback_catalog.json`` as a flat list of movies.
+Each movie carries the mood list it belongs to (``null`` for the general
+pool) and its region (``indian`` or ``hollywood``). ``FallbackCatalog``
+turns that into immutable tuples of ``CatalogMovie`` records with indexes by
+mood and by (mood, region), plus rating-sorted lists per region, so building
+a fallback list reads only movies of the allowed regions.
+"""
+import json
+import os
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'fallback_catalog.json')
+
+REGIONS = ('indian', 'hollywood')
+
+# preference value sent by the frontend -> regions it allows
+PREFERENCE_REGIONS = {
+    'mixed': REGIONS,
+    'indian': ('indian',),
+    'hollywood': ('hollywood',),
+}
+
+
+class CatalogMovie:
+    """One curated movie; compact and read-only by convention."""
+
+    __slots__ = ('id', 'title', 'overview', 'rating', 'poster_url', 'release_date', 'mood', 'region')
+
+    def __init__(self, id, title, overview, rating, poster_url, release_date, mood=None, region='hollywood'):
+        self.id = id
+        self.title = title
+        self.overview = overview
+        self.rating = float(rating)
+        self.poster_url = poster_url
+        self.release_date = release_date
+        self.mood = mood
+        self.region = region
+
+    def to_dict(self):
+        """The movie in the same shape get_movies_by_mood returns."""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'overview': self.overview,
+            'rating': self.rating,
+            'poster_url': self.poster_url,
+            'release_date': self.release_date,
+        }
+
+    def __repr__(self):
+        return f"CatalogMovie({self.id!r}, {self.title!r})"
+
+
+def _by_rating(movies):
+    return tuple(sorted(movies, key=lambda m: m.rating, reverse=True))
+
+
+class FallbackCatalog:
+    """Immutable, indexed view over the curated movies."""
+
+    def __init__(self, movies, default_mood='happy'):
+        self.movies = tuple(movies)
+        self.default_mood = default_mood
+        by_mood = {}
+        by_region = {region: [] for region in REGIONS}
+        by_mood_region = {}
+        for movie in self.movies:
+            by_mood.setdefault(movie.mood, []).append(movie)
+            by_region.setdefault(movie.region, []).append(movie)
+            by_mood_region.setdefault((movie.mood, movie.region), []).append(movie)
+        # Curated order is kept for per-mood lists; the region lists are by rating
+        self.by_mood = {mood: tuple(items) for mood, items in by_mood.items()}
+        self.by_region = {region: tuple(items) for region, items in by_region.items()}
+        self.by_mood_region = {key: tuple(items) for key, items in by_mood_region.items()}
+        self.by_region_rating = {region: _by_rating(items) for region, items in by_region.items()}
+        self._all_rating = _by_rating(self.movies)
+        self._picks = {}
+
+    @classmethod
+    def load(cls, path=DEFAULT_CATALOG_PATH):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(CatalogMovie(**item) for item in data['movies'])
+
+    def _sources(self, mood, regions):
+        """The mood's list, the general pool and the rating-sorted rest, limited to regions."""
+        if set(regions) >= set(self.by_region):
+            return [self.by_mood.get(mood, ()), self.by_mood.get(None, ()), self._all_rating]
+        if len(regions) == 1:
+            region = regions[0]
+            return [self.by_mood_region.get((mood, region), ()), self.by_mood_region.get((None, region), ()),
+                    self.by_region_rating.get(region, ())]
+        allowed = set(regions)
+        return [[m for m in source if m.region in allowed]
+                for source in (self.by_mood.get(mood, ()), self.by_mood.get(None, ()), self._all_rating)]
+
+    def picks(self, mood, preference='mixed', count=12):
+        """Up to `count` unique movies for a mood, honouring the region preference.
+
+        The mood's curated list comes first, then the general pool, then the
+        best-rated movies of the allowed regions from other moods. Results are
+        memoised per (mood, preference, count).
+        """
+        if mood not in self.by_mood or mood is None:
+            mood = self.default_mood
+        if preference not in PREFERENCE_REGIONS:
+            preference = 'mixed'
+        key = (mood, preference, count)
+        cached = self._picks.get(key)
+        if cached is not None:
+            return cached
+        picks = []
+        seen = set()
+        for source in self._sources(mood, PREFERENCE_REGIONS[preference]):
+            for movie in source:
+                # Some titles are curated under several moods with different ids
+                dedup_key = movie.title.casefold()
+                if dedup_key in seen:
+                    continue
+                seen.add(dedup_key)
+                picks.append(movie)
+                if len(picks) >= count:
+                    break
+            if len(picks) >= count:
+                break
+        result = self._picks[key] = tuple(picks)
+        return result
@@ -0,0 +1,24 @@
+"""gunicorn settings for serving app.py: ``gunicorn app:app`` picks this file up.
+
+Workers are not preloaded: the cache warmer thread and SQLite handles created
+at import must not be shared across fork. Instead each worker runs
+``warm_up()`` after importing the app and before accepting requests, so the
+first request does not pay for loading the mood classifier, the curated
+catalog or the local index.
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', os.getenv('WEB_CONCURRENCY', '2')))
+worker_class = 'sync'
+
+
+def post_fork(server, worker):
+    # Runs before the worker imports the app: app.py splits the upstream
+    # rate limit between this many processes (also right with -w N)
+    os.environ['WEB_CONCURRENCY'] = str(server.cfg.workers)
+
+
+def post_worker_init(worker):
+    import app
+    app.warm_up()
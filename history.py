@@ -0,0 +1,129 @@
+"""Per-session history of movies already shown, for down-ranking repeats.
+
+Each session keeps a fixed-size ring buffer of 32-bit hashes of the movie
+keys it was shown, and a counting filter over those hashes. The filter is
+a ``bytearray`` of small counters, and every hash bumps two of them.
+Membership is two byte lookups, so ranking can check each candidate in
+O(1). When the ring wraps, the oldest hash is overwritten and its counters
+are decremented. The filter can report a false positive (a few percent
+with the defaults), which only means an unseen movie is ranked a little
+lower.
+
+``HistoryStore`` keeps the rings in a cache backend (see ``cache.py``), so
+with the SQLite or mmap backend every worker on the host sees the same
+history. Only the ring and its position are stored (about
+``capacity * 4 * 4 / 3`` bytes of base64, 700 bytes at the default 128);
+the filter is rebuilt when a session is loaded. Sessions expire with the
+backend's TTL, which restarts on every visit, and the backend's entry limit
+drops the least recently active ones. Recording is read-modify-write
+without a cross-process lock: two requests of one session that finish at
+the same moment can lose one of their updates, which only means those
+movies are not held back on the next visit.
+"""
+import base64
+import binascii
+import zlib
+from array import array
+
+
+def _hash(key):
+    # Stable across processes, unlike hash() on str
+    return zlib.crc32(str(key).encode('utf-8')) or 1
+
+
+class SessionHistory:
+    """Ring buffer of recently shown movie hashes with O(1) membership."""
+
+    __slots__ = ('ring', 'counts', 'pos', 'size')
+
+    def __init__(self, capacity, ring=None, pos=0):
+        self.ring = ring if ring is not None else array('I', bytes(4 * capacity))
+        self.counts = bytearray(8 * capacity)
+        self.pos = pos
+        self.size = 0
+        for h in self.ring:
+            if h:
+                self.size += 1
+                self._bump(h, 1)
+
+    @classmethod
+    def load(cls, capacity, data):
+        """A history from dump() output; empty if it is malformed or of another capacity."""
+        try:
+            ring = array('I')
+            ring.frombytes(base64.b64decode(data['ring'], validate=True))
+            pos = int(data['pos'])
+        except (KeyError, TypeError, ValueError, binascii.Error):
+            return cls(capacity)
+        if len(ring) != capacity or not 0 <= pos < capacity:
+            return cls(capacity)
+        return cls(capacity, ring, pos)
+
+    def dump(self):
+        """JSON-serialisable state; the filter is rebuilt from the ring by load()."""
+        return {'ring': base64.b64encode(self.ring.tobytes()).decode('ascii'), 'pos': self.pos}
+
+    def _buckets(self, h):
+        m = len(self.counts)
+        return h % m, (h >> 16 ^ h * 0x9E3779B1) % m
+
+    def _bump(self, h, delta):
+        for bucket in self._buckets(h):
+            if self.counts[bucket] < 255:  # saturated counters stay put
+                self.counts[bucket] += delta
+
+    def _has(self, h):
+        a, b = self._buckets(h)
+        return self.counts[a] > 0 and self.counts[b] > 0
+
+    def __contains__(self, key):
+        return self._has(_hash(key))
+
+    def __len__(self):
+        return self.size
+
+    def add(self, key):
+        h = _hash(key)
+        if self._has(h):
+            return False
+        old = self.ring[self.pos]
+        if old:
+            self._bump(old, -1)
+        else:
+            self.size += 1
+        self.ring[self.pos] = h
+        self._bump(h, 1)
+        self.pos = (self.pos + 1) % len(self.ring)
+        return True
+
+
+class HistoryStore:
+    def __init__(self, backend, capacity=128):
+        self.backend = backend
+        self.capacity = capacity
+
+    @staticmethod
+    def _key(session_id):
+        return f'history:{session_id}'
+
+    def get(self, session_id):
+        """The session's history, or None."""
+        if not session_id:
+            return None
+        data = self.backend.get(self._key(session_id))
+        return None if data is None else SessionHistory.load(self.capacity, data)
+
+    def record(self, session_id, keys):
+        """Remember that the session was shown keys; returns how many were new."""
+        if not session_id:
+            return 0
+        history = self.get(session_id) or SessionHistory(self.capacity)
+        added = sum(history.add(key) for key in keys if key)
+        # Written even when nothing was new, so the TTL counts from the last visit
+        self.backend.set(self._key(session_id), history.dump())
+        return added
+
+    def stats(self):
+        stats = self.backend.stats()
+        stats['capacity'] = self.capacity
+        return stats
@@ -0,0 +1,106 @@
+"""Response-level cache for idempotent JSON endpoints.
+
+``ResponseCache`` stores the serialized JSON body of a response, plus a
+gzip copy when it is large enough to be worth it, under a key built from
+the normalized request. Each entry carries a strong ETag (a hash of the
+body; the gzip representation gets a ``-gzip`` suffix). ``respond()`` turns
+an entry into (status, body, headers) and sends ``Cache-Control`` with the
+entry's remaining lifetime. A matching ``If-None-Match`` gets 304 on GET and
+HEAD and, as RFC 9110 requires, 412 on any other method. A CDN or reverse
+proxy in front of the app can serve repeated GETs without reaching Flask.
+It does not store POST responses.
+
+Entries live in a per-process ``TTLCache``. A CDN is the layer shared
+between workers.
+"""
+import gzip
+import hashlib
+import json
+import time
+from collections import namedtuple
+
+from werkzeug.http import parse_accept_header, parse_etags
+
+from cache import TTLCache
+
+CachedResponse = namedtuple('CachedResponse', 'body gzipped etag content_type stored_at')
+
+
+def request_key(kind, params):
+    """Cache key for a request: the endpoint kind plus its params as canonical JSON."""
+    return kind + ':' + json.dumps(params, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def private_cache_control(value):
+    """Cache-Control value with ``public`` swapped for ``private`` (added if missing).
+
+    For responses that set a cookie: a shared cache must not store them, or it
+    would hand the same cookie to every client.
+    """
+    directives = [d.strip() for d in (value or '').split(',') if d.strip()]
+    directives = [d for d in directives if d.lower() not in ('public', 'private')]
+    return ', '.join(['private'] + directives)
+
+
+def _entry_size(entry):
+    return len(entry.body) + len(entry.gzipped or b'') + 128
+
+
+class ResponseCache:
+    def __init__(self, ttl, max_entries=4096, max_bytes=32 * 1024 * 1024, gzip_min_bytes=1024,
+                 visibility='public', clock=time.time):
+        self.ttl = ttl
+        self.gzip_min_bytes = gzip_min_bytes
+        self.visibility = visibility
+        self._clock = clock
+        self._store = TTLCache(ttl, max_entries=max_entries, max_bytes=max_bytes, sizer=_entry_size, clock=clock)
+        self.not_modified = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, key):
+        entry = self._store.get_entry(key)
+        return entry[0] if entry else None
+
+    def put(self, key, payload, content_type='application/json'):
+        """Serialize payload, cache it and return the entry."""
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        gzipped = None
+        if self.gzip_min_bytes and len(body) >= self.gzip_min_bytes:
+            gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+        entry = CachedResponse(body, gzipped, hashlib.sha256(body).hexdigest()[:32], content_type, self._clock())
+        self._store.set(key, entry)
+        return entry
+
+    def respond(self, entry, if_none_match=None, accept_encoding=None, cache_status='HIT', method='GET'):
+        """(status, body, headers) for an entry, honouring conditional and gzip requests."""
+        use_gzip = entry.gzipped is not None and parse_accept_header(accept_encoding).quality('gzip') > 0
+        etag = entry.etag + '-gzip' if use_gzip else entry.etag
+        max_age = max(0, int(self.ttl - (self._clock() - entry.stored_at)))
+        headers = {
+            'ETag': f'"{etag}"',
+            'Cache-Control': f'{self.visibility}, max-age={max_age}',
+            'Vary': 'Accept-Encoding',
+            'X-Cache': cache_status,
+        }
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            # Either representation proves the client has this body
+            if etags.contains_weak(entry.etag) or etags.contains_weak(entry.etag + '-gzip'):
+                if method not in ('GET', 'HEAD'):
+                    return 412, b'', headers
+                self.not_modified += 1
+                return 304, b'', headers
+        headers['Content-Type'] = entry.content_type
+        if use_gzip:
+            headers['Content-Encoding'] = 'gzip'
+            return 200, entry.gzipped, headers
+        return 200, entry.body, headers
+
+    def stats(self):
+        stats = self._store.stats()
+        stats['ttl'] = self.ttl
+        stats['not_modified'] = self.not_modified
+        return stats
@@ -0,0 +1,239 @@
+"""Mood classification for free-text input.
+
+Classifiers share one small interface: ``load()`` does any expensive setup
+(call it once at worker start-up) and ``classify(text)`` returns one of the
+moods in ``MOODS``; ``classify_many(texts)`` does the same for a batch.
+
+* ``LexiconMoodClassifier`` - keyword/emoji lexicon with simple negation
+  handling. Covers all ten moods and needs no third-party packages.
+* ``TextBlobMoodClassifier`` - the original polarity thresholds on TextBlob's
+  pattern analyser. Only ever yields happy, excited, relaxed, bored or sad.
+
+``create_classifier`` wraps the chosen classifier in ``CachedMoodClassifier``,
+which memoises results on normalised input.
+"""
+import re
+from functools import lru_cache
+
+MOODS = (
+    'happy', 'sad', 'angry', 'relaxed', 'bored',
+    'excited', 'romantic', 'scared', 'nostalgic', 'adventurous',
+)
+
+# Mood returned when nothing in the text points anywhere (TextBlob's neutral band)
+DEFAULT_MOOD = 'relaxed'
+
+# Words that name the mood outright count double
+_STRONG_WEIGHT = 2.0
+_WEAK_WEIGHT = 1.0
+
+MOOD_LEXICON = {
+    'happy': {
+        'strong': ('happy', 'joyful', 'cheerful', 'glad', 'delighted'),
+        'weak': ('joy', 'great', 'good', 'awesome', 'laugh', 'laughing', 'funny', 'comedy', 'smile',
+                 'fun', 'wonderful', 'amazing', 'yay', 'celebrate', 'celebrating', 'lol', 'hilarious',
+                 'feel-good', 'uplifting', 'blessed', 'fantastic'),
+    },
+    'sad': {
+        'strong': ('sad', 'depressed', 'unhappy', 'heartbroken', 'miserable'),
+        'weak': ('down', 'cry', 'crying', 'lonely', 'alone', 'blue', 'upset', 'grief', 'tears', 'gloomy',
+                 'hurt', 'broken', 'low', 'sorrow', 'lost', 'breakup', 'tragic', 'emotional', 'awful', 'bad'),
+    },
+    'angry': {
+        'strong': ('angry', 'furious', 'mad', 'enraged'),
+        'weak': ('annoyed', 'rage', 'irritated', 'frustrated', 'pissed', 'hate', 'revenge', 'fight',
+                 'vengeance', 'fuming', 'livid', 'smash'),
+    },
+    'relaxed': {
+        'strong': ('relaxed', 'calm', 'chill', 'peaceful'),
+        'weak': ('cozy', 'lazy', 'unwind', 'mellow', 'easy', 'quiet', 'serene', 'relax', 'relaxing',
+                 'sunday', 'slow', 'gentle', 'soothing', 'light', 'comfort'),
+    },
+    'bored': {
+        'strong': ('bored', 'boring'),
+        'weak': ('dull', 'meh', 'restless', 'monotonous', 'whatever', 'nothing', 'mystery', 'twist',
+                 'puzzle', 'detective', 'suspense', 'mind-bending'),
+    },
+    'excited': {
+        'strong': ('excited', 'thrilled', 'pumped', 'hyped'),
+        'weak': ('exciting', 'energetic', 'adrenaline', 'action', 'stoked', 'ecstatic', 'intense', 'fast',
+                 'explosive', 'blockbuster', 'hype', 'energy'),
+    },
+    'romantic': {
+        'strong': ('romantic', 'romance', 'love', 'lovey'),
+        'weak': ('crush', 'date', 'valentine', 'valentines', 'couple', 'sweetheart', 'boyfriend',
+                 'girlfriend', 'wife', 'husband', 'partner', 'kiss', 'wedding', 'anniversary', 'bae'),
+    },
+    'scared': {
+        'strong': ('scared', 'afraid', 'terrified', 'frightened'),
+        'weak': ('fear', 'horror', 'creepy', 'spooky', 'nervous', 'anxious', 'haunted', 'ghost', 'scary',
+                 'halloween', 'zombie', 'thriller', 'nightmare', 'chills'),
+    },
+    'nostalgic': {
+        'strong': ('nostalgic', 'nostalgia'),
+        'weak': ('old', 'classic', 'classics', 'childhood', 'retro', 'vintage', 'memories', 'remember',
+                 'throwback', '90s', '80s', '70s', 'golden', 'oldies', 'reminisce', 'miss'),
+    },
+    'adventurous': {
+        'strong': ('adventurous', 'adventure'),
+        'weak': ('explore', 'exploring', 'travel', 'journey', 'quest', 'epic', 'wild', 'trip',
+                 'expedition', 'daring', 'space', 'sci-fi', 'scifi', 'fantasy', 'jungle', 'treasure'),
+    },
+}
+
+EMOJI_LEXICON = {
+    '😊': 'happy', '😀': 'happy', '😄': 'happy', '😂': 'happy', '🥳': 'happy',
+    '😢': 'sad', '😭': 'sad', '😞': 'sad', '💔': 'sad',
+    '😠': 'angry', '😡': 'angry', '🤬': 'angry',
+    '😌': 'relaxed', '🧘': 'relaxed',
+    '😴': 'bored', '🥱': 'bored', '🕵': 'bored',
+    '🤩': 'excited', '🔥': 'excited',
+    '💕': 'romantic', '❤': 'romantic', '😍': 'romantic', '🥰': 'romantic',
+    '😨': 'scared', '😱': 'scared', '👻': 'scared',
+    '📼': 'nostalgic',
+    '🚀': 'adventurous', '🏃': 'adventurous', '🗺': 'adventurous',
+}
+
+_NEGATIONS = frozenset(('not', 'no', 'never', "don't", 'dont', "isn't", 'isnt', "aren't", "wasn't",
+                        "didn't", "can't", 'cant', 'nothing', 'without', 'hardly'))
+# A negated positive word usually means the opposite (e.g. "not happy")
+_NEGATED_TO = {'happy': 'sad', 'excited': 'bored', 'relaxed': 'angry'}
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+
+
+def normalize(text):
+    """Lowercase and collapse whitespace: the memoisation key for classifiers."""
+    return ' '.join((text or '').lower().split())
+
+
+class MoodClassifier:
+    """Interface for mood classifiers."""
+
+    name = 'base'
+
+    def load(self):
+        """Do expensive one-time setup; safe to call more than once."""
+        return self
+
+    def classify(self, text):
+        raise NotImplementedError
+
+    def classify_many(self, texts):
+        """Classify a batch of texts, running each distinct normalised text once."""
+        moods = {}
+        results = []
+        for text in texts:
+            key = normalize(text)
+            mood = moods.get(key)
+            if mood is None:
+                mood = moods[key] = self.classify(key)
+            results.append(mood)
+        return results
+
+
+class LexiconMoodClassifier(MoodClassifier):
+    """Weighted keyword and emoji matching over all ten moods."""
+
+    name = 'lexicon'
+
+    def __init__(self, lexicon=MOOD_LEXICON, emoji=EMOJI_LEXICON, default=DEFAULT_MOOD):
+        self.default = default
+        self._weights = {}
+        for mood, groups in lexicon.items():
+            for word in groups.get('weak', ()):
+                self._weights[word] = (mood, _WEAK_WEIGHT)
+            for word in groups.get('strong', ()):
+                self._weights[word] = (mood, _STRONG_WEIGHT)
+        self._emoji = dict(emoji)
+        # Ties go to the mood listed first in MOODS
+        self._rank = {mood: i for i, mood in enumerate(MOODS)}
+
+    def classify(self, text):
+        text = normalize(text)
+        scores = {}
+        for char, mood in self._emoji.items():
+            if char in text:
+                scores[mood] = scores.get(mood, 0.0) + _STRONG_WEIGHT
+        tokens = _TOKEN_RE.findall(text)
+        for i, token in enumerate(tokens):
+            hit = self._weights.get(token)
+            if hit is None:
+                continue
+            mood, weight = hit
+            if any(t in _NEGATIONS for t in tokens[max(0, i - 2):i]):
+                mood = _NEGATED_TO.get(mood)
+                if mood is None:
+                    continue
+            scores[mood] = scores.get(mood, 0.0) + weight
+        if not scores:
+            return self.default
+        return max(scores, key=lambda m: (scores[m], -self._rank[m]))
+
+
+class TextBlobMoodClassifier(MoodClassifier):
+    """TextBlob polarity mapped onto five moods (the original analyzer)."""
+
+    name = 'textblob'
+
+    def __init__(self):
+        self._analyzer = None
+
+    def load(self):
+        if self._analyzer is None:
+            from textblob.en.sentiments import PatternAnalyzer
+            self._analyzer = PatternAnalyzer()
+            # Touch the analyzer once so its lexicon is read now, not on the first request
+            self._analyzer.analyze('warm up')
+        return self
+
+    def classify(self, text):
+        self.load()
+        polarity = self._analyzer.analyze(text).polarity
+
+        if polarity > 0.3:
+            return "happy"
+        elif polarity > 0.1:
+            return "excited"
+        elif polarity > -0.1:
+            return "relaxed"
+        elif polarity > -0.3:
+            return "bored"
+        else:
+            return "sad"
+
+
+class CachedMoodClassifier(MoodClassifier):
+    """Memoise another classifier on normalised input."""
+
+    def __init__(self, inner, maxsize=4096):
+        self.inner = inner
+        self.name = inner.name
+        self._classify = lru_cache(maxsize=maxsize)(inner.classify)
+
+    def load(self):
+        self.inner.load()
+        return self
+
+    def classify(self, text):
+        return self._classify(normalize(text))
+
+    def cache_info(self):
+        return self._classify.cache_info()
+
+
+CLASSIFIERS = {
+    'lexicon': LexiconMoodClassifier,
+    'textblob': TextBlobMoodClassifier,
+}
+
+
+def create_classifier(name='lexicon', cache_size=4096):
+    """Build a classifier by name; cache_size=0 disables memoisation."""
+    try:
+        classifier = CLASSIFIERS[(name or 'lexicon').lower()]()
+    except KeyError:
+        raise ValueError(f"Unknown mood classifier '{name}' (expected one of {', '.join(CLASSIFIERS)})")
+    if cache_size:
+        classifier = CachedMoodClassifier(classifier, maxsize=cache_size)
+    return classifier
@@ -0,0 +1,280 @@
+"""On-disk poster cache behind the ``/poster`` proxy.
+
+Posters are fetched from TMDB once at the source size, and smaller variants
+are generated from that copy with Pillow (when installed). Every image is
+stored content-addressed under ``objects/<sha256>``, so identical bytes are
+kept once and the digest doubles as a strong ETag. A small ``refs/`` file
+maps each (size, filename) to its digest and content type.
+
+The cache keeps to ``max_bytes`` for all workers sharing the directory.
+The running total lives in a ``.usage`` file that is updated under an
+``flock`` on ``.lock``. Recency is the objects' mtime, which a hit bumps.
+Once a store goes over budget, one pass rescans ``objects/`` and deletes
+the least recently used objects down to ``LOW_WATER`` of the budget. The
+same pass deletes the refs that pointed to them, so the scans are
+amortised over many stores. A ref whose object vanished anyway is treated
+as a miss.
+"""
+import contextlib
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+from collections import namedtuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of this process are excluded
+    fcntl = None
+
+# TMDB file names only, which also rules out path traversal
+FILENAME_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}\.(?:jpe?g|png|webp)$')
+
+Poster = namedtuple('Poster', 'data etag content_type')
+
+# An eviction pass frees space down to this fraction of max_bytes
+LOW_WATER = 0.9
+
+_CONTENT_TYPES = {'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'png': 'image/png', 'webp': 'image/webp'}
+
+
+class PosterCache:
+    """Disk cache of source posters and their resized variants.
+
+    ``fetch(url)`` returns ``(bytes, content_type)`` or None; ``widths`` maps
+    variant names (e.g. ``'w185'``) to pixel widths. ``source_size`` is the
+    variant fetched from upstream and never resized.
+    """
+
+    def __init__(self, root, fetch, source_url, widths, source_size='w500', max_bytes=256 * 1024 * 1024,
+                 quality=82):
+        self.root = root
+        self.fetch = fetch
+        self.source_url = source_url.rstrip('/')
+        self.widths = dict(widths)
+        self.source_size = source_size
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.resized = 0
+        self.evictions = 0
+        self._loaded = False
+
+    def load(self):
+        """Create the directories and recount the cached objects; safe to call more than once."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    os.makedirs(os.path.join(self.root, 'objects'), exist_ok=True)
+                    os.makedirs(os.path.join(self.root, 'refs'), exist_ok=True)
+                    with self._disk_lock():
+                        self._write_usage(*self._usage_of(self._scan()))
+                    self._loaded = True
+        return self
+
+    @contextlib.contextmanager
+    def _disk_lock(self):
+        """Exclusive flock on the directory's .lock; callers hold self._lock."""
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(os.path.join(self.root, '.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # also releases the flock
+
+    @property
+    def sizes(self):
+        return tuple(self.widths) + (self.source_size,)
+
+    def _scan(self):
+        """(mtime, digest, size) of every object, least recently used first"""
+        found = []
+        with os.scandir(os.path.join(self.root, 'objects')) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.startswith('.'):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.name, stat.st_size))
+        return sorted(found)
+
+    @staticmethod
+    def _usage_of(objects):
+        return sum(size for _, _, size in objects), len(objects)
+
+    def _read_usage(self):
+        """(bytes, objects) shared by all workers, from .usage"""
+        try:
+            with open(os.path.join(self.root, '.usage'), encoding='utf-8') as f:
+                total, count = f.read().split()
+            return int(total), int(count)
+        except (OSError, ValueError):
+            return 0, 0
+
+    def _write_usage(self, total, count):
+        self._write_atomic(os.path.join(self.root, '.usage'), f'{total} {count}'.encode('utf-8'))
+
+    def _evict(self, keep):
+        """Delete least recently used objects, and their refs, down to LOW_WATER; returns the new usage"""
+        objects = self._scan()
+        total, count = self._usage_of(objects)
+        evicted = set()
+        for _, digest, size in objects:
+            if total <= self.max_bytes * LOW_WATER:
+                break
+            if digest == keep:
+                continue
+            try:
+                os.unlink(self._object_path(digest))
+            except OSError:
+                continue
+            evicted.add(digest)
+            total -= size
+            count -= 1
+        if evicted:
+            refs = os.path.join(self.root, 'refs')
+            with os.scandir(refs) as entries:
+                for entry in entries:
+                    try:
+                        with open(entry.path, encoding='utf-8') as f:
+                            digest = f.read().split()[0]
+                        if digest in evicted:
+                            os.unlink(entry.path)
+                    except (OSError, IndexError):
+                        pass
+            self.evictions += len(evicted)
+        return total, count
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest)
+
+    def _ref_path(self, size, filename):
+        return os.path.join(self.root, 'refs', hashlib.sha1(f'{size}/{filename}'.encode('utf-8')).hexdigest())
+
+    def _write_atomic(self, path, data):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _read(self, size, filename):
+        ref = self._ref_path(size, filename)
+        try:
+            with open(ref, encoding='utf-8') as f:
+                digest, content_type = f.read().split()
+        except (OSError, ValueError):
+            return None
+        try:
+            with open(self._object_path(digest), 'rb') as f:
+                data = f.read()
+        except OSError:
+            # Object was evicted; drop the dangling ref
+            try:
+                os.unlink(ref)
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(self._object_path(digest))  # recency for the LRU
+        except OSError:
+            pass
+        return Poster(data, digest, content_type)
+
+    def _store(self, size, filename, data, content_type):
+        digest = hashlib.sha256(data).hexdigest()
+        if len(data) > self.max_bytes:
+            return Poster(data, digest, content_type)
+        path = self._object_path(digest)
+        with self._lock, self._disk_lock():
+            total, count = self._read_usage()
+            if os.path.exists(path):
+                os.utime(path)
+            else:
+                self._write_atomic(path, data)
+                total += len(data)
+                count += 1
+            self._write_atomic(self._ref_path(size, filename), f'{digest} {content_type}'.encode('utf-8'))
+            if total > self.max_bytes:
+                total, count = self._evict(keep=digest)
+            self._write_usage(total, count)
+        return Poster(data, digest, content_type)
+
+    def _resize(self, data, width):
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                if img.width <= width:
+                    return None
+                img = img.convert('RGB')
+                img.thumbnail((width, width * 4), Image.LANCZOS)
+                out = io.BytesIO()
+                img.save(out, 'JPEG', quality=self.quality, optimize=True, progressive=True)
+        except Exception as e:
+            print(f"Could not resize poster to {width}px: {e}")
+            return None
+        self.resized += 1
+        return out.getvalue()
+
+    def _source(self, filename):
+        poster = self._read(self.source_size, filename)
+        if poster is not None:
+            return poster
+        fetched = self.fetch(f'{self.source_url}/{filename}')
+        if fetched is None:
+            return None
+        data, content_type = fetched
+        content_type = content_type or _CONTENT_TYPES[filename.rsplit('.', 1)[1].lower()]
+        return self._store(self.source_size, filename, data, content_type)
+
+    def get(self, size, filename):
+        """The poster variant as a Poster, or None if upstream has no such image.
+
+        Raises ValueError for an unknown size or a malformed file name.
+        """
+        if size not in self.sizes:
+            raise ValueError(f"Unknown poster size '{size}'")
+        if not FILENAME_RE.match(filename):
+            raise ValueError('Invalid poster name')
+        self.load()
+        poster = self._read(size, filename)
+        if poster is not None:
+            self.hits += 1
+            return poster
+        self.misses += 1
+        source = self._source(filename)
+        if source is None or size == self.source_size:
+            return source
+        resized = self._resize(source.data, self.widths[size])
+        if resized is None:
+            # Already small enough, or no Pillow: the variant shares the source's object
+            return self._store(size, filename, source.data, source.content_type)
+        return self._store(size, filename, resized, 'image/jpeg')
+
+    def stats(self):
+        self.load()
+        total, count = self._read_usage()
+        with self._lock:
+            return {
+                'objects': count,
+                'bytes': total,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'resized': self.resized,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,346 @@
+"""Client-side rate limiting for the RapidAPI hosts.
+
+Each upstream host gets an ``UpstreamGovernor`` made of:
+
+* a ``TokenBucket`` that spaces requests out to the plan's rate and can be
+  paused until the time a ``Retry-After`` or quota-reset header names. A
+  caller with no token waits for the next one, unless that would take longer
+  than the time it has left, and
+* a ``CircuitBreaker`` that opens after repeated 429s or timeouts, so callers
+  stop waiting on requests that are bound to fail and go straight to cached or
+  curated data. After ``reset_timeout`` one probe request is let through
+  (half-open); its outcome closes or re-opens the breaker.
+
+``governor_for(host)`` returns the shared governor for a host.
+
+Governors live in one process. Under several worker processes each has its
+own bucket and breaker, so app.py divides the configured rate and burst by
+``WEB_CONCURRENCY`` to keep the host's total within the plan. Each worker
+still learns about 429s and quota resets on its own.
+"""
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling an upstream that the governor is holding back."""
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, up to ``capacity``."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def _refill(self, now):
+        # Nothing accrues while paused
+        elapsed = max(0.0, now - max(self._updated, self._paused_until))
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Take a token if one is available right now."""
+        with self._lock:
+            now = self._clock()
+            if now < self._paused_until:
+                return False
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def wait_time(self):
+        """Seconds until a token will be available (0 if one is available now)."""
+        with self._lock:
+            return self._wait(self._clock())
+
+    def _wait(self, now):
+        # Callers must hold self._lock
+        self._refill(now)
+        pause = max(0.0, self._paused_until - now)
+        shortfall = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+        return pause + shortfall
+
+    def reserve(self, max_wait=None):
+        """Claim the next token, which may not have accrued yet.
+
+        Returns the seconds to wait before using it, or None (claiming
+        nothing) if that would be longer than ``max_wait``. Tokens are handed
+        out in reservation order, so concurrent waiters are spaced ``1/rate``
+        apart instead of polling for the same token.
+        """
+        with self._lock:
+            now = self._clock()
+            wait = self._wait(now)
+            if max_wait is not None and wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def acquire(self, timeout=None):
+        """Block until a token is taken; returns False if ``timeout`` runs out first."""
+        wait = self.reserve(timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def pause(self, seconds):
+        """Hand out no tokens for the next ``seconds`` and drain the bucket."""
+        with self._lock:
+            now = self._clock()
+            self._paused_until = max(self._paused_until, now + seconds)
+            # Outstanding reservations stay owed
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = now
+
+    def paused_for(self):
+        with self._lock:
+            return max(0.0, self._paused_until - self._clock())
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with closed, open and half-open states."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_until = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self.times_opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        now = self._clock()
+        if self._state == self.OPEN and now >= self._opened_until:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        elif self._state == self.HALF_OPEN and self._probe_in_flight \
+                and now - self._probe_started > self.reset_timeout:
+            # The probe never reported back; let another one through
+            self._probe_in_flight = False
+        return self._state
+
+    def is_open(self):
+        """True while requests are being refused (half-open still admits a probe)."""
+        with self._lock:
+            state = self._current_state()
+            return state == self.OPEN or (state == self.HALF_OPEN and self._probe_in_flight)
+
+    def allow(self):
+        """Whether a request may go out now; half-open admits a single probe."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._probe_started = self._clock()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, open_for=None):
+        """Count a failure; ``open_for`` forces the breaker open at least that long."""
+        with self._lock:
+            self._failures += 1
+            state = self._current_state()
+            if state == self.HALF_OPEN or self._failures >= self.failure_threshold or open_for:
+                duration = max(self.reset_timeout, open_for or 0)
+                if state != self.OPEN:
+                    self.times_opened += 1
+                self._state = self.OPEN
+                self._opened_until = max(self._opened_until, self._clock() + duration)
+                self._probe_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'consecutive_failures': self._failures,
+                'times_opened': self.times_opened,
+                'retry_in': round(max(0.0, self._opened_until - self._clock()), 2)
+                if self._state == self.OPEN else 0.0,
+            }
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, when.timestamp() - now)
+
+
+class UpstreamGovernor:
+    """Token bucket plus circuit breaker for one upstream host."""
+
+    def __init__(self, host, rate=5.0, burst=10, failure_threshold=5, reset_timeout=30.0,
+                 default_backoff=5.0):
+        self.host = host
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.default_backoff = default_backoff
+        self._lock = threading.Lock()
+        self._backoff = default_backoff
+        self.requests = 0
+        self.waited = 0
+        self.throttled = 0
+        self.rate_limited = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    def is_open(self):
+        return self.breaker.is_open()
+
+    def _reserve(self, timeout):
+        """Breaker check plus a token reservation; returns the seconds to wait."""
+        if self.breaker.is_open():
+            with self._lock:
+                self.rejected += 1
+            raise UpstreamUnavailable(f"{self.host}: circuit open")
+        wait = self.bucket.reserve(max(0.0, timeout))
+        if wait is None:
+            with self._lock:
+                self.throttled += 1
+            raise UpstreamUnavailable(f"{self.host}: rate limited locally")
+        return wait
+
+    def _admit(self):
+        if self.bucket.paused_for() > 0:
+            # A 429 arrived while we waited for our turn
+            with self._lock:
+                self.throttled += 1
+            raise UpstreamUnavailable(f"{self.host}: rate limited upstream")
+        if not self.breaker.allow():
+            # Opened while we waited, or lost the race for the single half-open probe
+            with self._lock:
+                self.rejected += 1
+            raise UpstreamUnavailable(f"{self.host}: circuit open")
+        with self._lock:
+            self.requests += 1
+
+    def before_request(self, timeout=0.0):
+        """Admit one request, waiting up to ``timeout`` seconds for a token.
+
+        Raises UpstreamUnavailable without touching the network while the
+        breaker is open, or when no token would be free within ``timeout``.
+        """
+        wait = self._reserve(timeout)
+        if wait > 0:
+            with self._lock:
+                self.waited += 1
+            time.sleep(wait)
+        self._admit()
+
+    async def before_request_async(self, timeout=0.0):
+        """before_request for coroutines: waits without blocking the event loop."""
+        wait = self._reserve(timeout)
+        if wait > 0:
+            with self._lock:
+                self.waited += 1
+            await asyncio.sleep(wait)
+        self._admit()
+
+    def observe_response(self, response):
+        """Feed a response back: honours 429/Retry-After and RapidAPI quota headers."""
+        headers = response.headers
+        if response.status_code == 429:
+            wait = parse_retry_after(headers.get('Retry-After'))
+            if wait is None:
+                wait = parse_retry_after(headers.get('X-RateLimit-Requests-Reset'))
+            with self._lock:
+                self.rate_limited += 1
+                if wait is None:
+                    # No hint from upstream: exponential backoff, capped at 5 minutes
+                    wait = self._backoff
+                    self._backoff = min(self._backoff * 2, 300.0)
+            self.bucket.pause(wait)
+            self.breaker.record_failure(open_for=wait if wait > self.default_backoff else None)
+            return
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            return
+        with self._lock:
+            self._backoff = self.default_backoff
+        remaining = headers.get('X-RateLimit-Requests-Remaining')
+        if remaining is not None and remaining.strip() == '0':
+            wait = parse_retry_after(headers.get('X-RateLimit-Requests-Reset'))
+            if wait:
+                self.bucket.pause(wait)
+        self.breaker.record_success()
+
+    def observe_timeout(self):
+        """Feed back a timeout or connection failure."""
+        with self._lock:
+            self.timeouts += 1
+        self.breaker.record_failure()
+
+    def stats(self):
+        with self._lock:
+            counters = {
+                'requests': self.requests,
+                'waited': self.waited,
+                'throttled': self.throttled,
+                'rate_limited': self.rate_limited,
+                'timeouts': self.timeouts,
+                'rejected': self.rejected,
+            }
+        counters['paused_for'] = round(self.bucket.paused_for(), 2)
+        counters['breaker'] = self.breaker.stats()
+        return counters
+
+
+_GOVERNORS = {}
+_GOVERNORS_LOCK = threading.Lock()
+
+
+def governor_for(host, **settings):
+    """Return the process-wide governor for ``host``, creating it on first use."""
+    with _GOVERNORS_LOCK:
+        gov = _GOVERNORS.get(host)
+        if gov is None:
+            gov = _GOVERNORS[host] = UpstreamGovernor(host, **settings)
+        return gov
+
+
+def all_governors():
+    with _GOVERNORS_LOCK:
+        return dict(_GOVERNORS)
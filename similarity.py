@@ -0,0 +1,227 @@
+"""In-memory TF-IDF index over every movie the app has seen.
+
+``MovieIndex`` collects movies (title + overview) as they come back from the
+search API and from the curated catalog, and answers free-text queries with
+cosine similarity. This lets short user text such as "space pirates" be
+matched locally instead of being sent upstream as a near-unique search.
+
+Postings are kept term-major in flat NumPy arrays (CSR style), so a query
+costs one ``bincount`` over the postings of its few terms, not a scan of
+every movie. New movies go into Python lists and are folded into a fresh
+immutable snapshot at most every ``rebuild_interval`` seconds. The rebuild
+runs on a background thread and the new snapshot is swapped in when it is
+ready; searches read whichever snapshot is current and never take the lock.
+
+NumPy is imported on the first rebuild, not at import time, so workers that
+never search (or warm up first) do not pay for it at startup.
+"""
+import math
+import re
+import threading
+import time
+from collections import Counter
+from itertools import chain
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Function words plus the filler people type around what they actually want
+STOPWORDS = frozenset('''
+a about after again all am an and any are as at be because been before being but by can could did do
+does doing down during each few for from further had has have having he her here hers him his how i if
+in into is it its just me more most my no nor not now of off on once only or other our out over own
+same she should so some such than that the their them then there these they this those through to too
+under until up very was we were what when where which while who whom why will with would you your
+feel feeling felt want wanna need like something some watch watching tonight today movie movies film
+films please really bit kind sort mood im
+'''.split())
+
+# Title words count this many times as often as overview words
+TITLE_WEIGHT = 2
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or '').lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def _movie_keys(movie):
+    """Id and (title, year): the same film can come back under different ids."""
+    title = (movie.get('title') or '').strip().lower()
+    return movie.get('id'), (title, str(movie.get('release_date') or '')[:4]) if title else None
+
+
+class _Snapshot:
+    """Immutable view of the index used by searches."""
+
+    __slots__ = ('docs', 'regions', 'vocab', 'idf', 'term_ptr', 'doc_ids', 'weights', 'size')
+
+    def __init__(self, docs, regions, vocab, idf, term_ptr, doc_ids, weights):
+        self.docs = docs
+        self.regions = regions
+        self.vocab = vocab
+        self.idf = idf
+        self.term_ptr = term_ptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.size = len(docs)
+
+
+class MovieIndex:
+    def __init__(self, max_movies=50_000, rebuild_interval=5.0, clock=time.monotonic):
+        self.max_movies = max_movies
+        self.rebuild_interval = rebuild_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._docs = []
+        self._regions = []
+        self._keys = set()
+        self._postings = {}  # term -> ([doc ids], [term counts])
+        self._snapshot = None
+        self._dirty = False
+        self._built_at = float('-inf')
+        self._build_lock = threading.Lock()  # one build at a time, so snapshots only move forward
+        self._rebuilding = False
+        self.searches = 0
+        self.rebuilds = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _seen(self, movie):
+        keys = [k for k in _movie_keys(movie) if k]
+        return not keys or any(k in self._keys for k in keys)
+
+    def add_many(self, movies, region=None):
+        """Index movies not seen before; returns how many were added."""
+        # Most calls carry only movies already indexed; skip the lock for those
+        movies = [m for m in movies if not self._seen(m)]
+        if not movies:
+            return 0
+        added = 0
+        with self._lock:
+            for movie in movies:
+                if self._seen(movie) or len(self._docs) >= self.max_movies:
+                    continue
+                counts = Counter(tokenize(movie.get('overview')))
+                for term in tokenize(movie.get('title')):
+                    counts[term] += TITLE_WEIGHT
+                if not counts:
+                    continue
+                doc_id = len(self._docs)
+                self._keys.update(k for k in _movie_keys(movie) if k)
+                self._docs.append(movie)
+                self._regions.append(movie.get('region', region))
+                for term, count in counts.items():
+                    docs, tfs = self._postings.setdefault(term, ([], []))
+                    docs.append(doc_id)
+                    tfs.append(count)
+                added += 1
+            if added:
+                self._dirty = True
+        return added
+
+    def _capture(self):
+        """How much of the index the next snapshot covers; callers hold self._lock.
+
+        Docs and postings are only ever appended to, so their current lengths
+        pin a consistent view that the build can read without the lock.
+        """
+        self._dirty = False
+        return len(self._docs), [(term, len(postings[0])) for term, postings in self._postings.items()]
+
+    def _build(self, n_docs, terms):
+        import numpy as np
+        docs = self._docs[:n_docs]
+        postings = self._postings
+        vocab = {term: row for row, (term, _) in enumerate(terms)}
+        df = np.fromiter((n for _, n in terms), dtype=np.int64, count=len(terms))
+        nnz = int(df.sum())
+        term_ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(df, out=term_ptr[1:])
+        doc_ids = np.fromiter(chain.from_iterable(postings[t][0][:n] for t, n in terms), dtype=np.int32, count=nnz)
+        tf = np.fromiter(chain.from_iterable(postings[t][1][:n] for t, n in terms), dtype=np.float32, count=nnz)
+        # Smoothed idf and sublinear tf, rows L2-normalised so a dot product is the cosine
+        idf = (np.log((1.0 + len(docs)) / (1.0 + df)) + 1.0).astype(np.float32)
+        weights = (1.0 + np.log(tf)) * np.repeat(idf, df)
+        norms = np.sqrt(np.bincount(doc_ids, weights=weights * weights, minlength=len(docs))).astype(np.float32)
+        weights /= norms[doc_ids]
+        self.rebuilds += 1
+        return _Snapshot(docs, self._regions[:n_docs], vocab, idf, term_ptr, doc_ids, weights)
+
+    def _rebuild(self):
+        with self._build_lock:
+            with self._lock:
+                n_docs, terms = self._capture()
+            self._snapshot = self._build(n_docs, terms)
+            self._built_at = self._clock()
+
+    def _rebuild_in_background(self):
+        try:
+            self._rebuild()
+        except Exception as e:
+            print(f"Local index rebuild failed: {e!r}")
+        finally:
+            self._rebuilding = False
+
+    def snapshot(self, force=False):
+        """Current snapshot.
+
+        The first build, and ``force=True``, run in the caller. Later on, once
+        movies were added and the interval has passed, a rebuild is started
+        on a background thread and the current snapshot is returned meanwhile.
+        """
+        snap = self._snapshot
+        if snap is None or force:
+            if snap is None or self._dirty:
+                self._rebuild()
+            return self._snapshot
+        if self._dirty and not self._rebuilding and self._clock() - self._built_at >= self.rebuild_interval:
+            with self._lock:
+                start = not self._rebuilding
+                self._rebuilding = True
+            if start:
+                threading.Thread(target=self._rebuild_in_background, name='moodflix-index-rebuild',
+                                 daemon=True).start()
+        return snap
+
+    def search(self, text, k=8, min_score=0.0, regions=None):
+        """Up to k (score, movie) pairs most similar to text, best first."""
+        snap = self.snapshot()
+        self.searches += 1
+        query = Counter(t for t in tokenize(text) if t in snap.vocab)
+        if not query or not snap.size:
+            return []
+        import numpy as np
+        rows = [snap.vocab[t] for t in query]
+        q_weights = np.array([(1.0 + math.log(query[t])) for t in query], dtype=np.float32) * snap.idf[rows]
+        q_weights /= np.linalg.norm(q_weights)
+        starts = snap.term_ptr[rows]
+        ends = snap.term_ptr[np.array(rows) + 1]
+        ids = np.concatenate([snap.doc_ids[s:e] for s, e in zip(starts, ends)])
+        contrib = np.concatenate([snap.weights[s:e] * w for s, e, w in zip(starts, ends, q_weights)])
+        scores = np.bincount(ids, weights=contrib, minlength=snap.size)
+        # Over-fetch so region filtering still leaves k candidates
+        want = min(snap.size, k * 4 if regions else k)
+        top = np.argpartition(-scores, want - 1)[:want]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        results = []
+        for doc_id in top:
+            score = float(scores[doc_id])
+            if score <= 0 or score < min_score:
+                break
+            region = snap.regions[doc_id]
+            if regions and region is not None and region not in regions:
+                continue
+            results.append((score, snap.docs[doc_id]))
+            if len(results) >= k:
+                break
+        return results
+
+    def stats(self):
+        snap = self._snapshot
+        return {
+            'movies': len(self._docs),
+            'terms': len(self._postings),
+            'indexed_movies': snap.size if snap else 0,
+            'searches': self.searches,
+            'rebuilds': self.rebuilds,
+        }
@@ -29,6 +29,7 @@ moodInput.addEventListener('keypress', (e) => {
 // Client state
 let lastRequest = { moodText: '', preference: 'mixed', limit: 10, emoji: '' };
 let currentResults = [];
+let activeRequest = 0;
 
 // Main function to handle movie recommendation
 async function handleFindMovies() {
@@ -41,6 +42,7 @@ async function handleFindMovies() {
     
     // Show loading state
     showLoading();
+    const requestId = ++activeRequest;
     
     try {
         const preference = preferenceSelect ? preferenceSelect.value : 'mixed';
@@ -48,7 +50,8 @@ async function handleFindMovies() {
         const emoji = lastRequest.emoji || '';
         lastRequest = { moodText, preference, limit, emoji };
 
-        const response = await fetch('/recommend', {
+        // Streamed variant of /recommend: cards are shown as each search returns
+        const response = await fetch('/recommend/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -56,21 +59,48 @@ async function handleFindMovies() {
             body: JSON.stringify({ mood_text: moodText, preference, limit, emoji })
         });
         
-        const data = await response.json();
-        
         if (!response.ok) {
+            const data = await response.json().catch(() => ({}));
             throw new Error(data.error || 'Something went wrong');
         }
         
-        // Display results
-        displayResults(data);
+        await readFrames(response, frame => {
+            // A newer search has started; drop what is left of this one
+            if (requestId !== activeRequest) return;
+            if (frame.type === 'mood') beginResults(frame);
+            else if (frame.type === 'movies') appendMovies(frame.movies);
+            else if (frame.type === 'done') finishResults(frame);
+            else if (frame.type === 'error') throw new Error(frame.error);
+        });
         
     } catch (error) {
+        if (requestId !== activeRequest) return;
         console.error('Error:', error);
         showError(error.message || 'Failed to get movie recommendations. Please try again.');
     }
 }
 
+// Parse an NDJSON response body, calling onFrame for each line as it arrives
+async function readFrames(response, onFrame) {
+    const handleLine = line => { if (line.trim()) onFrame(JSON.parse(line)); };
+    if (!response.body || !window.TextDecoder) {
+        (await response.text()).split('\n').forEach(handleLine);
+        return;
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+        lines.forEach(handleLine);
+    }
+    handleLine(buffered + decoder.decode());
+}
+
 // Show loading state
 function showLoading() {
     hideAllSections();
@@ -86,35 +116,48 @@ function hideAllSections() {
     errorSection.classList.add('hidden');
 }
 
-// Display results
-function displayResults(data) {
+// Mood is known: show the results section while movies are still coming in
+function beginResults(data) {
     hideAllSections();
     
     // Update mood display
     moodTitle.textContent = `You seem ${data.mood} ${data.emoji}`;
-    if (data.fallback) {
-        moodDescription.textContent = `Based on your input: "${data.user_input}" • Showing curated recommendations (${data.total_movies || data.movies.length} movies)`;
-    } else {
-        moodDescription.textContent = `Based on your input: "${data.user_input}" • Found ${data.total_movies || data.movies.length} movies from Hollywood & Bollywood`;
-    }
+    moodDescription.textContent = `Based on your input: "${data.user_input}" • Finding movies...`;
+    lastRequest.userInput = data.user_input;
     
     // Clear previous movies
     moviesGrid.innerHTML = '';
+    currentResults = [];
+    if (loadMoreBtn) loadMoreBtn.classList.add('hidden');
     
-    // Display movies
-    if (data.movies && data.movies.length > 0) {
-        currentResults = data.movies;
-        data.movies.forEach(movie => {
-            const movieCard = createMovieCard(movie);
-            moviesGrid.appendChild(movieCard);
-        });
-        if (loadMoreBtn) loadMoreBtn.classList.toggle('hidden', (data.total_movies || data.movies.length) < (lastRequest.limit || 10));
+    resultsSection.classList.remove('hidden');
+}
+
+function appendMovies(movies) {
+    if (!movies || movies.length === 0) return;
+    movies.forEach(movie => {
+        const movieCard = createMovieCard(movie);
+        moviesGrid.appendChild(movieCard);
+    });
+    currentResults = currentResults.concat(movies);
+    prefetchTrailers(movies);
+}
+
+function finishResults(data) {
+    const total = data.total_movies || currentResults.length;
+    if (data.fallback) {
+        moodDescription.textContent = `Based on your input: "${lastRequest.userInput}" • Showing curated recommendations (${total} movies)`;
+    } else {
+        moodDescription.textContent = `Based on your input: "${lastRequest.userInput}" • Found ${total} movies from Hollywood & Bollywood`;
+    }
+    
+    if (currentResults.length > 0) {
+        if (loadMoreBtn) loadMoreBtn.classList.toggle('hidden', total < (lastRequest.limit || 10));
     } else {
         moviesGrid.innerHTML = '<p style="text-align: center; color: #888; grid-column: 1 / -1;">No movies found for your mood. Try a different description!</p>';
         if (loadMoreBtn) loadMoreBtn.classList.add('hidden');
     }
     
-    resultsSection.classList.remove('hidden');
     resetButton();
 }
 
@@ -358,11 +401,56 @@ function openDetailsModal(movie) {
     `;
     modal.classList.remove('hidden');
     // Try to embed trailer
-    fetch(`/trailer?title=${encodeURIComponent(movie.title)}&year=${encodeURIComponent((movie.release_date || '').slice(0,4))}`)
-        .then(r => r.json()).then(({ videoId }) => {
+    getTrailerId(movie)
+        .then(videoId => {
             if (!videoId) return;
             const slot = document.getElementById('trailer-slot');
             slot.innerHTML = `<iframe width="100%" height="315" src="https://www.youtube.com/embed/${videoId}" frameborder="0" allowfullscreen style="border-radius:12px; border:1px solid rgba(255,255,255,.1)"></iframe>`;
         }).catch(() => {});
 }
 function closeModal() { modal.classList.add('hidden'); }
+
+// Trailer IDs (as promises) keyed by "title|year", filled by one batch request per result page.
+// A promise resolves to the video ID, null when the movie has no trailer, or undefined when the
+// lookup failed; failed lookups are dropped from the cache so they are tried again.
+const trailerCache = new Map();
+function trailerKey(movie) { return `${(movie.title || '').trim()}|${(movie.release_date || '').slice(0,4)}`; }
+
+function rememberTrailer(key, lookup) {
+    const entry = lookup.catch(() => undefined).then(videoId => {
+        if (videoId === undefined && trailerCache.get(key) === entry) trailerCache.delete(key);
+        return videoId;
+    });
+    trailerCache.set(key, entry);
+    return entry;
+}
+
+function prefetchTrailers(movies) {
+    const pending = movies.filter(m => m.title && !trailerCache.has(trailerKey(m)));
+    if (pending.length === 0) return;
+    const batch = fetch('/trailers', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ movies: pending.map(m => ({ title: m.title, year: (m.release_date || '').slice(0,4) })) })
+    })
+        .then(r => r.json())
+        // Only answered lookups; ones with an error are left out
+        .then(({ trailers }) => new Map((trailers || []).filter(t => 'videoId' in t).map(t => [`${t.title}|${t.year}`, t.videoId])));
+    pending.forEach(m => {
+        const key = trailerKey(m);
+        rememberTrailer(key, batch.then(found => found.get(key)));
+    });
+}
+
+function fetchTrailerId(movie) {
+    return fetch(`/trailer?title=${encodeURIComponent(movie.title)}&year=${encodeURIComponent((movie.release_date || '').slice(0,4))}`)
+        .then(r => r.json()).then(data => ('videoId' in data ? data.videoId || null : undefined));
+}
+
+function getTrailerId(movie) {
+    const key = trailerKey(movie);
+    const lookup = () => rememberTrailer(key, fetchTrailerId(movie));
+    if (!trailerCache.has(key)) return lookup();
+    // A prefetch that got no answer falls back to a single lookup
+    return trailerCache.get(key).then(videoId => (videoId === undefined ? lookup() : videoId));
+}
@@ -0,0 +1,66 @@
+"""Periodic cache warm-up runner.
+
+``CacheWarmer`` calls a warm-up function once at start and then every
+``interval`` seconds on a daemon thread. When a ``lock_path`` is given, an
+exclusive non-blocking ``flock`` on that file makes sure only one process on
+the host warms at a time; the others skip the round, which is enough when
+the cache backend is shared between workers.
+"""
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process exclusion
+    fcntl = None
+
+
+class CacheWarmer:
+    def __init__(self, warm_fn, interval, lock_path=None):
+        self.warm_fn = warm_fn
+        self.interval = interval
+        self.lock_path = lock_path
+        self.runs = 0
+        self.skipped = 0
+        self.last_result = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        """Run one warm-up round unless another process holds the lock."""
+        fd = None
+        if self.lock_path and fcntl is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                self.skipped += 1
+                return None
+        try:
+            self.last_result = self.warm_fn()
+            self.runs += 1
+            return self.last_result
+        finally:
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Cache warm-up failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='moodflix-warmer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()